@@ -0,0 +1,125 @@
+"""
+Single-pass tokenizer for Gemini profile responses ('Q<n>: answer' blocks).
+
+The same parser handles streamed chunks and complete responses; each character is
+scanned a bounded number of times, so parsing is linear in the response length.
+
+Marker rules (compatible with the original regex, r'Q(\d+):\s*(.*?)(?=\nQ\d+:|$)'):
+- A marker at the start of a line ('Q12:', optionally indented or bolded, e.g. '**Q12:**')
+  closes the open answer and opens answer 12.
+- Before the first marker, a marker may also appear mid-line ('Sure! Q1: ...'). Once an
+  answer is open, mid-line 'Q<n>:' text is part of the answer.
+- Out-of-range question numbers are ignored; an answer that only repeats its question is
+  dropped; when a question number appears more than once, parse_answers keeps the
+  longest answer.
+"""
+import re
+from typing import Callable, Dict, List
+
+def is_question_repetition(question_text: str, content: str) -> bool:
+    """Whether an answer just repeats the question instead of answering it.
+    Only looks at the head of the content so the cost is bounded by the question length."""
+    limit = len(question_text) + 100
+    head_lower = content[:limit].lower()
+    question_lower = question_text.lower()
+    return (
+        head_lower.startswith(question_lower[:50]) or
+        (len(content) < limit and question_lower in head_lower)
+    )
+
+class StreamingAnswerParser:
+    """
+    Text is fed in arbitrary chunks and scanned once, line by line; on_answer(n, answer)
+    is called as soon as answer n is complete (at the next marker or at finish()).
+    Handles both layouts Gemini produces:
+    - 'Q1: answer text' on the marker line
+    - 'Q1: <question repeated>' followed by the answer on the next lines
+    """
+    _MARKER = re.compile(r'^\s*\**Q(\d{1,4})\**\s*:\**\s*(.*)$')
+    _INLINE_MARKER = re.compile(r'Q(\d{1,4})\**\s*:\**\s*(.*)$')
+    
+    def __init__(self, questions: List[str], on_answer: Callable[[int, str], None]):
+        self._questions = questions
+        self._on_answer = on_answer
+        self._partial_line = []
+        self._q_num = None
+        self._lines = []
+    
+    def feed(self, text: str):
+        if '\n' not in text:
+            self._partial_line.append(text)
+            return
+        self._partial_line.append(text)
+        lines = ''.join(self._partial_line).split('\n')
+        self._partial_line = [lines.pop()]
+        for line in lines:
+            self._process_line(line)
+    
+    def finish(self):
+        last_line = ''.join(self._partial_line)
+        self._partial_line = []
+        if last_line:
+            self._process_line(last_line)
+        self._emit_current()
+    
+    def _process_line(self, line: str):
+        # Cheap check first so long prose lines skip the regex
+        if 'Q' in line[:16]:
+            match = self._MARKER.match(line)
+            if match:
+                self._open(match)
+                return
+        if self._q_num is None:
+            # Preamble: the first marker may follow other text on its line
+            match = self._INLINE_MARKER.search(line) if 'Q' in line else None
+            if match:
+                self._open(match)
+            return
+        self._lines.append(line)
+    
+    def _open(self, match):
+        self._emit_current()
+        self._q_num = int(match.group(1))
+        self._lines = [match.group(2)]
+    
+    def _emit_current(self):
+        if self._q_num is None:
+            return
+        q_num, lines = self._q_num, self._lines
+        self._q_num, self._lines = None, []
+        if not 1 <= q_num <= len(self._questions):
+            return
+        
+        question_text = self._questions[q_num - 1]
+        first_line = lines[0]
+        if first_line[:len(question_text)].lower() == question_text.lower():
+            # Question echoed on the marker line: keep whatever follows it
+            lines[0] = first_line[len(question_text):].lstrip(' :-')
+        elif is_question_repetition(question_text, first_line):
+            lines = lines[1:]
+        
+        answer = '\n'.join(lines).strip()
+        if not answer or is_question_repetition(question_text, answer):
+            return
+        try:
+            self._on_answer(q_num, answer)
+        except Exception as e:
+            print(f"⚠️  Could not publish streamed answer Q{q_num}: {e}")
+
+def parse_answers(questions: List[str], full_response: str) -> Dict:
+    """
+    Parse a complete profile response. Returns {question text: answer} for the answers
+    found, in question order. If a question number appears more than once, the longest
+    answer wins.
+    """
+    found = {}
+    
+    def collect(q_num: int, answer: str):
+        if len(answer) > len(found.get(q_num, '')):
+            found[q_num] = answer
+    
+    parser = StreamingAnswerParser(questions, collect)
+    parser.feed(full_response)
+    parser.finish()
+    
+    return {questions[q_num - 1]: found[q_num] for q_num in sorted(found)}
@@ -1,16 +1,49 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, g, jsonify, request, url_for
 from flask_cors import CORS
-from pymongo import MongoClient
+import click
+from pymongo import MongoClient, ReturnDocument, monitoring
+from pymongo.errors import DuplicateKeyError
 from bson import ObjectId
 import os
 import re
 import json
 import time
+import copy
+import contextlib
+import functools
+import math
+import random
+import queue
+import bisect
+import hashlib
+import uuid
+import socket
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+import gzip
 import google.generativeai as genai
-from typing import Dict, Optional
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
 from dotenv import load_dotenv
 
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY as METRICS_REGISTRY, Counter, Gauge, Histogram
+from answer_parser import StreamingAnswerParser, parse_answers
+from figure_schema import expand_figure, migrate_figures, storage_projection, to_compact_document, utc_now
+from resilience import (
+    HALF_OPEN, OPEN, RATE_LIMITED, TIMEOUT, CircuitBreakerRegistry, DependencyUnavailable,
+    RetriesExhausted, RetryBudget, call_with_retries
+)
+from rate_limit import TokenBucketLimiter
+
+try:
+    import brotli  # optional: enables Content-Encoding: br
+except ImportError:
+    brotli = None
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -18,7 +51,7 @@ app = Flask(__name__)
 # Enable CORS for React/Next.js frontend
 # In production, allow specific origins; in development, allow all
 cors_origins = os.getenv('CORS_ORIGINS', '*').split(',')
-CORS(app, origins=cors_origins if cors_origins != ['*'] else None)
+CORS(app, origins=cors_origins if cors_origins != ['*'] else '*')
 
 # MongoDB connection
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
@@ -41,145 +74,311 @@ VOICE_DESCRIPTION_MAX_LENGTH = 1000
 ELEVENLABS_SUMMARY_MAX_LENGTH = 1000
 SAMPLE_TEXT_MIN_LENGTH = 100
 GEMINI_MAX_RETRIES = 3
-GEMINI_RETRY_DELAY = 2  # seconds
+GEMINI_RETRY_DELAY = 2  # seconds; base of the jittered exponential backoff
+GEMINI_RETRY_MAX_DELAY = 30  # seconds; longest backoff between attempts (unless Gemini asks for longer)
+GEMINI_RETRY_DEADLINE = int(os.getenv('GEMINI_RETRY_DEADLINE', 360))  # seconds after which a Gemini call is not retried again
+GEMINI_REQUEST_RETRY_BUDGET = float(os.getenv('GEMINI_REQUEST_RETRY_BUDGET', 3))  # seconds a request thread may sleep between Gemini retries before answering 503
+GEMINI_BREAKER_THRESHOLD = int(os.getenv('GEMINI_BREAKER_THRESHOLD', 5))  # consecutive retryable failures that open a model's circuit
+GEMINI_BREAKER_RESET = int(os.getenv('GEMINI_BREAKER_RESET', 30))  # seconds an open circuit fails fast before a probe call
+RATE_LIMITING = os.getenv('RATE_LIMITING', 'true').lower() == 'true'  # cluster-wide token buckets in front of Gemini and ElevenLabs
+RATE_LIMIT_MAX_WAIT = int(os.getenv('RATE_LIMIT_MAX_WAIT', 120))  # seconds a background caller waits for a token
+# (requests per minute, burst) per bucket, shared by every instance
+GEMINI_RATE_LIMIT = (int(os.getenv('GEMINI_RATE_LIMIT_RPM', 60)), int(os.getenv('GEMINI_RATE_LIMIT_BURST', 10)))  # per model
+ELEVENLABS_RATE_LIMITS = {
+    'voices': (60, 10),
+    'voice_design': (20, 5),
+    'agents': (30, 5),
+    'agent_reads': (120, 20),
+    'conversations': (60, 10),
+}
 GEMINI_TIMEOUT = 300  # 5 minutes for large responses
+GEMINI_MIN_ATTEMPT_TIME = 5  # seconds; no attempt is started with less time left before the deadline
+GEMINI_PROFILE_SHARDING = os.getenv('GEMINI_PROFILE_SHARDING', 'true').lower() == 'true'  # one prompt per question category
+GEMINI_SHARD_WORKERS = int(os.getenv('GEMINI_SHARD_WORKERS', 6))  # concurrent shard requests per instance
+GEMINI_STREAMING = os.getenv('GEMINI_STREAMING', 'true').lower() == 'true'  # stream profile responses and publish answers as they complete
+ANSWER_STREAM_KEEPALIVE = 15  # seconds between SSE keep-alive comments while waiting for answers
+FIGURE_LEASE_TTL = 600  # seconds a profile generation lease is held before another instance may take over
+FIGURE_LEASE_POLL_INTERVAL = 2  # seconds between checks while another instance generates a profile
+CREATION_WORKERS = int(os.getenv('CREATION_WORKERS', 2))  # background agent creations per instance
+STREAM_WORKERS = int(os.getenv('STREAM_WORKERS', 4))  # concurrent profile generations for streaming requests per instance
+JOB_STALE_AFTER = 900  # seconds without progress before an active job is considered abandoned
+JOB_ACTIVE_STATUSES = ['queued', 'running']
+JOB_TERMINAL_STATUSES = ['succeeded', 'failed']
+JOB_STALE_ERROR = 'Job stopped reporting progress (its worker was lost); please try again'
+JOB_EVENTS_POLL_INTERVAL = 1  # seconds between job checks in the SSE stream
+JOB_EVENTS_MAX_DURATION = 240  # seconds before the SSE stream closes (clients reconnect); below Cloud Run's timeout
+BULK_AGENT_CONCURRENCY = int(os.getenv('BULK_AGENT_CONCURRENCY', 3))  # concurrent agent creations in create-all-agents runs
+BULK_EVICT_INTERVAL = 5  # create-all-agents runs enforce MAX_AGENTS after this many figures
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+LIST_DEFAULT_LIMIT = 50
+LIST_MAX_LIMIT = 200
+COMPRESSION_MIN_BYTES = 1024  # smaller responses are sent uncompressed
+GEMINI_CACHE_BACKEND = os.getenv('GEMINI_CACHE_BACKEND', 'mongo').lower()  # mongo, disk or none
+GEMINI_CACHE_TTL = int(os.getenv('GEMINI_CACHE_TTL', 7 * 24 * 3600))  # seconds a cached Gemini response is reused
+GEMINI_CACHE_MAX_ENTRIES = int(os.getenv('GEMINI_CACHE_MAX_ENTRIES', 5000))  # mongo backend: least recently hit entries beyond this are evicted
+GEMINI_CACHE_DIR = os.getenv('GEMINI_CACHE_DIR', '/tmp/gemini-cache')  # disk backend directory
+GEMINI_CACHE_MAX_BYTES = int(os.getenv('GEMINI_CACHE_MAX_BYTES', 200 * 1024 * 1024))  # disk backend: least recently hit files beyond this are evicted
+FIGURE_COMPRESS_FULL_RESPONSE = os.getenv('FIGURE_COMPRESS_FULL_RESPONSE', 'true').lower() == 'true'  # store full_response zlib-compressed
+SEARCH_INDEX_REFRESH_INTERVAL = 30  # seconds between picking up figures inserted by other instances
+SEARCH_INDEX_REBUILD_INTERVAL = 600  # seconds between full rebuilds (drops deleted figures)
+VOICE_LIBRARY_TTL = 300  # seconds the ElevenLabs voice listing is reused before refetching
+VOICE_LIBRARY_RETRY_AFTER = 30  # seconds after a failed voice listing before it is fetched again
+VOICE_MATCH_TIE_MARGIN = 0.05  # voices scoring within this of the best are considered tied
+VOICE_MATCH_TIE_CANDIDATES = 5  # at most this many tied voices are shown to Gemini
+AGENT_VALIDITY_TTL = 300  # seconds an agent validity check is served without revalidation
+AGENT_VALIDITY_STALE_TTL = 3600  # seconds a stale check is served while revalidating in the background
+AGENT_USAGE_WRITE_INTERVAL = 60  # seconds between last_used_at writes for the same agent
+AGENT_USAGE_TRACKED_MAX = 10000  # agents whose last write time is remembered (least recently used dropped first)
+AGENT_USAGE_MAX_PENDING = 1000  # queued last_used_at writes beyond which usage is not recorded
+PIPELINE_TIMINGS_SAMPLE = 200  # most recent agent creations aggregated by /api/pipeline-timings
+PIPELINE_STAGE_WORKERS = int(os.getenv('PIPELINE_STAGE_WORKERS', 8))  # concurrent pipeline stages per instance
+AGENT_EVICTION_WORKERS = 4  # concurrent ElevenLabs agent deletions when enforcing MAX_AGENTS
+
+# Identifies this process when holding cross-instance leases in MongoDB
+INSTANCE_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
 
 # Historical figure questions - comprehensive list to paint a complete picture
+# Grouped by category; question numbers (Q1, Q2, ...) follow this order across categories
+HISTORICAL_FIGURE_QUESTION_CATEGORIES = {
+    "Basic Information": [
+        "What is their full name and any known aliases or nicknames?",
+        "What is their date of birth and date of death (or current age if alive)?",
+        "What time period did they live in (specific years and era)?",
+        "Where were they born (city, country, region)?",
+        "Where did they primarily live and work throughout their life?",
+        "What was their nationality and cultural background?"
+    ],
+    
+    "What They're Known For": [
+        "What are they most famous or known for?",
+        "What are their primary achievements or accomplishments?",
+        "What profession, occupation, or role did they hold?",
+        "What significant contributions did they make to their field or society?",
+        "What works, inventions, or creations are they associated with?",
+        "What historical events were they involved in or connected to?"
+    ],
+    
+    "Physical Characteristics & Voice": [
+        "What did they look like physically (height, build, distinctive features)?",
+        "What was their typical appearance or style of dress?",
+        "What did their voice sound like (tone, pitch, accent, quality)?",
+        "Did they have any distinctive vocal characteristics or speech patterns?",
+        "What was their speaking style (fast, slow, measured, animated)?",
+        "Did they have any physical disabilities, conditions, or notable health issues?"
+    ],
+    
+    "Personality & Character": [
+        "What was their overall personality like?",
+        "What were their key personality traits (both positive and negative)?",
+        "How would you describe their temperament and demeanor?",
+        "What were their core values and beliefs?",
+        "What motivated them in life?",
+        "How did they interact with others (social, reserved, charismatic, etc.)?",
+        "What was their sense of humor like, if any?"
+    ],
+    
+    "Quirks & Habits": [
+        "What were their personal quirks, habits, or idiosyncrasies?",
+        "Did they have any unusual routines, rituals, or daily practices?",
+        "What were their hobbies, interests, or pastimes?",
+        "Did they have any notable habits or mannerisms?",
+        "What were their preferences in food, drink, or lifestyle?",
+        "Did they have any superstitions or unusual beliefs?"
+    ],
+    
+    "Scandals & Controversies": [
+        "Were they involved in any scandals or controversies?",
+        "What were the major controversies or criticisms surrounding them?",
+        "Did they have any enemies or notable conflicts?",
+        "What were the darker aspects or negative aspects of their character?",
+        "Were there any legal issues, trials, or legal problems in their life?"
+    ],
+    
+    "Vernacular & Speech Patterns": [
+        "What was their typical vocabulary and word choice like?",
+        "Did they use any distinctive phrases, catchphrases, or expressions?",
+        "What was their accent or dialect?",
+        "How formal or informal was their speech?",
+        "Did they use any specific terminology, jargon, or specialized language?",
+        "What was their writing style like (if they wrote)?",
+        "Did they have any speech impediments or unique speech characteristics?"
+    ],
+    
+    "Relationships & Social Life": [
+        "Who were the important people in their life (family, friends, colleagues)?",
+        "What was their family background and upbringing like?",
+        "Did they have romantic relationships, marriages, or significant partnerships?",
+        "Who were their mentors, influences, or people they admired?",
+        "Who were their contemporaries or people they interacted with?",
+        "What was their relationship with the public or their audience?"
+    ],
+    
+    "Education & Background": [
+        "What was their educational background?",
+        "What was their socioeconomic background?",
+        "What early life experiences shaped them?",
+        "What challenges or obstacles did they face in their life?"
+    ],
+    
+    "Legacy & Impact": [
+        "What is their historical legacy and impact?",
+        "How are they remembered today?",
+        "What myths, misconceptions, or common misunderstandings exist about them?"
+    ],
+    
+    "Communication & Expression": [
+        "How did they prefer to communicate (written letters, speeches, conversations, etc.)?",
+        "What were their most famous or memorable quotes or sayings?",
+        "How did they express emotions (stoic, emotional, reserved, demonstrative)?",
+        "Was there a difference between their public persona and private self?",
+        "How did they handle criticism or negative feedback?",
+        "What was their reaction to failure or setbacks?",
+        "How did they celebrate success or achievements?"
+    ],
+    
+    "Decision-Making & Work Style": [
+        "How did they make important decisions (impulsive, methodical, consultative, intuitive)?",
+        "What were their work habits (morning person, night owl, workaholic, balanced)?",
+        "How did they approach problem-solving?",
+        "What was their relationship with authority (rebel, conformist, leader, follower)?",
+        "How adaptable were they to change and new circumstances?"
+    ],
+    
+    "Psychological & Emotional Depth": [
+        "What were their greatest fears or anxieties?",
+        "What kept them awake at night or worried them most?",
+        "What were their deepest regrets, if any?",
+        "What brought them the most joy or satisfaction?",
+        "How did they cope with stress or pressure?",
+        "What were their coping mechanisms during difficult times?"
+    ],
+    
+    "Philosophical & Spiritual": [
+        "What were their philosophical views on life, death, and purpose?",
+        "What were their spiritual or religious beliefs and practices?",
+        "How did they view their place in the world or universe?",
+        "What did they believe about human nature?"
+    ],
+    
+    "Cultural & Intellectual": [
+        "What was their relationship with the arts (music, literature, visual arts)?",
+        "What books, authors, or intellectual works influenced them?",
+        "How did they engage with the culture and society of their time?",
+        "What was their relationship with technology or innovation of their era?",
+        "Did they travel extensively? Where and how did travel influence them?"
+    ],
+    
+    "Health & Aging": [
+        "How did their health change over time?",
+        "How did aging affect their work, personality, or outlook?",
+        "What were their final years like?",
+        "What were their last words or final thoughts (if documented)?"
+    ],
+    
+    "Influence & Impact on Others": [
+        "How did they influence or inspire people around them?",
+        "What was their leadership style (if applicable)?",
+        "How did they mentor or teach others?",
+        "What was their impact on future generations?"
+    ],
+    
+    "Context & Environment": [
+        "What was the political climate during their lifetime?",
+        "What major social or cultural movements were happening during their era?",
+        "How did historical events of their time shape them?",
+        "What was daily life like during their time period?"
+    ]
+}
+
 HISTORICAL_FIGURE_QUESTIONS = [
-    # Basic Information
-    "What is their full name and any known aliases or nicknames?",
-    "What is their date of birth and date of death (or current age if alive)?",
-    "What time period did they live in (specific years and era)?",
-    "Where were they born (city, country, region)?",
-    "Where did they primarily live and work throughout their life?",
-    "What was their nationality and cultural background?",
-    
-    # What They're Known For
-    "What are they most famous or known for?",
-    "What are their primary achievements or accomplishments?",
-    "What profession, occupation, or role did they hold?",
-    "What significant contributions did they make to their field or society?",
-    "What works, inventions, or creations are they associated with?",
-    "What historical events were they involved in or connected to?",
-    
-    # Physical Characteristics & Voice
-    "What did they look like physically (height, build, distinctive features)?",
-    "What was their typical appearance or style of dress?",
-    "What did their voice sound like (tone, pitch, accent, quality)?",
-    "Did they have any distinctive vocal characteristics or speech patterns?",
-    "What was their speaking style (fast, slow, measured, animated)?",
-    "Did they have any physical disabilities, conditions, or notable health issues?",
-    
-    # Personality & Character
-    "What was their overall personality like?",
-    "What were their key personality traits (both positive and negative)?",
-    "How would you describe their temperament and demeanor?",
-    "What were their core values and beliefs?",
-    "What motivated them in life?",
-    "How did they interact with others (social, reserved, charismatic, etc.)?",
-    "What was their sense of humor like, if any?",
-    
-    # Quirks & Habits
-    "What were their personal quirks, habits, or idiosyncrasies?",
-    "Did they have any unusual routines, rituals, or daily practices?",
-    "What were their hobbies, interests, or pastimes?",
-    "Did they have any notable habits or mannerisms?",
-    "What were their preferences in food, drink, or lifestyle?",
-    "Did they have any superstitions or unusual beliefs?",
-    
-    # Scandals & Controversies
-    "Were they involved in any scandals or controversies?",
-    "What were the major controversies or criticisms surrounding them?",
-    "Did they have any enemies or notable conflicts?",
-    "What were the darker aspects or negative aspects of their character?",
-    "Were there any legal issues, trials, or legal problems in their life?",
-    
-    # Vernacular & Speech Patterns
-    "What was their typical vocabulary and word choice like?",
-    "Did they use any distinctive phrases, catchphrases, or expressions?",
-    "What was their accent or dialect?",
-    "How formal or informal was their speech?",
-    "Did they use any specific terminology, jargon, or specialized language?",
-    "What was their writing style like (if they wrote)?",
-    "Did they have any speech impediments or unique speech characteristics?",
-    
-    # Relationships & Social Life
-    "Who were the important people in their life (family, friends, colleagues)?",
-    "What was their family background and upbringing like?",
-    "Did they have romantic relationships, marriages, or significant partnerships?",
-    "Who were their mentors, influences, or people they admired?",
-    "Who were their contemporaries or people they interacted with?",
-    "What was their relationship with the public or their audience?",
-    
-    # Education & Background
-    "What was their educational background?",
-    "What was their socioeconomic background?",
-    "What early life experiences shaped them?",
-    "What challenges or obstacles did they face in their life?",
-    
-    # Legacy & Impact
-    "What is their historical legacy and impact?",
-    "How are they remembered today?",
-    "What myths, misconceptions, or common misunderstandings exist about them?",
-    
-    # Communication & Expression
-    "How did they prefer to communicate (written letters, speeches, conversations, etc.)?",
-    "What were their most famous or memorable quotes or sayings?",
-    "How did they express emotions (stoic, emotional, reserved, demonstrative)?",
-    "Was there a difference between their public persona and private self?",
-    "How did they handle criticism or negative feedback?",
-    "What was their reaction to failure or setbacks?",
-    "How did they celebrate success or achievements?",
-    
-    # Decision-Making & Work Style
-    "How did they make important decisions (impulsive, methodical, consultative, intuitive)?",
-    "What were their work habits (morning person, night owl, workaholic, balanced)?",
-    "How did they approach problem-solving?",
-    "What was their relationship with authority (rebel, conformist, leader, follower)?",
-    "How adaptable were they to change and new circumstances?",
-    
-    # Psychological & Emotional Depth
-    "What were their greatest fears or anxieties?",
-    "What kept them awake at night or worried them most?",
-    "What were their deepest regrets, if any?",
-    "What brought them the most joy or satisfaction?",
-    "How did they cope with stress or pressure?",
-    "What were their coping mechanisms during difficult times?",
-    
-    # Philosophical & Spiritual
-    "What were their philosophical views on life, death, and purpose?",
-    "What were their spiritual or religious beliefs and practices?",
-    "How did they view their place in the world or universe?",
-    "What did they believe about human nature?",
-    
-    # Cultural & Intellectual
-    "What was their relationship with the arts (music, literature, visual arts)?",
-    "What books, authors, or intellectual works influenced them?",
-    "How did they engage with the culture and society of their time?",
-    "What was their relationship with technology or innovation of their era?",
-    "Did they travel extensively? Where and how did travel influence them?",
-    
-    # Health & Aging
-    "How did their health change over time?",
-    "How did aging affect their work, personality, or outlook?",
-    "What were their final years like?",
-    "What were their last words or final thoughts (if documented)?",
-    
-    # Influence & Impact on Others
-    "How did they influence or inspire people around them?",
-    "What was their leadership style (if applicable)?",
-    "How did they mentor or teach others?",
-    "What was their impact on future generations?",
-    
-    # Context & Environment
-    "What was the political climate during their lifetime?",
-    "What major social or cultural movements were happening during their era?",
-    "How did historical events of their time shape them?",
-    "What was daily life like during their time period?"
+    question
+    for questions in HISTORICAL_FIGURE_QUESTION_CATEGORIES.values()
+    for question in questions
 ]
 
+# Metrics (served at /metrics in the Prometheus text format)
+HTTP_REQUEST_SECONDS = Histogram('http_request_duration_seconds', 'Flask request latency (time to response headers for streams).', ('method', 'route', 'status'))
+HTTP_REQUESTS_IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests currently being handled by this instance.')
+GEMINI_REQUEST_SECONDS = Histogram('gemini_request_duration_seconds', 'Gemini generate_content latency per attempt.', ('model', 'operation', 'outcome'))
+GEMINI_TOKENS = Counter('gemini_tokens_total', 'Gemini tokens reported in usage metadata.', ('model', 'operation', 'kind'))
+GEMINI_CACHE_EVENTS = Counter('gemini_cache_events_total', 'Gemini response cache lookups and writes.', ('event',))
+ELEVENLABS_REQUEST_SECONDS = Histogram('elevenlabs_request_duration_seconds', 'ElevenLabs API latency per attempt.', ('operation', 'status'))
+MONGO_COMMAND_SECONDS = Histogram('mongodb_command_duration_seconds', 'MongoDB command latency.', ('command', 'outcome'))
+RETRIES = Counter('dependency_retries_total', 'Retried calls to external dependencies.', ('dependency', 'operation'))
+RETRY_BACKOFF_SECONDS = Counter('dependency_retry_backoff_seconds_total', 'Time spent sleeping before retries.', ('dependency',))
+CREATION_JOBS_IN_FLIGHT = Gauge('creation_jobs_in_flight', 'Background creation jobs currently running on this instance.')
+AGENT_CREATIONS_IN_FLIGHT = Gauge('agent_creations_in_flight', 'ElevenLabs agent creations currently running on this instance.')
+AGENTS_CURRENT = Gauge('elevenlabs_agents', 'Figures that currently have an ElevenLabs agent.')
+AGENTS_MAX = Gauge('elevenlabs_agents_max', 'Agent limit enforced by eviction (MAX_AGENTS).')
+AGENTS_MAX.set_function(lambda: MAX_AGENTS)
+RATE_LIMIT_WAIT_SECONDS = Histogram('rate_limit_wait_seconds', 'Time spent waiting for a cluster-wide rate limit token.', ('bucket',))
+RATE_LIMIT_REJECTIONS = Counter('rate_limit_rejections_total', 'Calls that gave up waiting for a rate limit token.', ('bucket',))
+GEMINI_CIRCUIT_STATE = Gauge('gemini_circuit_state', 'Gemini circuit breaker state per model (0 closed, 1 half-open, 2 open).', ('model',))
+GEMINI_CALLS_REJECTED = Counter('gemini_calls_rejected_total', 'Gemini calls failed fast without (further) attempts.', ('model', 'reason'))
+
+def record_retry(dependency: str, operation: str, delay: float):
+    """Count a retry and the backoff slept before it."""
+    RETRIES.inc(dependency=dependency, operation=operation)
+    RETRY_BACKOFF_SECONDS.inc(delay, dependency=dependency)
+    note_stage_retry()
+
+def observe_gemini_call(model_name: str, operation: str, start: float, response=None, error: bool = False):
+    """Record a Gemini attempt's latency and, when reported, its token usage."""
+    GEMINI_REQUEST_SECONDS.observe(
+        time.perf_counter() - start, model=model_name, operation=operation, outcome='error' if error else 'ok'
+    )
+    usage = getattr(response, 'usage_metadata', None) if response is not None else None
+    if usage:
+        GEMINI_TOKENS.inc(getattr(usage, 'prompt_token_count', 0) or 0, model=model_name, operation=operation, kind='prompt')
+        GEMINI_TOKENS.inc(getattr(usage, 'candidates_token_count', 0) or 0, model=model_name, operation=operation, kind='response')
+
+def track_in_flight(gauge: Gauge):
+    """Decorator keeping gauge at the number of calls currently running."""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            gauge.inc()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                gauge.dec()
+        return wrapper
+    return decorator
+
+class MongoMetricsListener(monitoring.CommandListener):
+    """Feeds MONGO_COMMAND_SECONDS from pymongo's command monitoring events."""
+    
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, outcome='ok')
+    
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.observe(event.duration_micros / 1e6, command=event.command_name, outcome='error')
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    HTTP_REQUESTS_IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start, method=request.method, route=route, status=str(response.status_code)
+        )
+    return response
+
+@app.teardown_request
+def finish_request(_error=None):
+    HTTP_REQUESTS_IN_FLIGHT.dec()
+
 # Initialize MongoDB client
-client = MongoClient(MONGO_URI)
+client = MongoClient(MONGO_URI, event_listeners=[MongoMetricsListener()])
 db = client[DATABASE_NAME]
 
 # Helper function to convert ObjectId to string
@@ -188,10 +387,490 @@ def serialize_doc(doc):
         doc['_id'] = str(doc['_id'])
     return doc
 
-# Helper function to get ElevenLabs headers
-def get_elevenlabs_headers() -> dict:
-    """Get standard ElevenLabs API headers."""
-    return {"xi-api-key": ELEVENLABS_API_KEY}
+def load_figure(doc: Optional[Dict]) -> Optional[Dict]:
+    """Figure document in the API (legacy) shape, whichever schema it is stored in."""
+    return serialize_doc(expand_figure(db, doc))
+
+FIELD_NAME_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+def parse_fields_param(value: Optional[str]) -> Optional[list]:
+    """
+    Parse a fields=a,b,c query parameter into a list of top-level field names.
+    Returns None when absent (whole document). Raises ValueError on invalid names.
+    """
+    if not value:
+        return None
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    invalid = [field for field in fields if not FIELD_NAME_PATTERN.match(field)]
+    if invalid:
+        raise ValueError(f"Invalid field name(s): {', '.join(invalid)}")
+    return fields or None
+
+def select_fields(doc: Dict, fields: Optional[list]) -> Dict:
+    """Keep only the requested fields (and _id) of a document."""
+    if not fields:
+        return doc
+    return {key: value for key, value in doc.items() if key == '_id' or key in fields}
+
+# Figure identity map
+# Each request (and background job) is a unit of work holding the full figure documents it
+# has loaded, keyed by person_name_lower. Reads go through it and writes update the tracked
+# document in place, so one create-with-agent run reads its figure from MongoDB once.
+_FIGURE_UNIT_OF_WORK = threading.local()
+
+class FigureIdentityMap:
+    """Full (API-shaped) figure documents loaded in one unit of work, by person_name_lower."""
+    
+    def __init__(self):
+        self._figures = {}
+        self._lock = threading.Lock()
+    
+    def get(self, person_lower: str) -> Optional[Dict]:
+        with self._lock:
+            return self._figures.get(person_lower)
+    
+    def add(self, person_lower: str, figure: Dict) -> Dict:
+        """Track a figure document; returns the tracked one (a document already tracked wins)."""
+        with self._lock:
+            return self._figures.setdefault(person_lower, figure)
+    
+    def update(self, person_lower: str, changes: Dict, unset: tuple = ()):
+        """Apply a write to the tracked document, if the figure is tracked."""
+        with self._lock:
+            figure = self._figures.get(person_lower)
+            if figure is None:
+                return
+            figure.update(changes)
+            for field in unset:
+                figure.pop(field, None)
+
+def current_figure_map() -> Optional[FigureIdentityMap]:
+    """The identity map of the current unit of work, or None outside one."""
+    return getattr(_FIGURE_UNIT_OF_WORK, 'figures', None)
+
+@contextlib.contextmanager
+def figure_unit_of_work():
+    """Run the block in a unit of work (joins the enclosing one, if any)."""
+    figures = current_figure_map()
+    if figures is not None:
+        yield figures
+        return
+    figures = _FIGURE_UNIT_OF_WORK.figures = FigureIdentityMap()
+    try:
+        yield figures
+    finally:
+        _FIGURE_UNIT_OF_WORK.figures = None
+
+def update_tracked_figure(person_lower: str, changes: Dict, unset: tuple = ()):
+    """Mirror a figure write into the current unit of work. No-op outside one."""
+    figures = current_figure_map()
+    if figures is not None:
+        figures.update(person_lower, changes, unset)
+
+@app.before_request
+def open_figure_unit_of_work():
+    _FIGURE_UNIT_OF_WORK.figures = FigureIdentityMap()
+
+@app.teardown_request
+def close_figure_unit_of_work(_error=None):
+    _FIGURE_UNIT_OF_WORK.figures = None
+
+def compress_response(response: Response) -> Response:
+    """
+    Compress a response body with br (if brotli is installed) or gzip, according to
+    the request's Accept-Encoding. Small, streamed or already-encoded responses are left as is.
+    """
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers):
+        return response
+    
+    offered = ['br', 'gzip'] if brotli else ['gzip']
+    encoding = request.accept_encodings.best_match(offered)
+    if not encoding:
+        return response
+    
+    body = response.get_data()
+    if len(body) < COMPRESSION_MIN_BYTES:
+        return response
+    
+    if encoding == 'br':
+        body = brotli.compress(body, quality=5)
+    else:
+        body = gzip.compress(body, compresslevel=6)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+# ElevenLabs HTTP client
+# One keep-alive session shared by every ElevenLabs call, so agent creation (5-8 sequential
+# requests) reuses a pooled TLS connection instead of handshaking for each request.
+class ElevenLabsClient:
+    """
+    Pooled ElevenLabs API client with per-operation timeouts, jittered retries on
+    429/5xx and per-operation latency counters. If rate_limit is given, it is called
+    with the operation's endpoint class before every attempt (and may wait).
+    """
+    
+    # (connect, read) timeouts in seconds per operation
+    TIMEOUTS = {
+        'list_voices': (5, 20),
+        'design_voice': (5, 60),
+        'create_voice': (5, 30),
+        'create_agent': (5, 30),
+        'add_knowledge': (5, 30),
+        'get_agent': (5, 10),
+        'check_agent': (3, 5),
+        'delete_agent': (5, 15),
+        'start_conversation': (5, 15),
+    }
+    DEFAULT_TIMEOUT = (5, 30)
+    # Endpoint class (rate limit bucket) per operation
+    ENDPOINT_CLASSES = {
+        'list_voices': 'voices',
+        'design_voice': 'voice_design',
+        'create_voice': 'voice_design',
+        'create_agent': 'agents',
+        'add_knowledge': 'agents',
+        'delete_agent': 'agents',
+        'get_agent': 'agent_reads',
+        'check_agent': 'agent_reads',
+        'start_conversation': 'conversations',
+    }
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    IDEMPOTENT_METHODS = {'GET', 'HEAD', 'DELETE'}
+    
+    def __init__(self, api_key: Optional[str], base_url: str, max_retries: int = 3,
+                 pool_size: int = 16, backoff_base: float = 0.5, backoff_max: float = 8.0,
+                 rate_limit: Optional[Callable[[str], None]] = None):
+        self.base_url = base_url.rstrip('/')
+        self.rate_limit = rate_limit
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        if api_key:
+            self.session.headers['xi-api-key'] = api_key
+        self._stats_lock = threading.Lock()
+        self._stats = {}
+    
+    def _record(self, operation: str, elapsed: float, error: bool = False, retried: bool = False):
+        with self._stats_lock:
+            stats = self._stats.setdefault(operation, {
+                'count': 0, 'errors': 0, 'retries': 0, 'total_ms': 0.0, 'max_ms': 0.0
+            })
+            stats['count'] += 1
+            stats['errors'] += int(error)
+            stats['retries'] += int(retried)
+            stats['total_ms'] += elapsed * 1000
+            stats['max_ms'] = max(stats['max_ms'], elapsed * 1000)
+    
+    def _backoff_delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Retry-After if the server sent one, otherwise full-jitter exponential backoff."""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+    
+    @staticmethod
+    def _not_sent(error: requests.exceptions.RequestException) -> bool:
+        """True if the request failed before a connection was made (safe to send again)."""
+        if isinstance(error, requests.exceptions.ConnectTimeout):
+            return True
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(error, requests.exceptions.ConnectionError) and isinstance(reason, NewConnectionError)
+    
+    def request(self, operation: str, method: str, path: str, max_retries: Optional[int] = None, **kwargs) -> requests.Response:
+        """
+        Send a request to the ElevenLabs API.
+        429 responses and connect failures are retried for every method; 5xx responses and
+        read timeouts only for idempotent methods, so a POST that may have been applied is
+        never replayed. Returns the final response (callers check status codes as before).
+        """
+        method = method.upper()
+        url = f"{self.base_url}{path}"
+        kwargs.setdefault('timeout', self.TIMEOUTS.get(operation, self.DEFAULT_TIMEOUT))
+        retries = self.max_retries if max_retries is None else max_retries
+        idempotent = method in self.IDEMPOTENT_METHODS
+        
+        for attempt in range(retries + 1):
+            if self.rate_limit:
+                self.rate_limit(self.ENDPOINT_CLASSES.get(operation, 'agents'))
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                can_retry = self._not_sent(e) or idempotent and isinstance(
+                    e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+                )
+                elapsed = time.perf_counter() - start
+                self._record(operation, elapsed, error=True, retried=can_retry and attempt < retries)
+                ELEVENLABS_REQUEST_SECONDS.observe(elapsed, operation=operation, status='error')
+                if can_retry and attempt < retries:
+                    delay = self._backoff_delay(attempt)
+                    record_retry('elevenlabs', operation, delay)
+                    time.sleep(delay)
+                    continue
+                raise
+            
+            should_retry = response.status_code in self.RETRY_STATUSES and (
+                response.status_code == 429 or idempotent
+            ) and attempt < retries
+            elapsed = time.perf_counter() - start
+            self._record(operation, elapsed, error=response.status_code >= 400, retried=should_retry)
+            ELEVENLABS_REQUEST_SECONDS.observe(elapsed, operation=operation, status=str(response.status_code))
+            if not should_retry:
+                return response
+            
+            delay = self._backoff_delay(attempt, response)
+            record_retry('elevenlabs', operation, delay)
+            print(f"⚠️  ElevenLabs {operation} returned {response.status_code}, retrying in {delay:.1f}s...")
+            time.sleep(delay)
+        
+        return response
+    
+    def get(self, operation: str, path: str, **kwargs) -> requests.Response:
+        return self.request(operation, 'GET', path, **kwargs)
+    
+    def post(self, operation: str, path: str, **kwargs) -> requests.Response:
+        return self.request(operation, 'POST', path, **kwargs)
+    
+    def delete(self, operation: str, path: str, **kwargs) -> requests.Response:
+        return self.request(operation, 'DELETE', path, **kwargs)
+    
+    def stats(self) -> dict:
+        """Per-operation call counts and latency (ms)."""
+        with self._stats_lock:
+            return {
+                operation: {
+                    **stats,
+                    'avg_ms': round(stats['total_ms'] / stats['count'], 1) if stats['count'] else 0.0,
+                    'total_ms': round(stats['total_ms'], 1),
+                    'max_ms': round(stats['max_ms'], 1)
+                }
+                for operation, stats in self._stats.items()
+            }
+
+elevenlabs = ElevenLabsClient(
+    ELEVENLABS_API_KEY,
+    ELEVENLABS_API_BASE,
+    rate_limit=lambda endpoint_class: acquire_rate_limit(f"elevenlabs:{endpoint_class}", ELEVENLABS_RATE_LIMITS[endpoint_class])
+)
+
+class VoiceLibraryCache:
+    """
+    TTL cache of the ElevenLabs voice library (GET /v1/voices), shared by voice creation,
+    fallback selection and default voice lookup. Keeps a lowercase name index so checking
+    for an existing voice is a dict lookup. Invalidated whenever we create a voice.
+    """
+    
+    def __init__(self, ttl: int, retry_after: int):
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._voices = None
+        self._by_name = {}
+        self._match_index = None
+        self._fetched_at = 0.0
+        self._retry_at = 0.0  # after a failed fetch, no new one before this time
+        self._fetch_done = None  # set when the fetch in progress finishes
+        self._generation = 0  # bumped by invalidate()
+    
+    def get_voices(self) -> list:
+        """
+        Return the voice list, refetching it if it is older than the TTL. One caller fetches,
+        without the lock (the request may wait for a rate limit token); the others serve the
+        previous listing meanwhile, or wait for the fetch if there is none yet. After a failed
+        fetch the previous listing is served for retry_after seconds.
+        """
+        with self._lock:
+            now = time.time()
+            if self._voices is not None and now - self._fetched_at < self.ttl:
+                return self._voices
+            if now < self._retry_at:
+                return self._voices or []
+            fetching = self._fetch_done is None
+            if fetching:
+                fetch_done = self._fetch_done = threading.Event()
+                generation = self._generation
+            elif self._voices is not None:
+                return self._voices
+            else:
+                fetch_done = self._fetch_done
+        
+        if not fetching:
+            # Nothing to serve yet: wait for the fetch in progress
+            fetch_done.wait()
+            with self._lock:
+                return self._voices or []
+        
+        try:
+            return self._fetch(generation)
+        finally:
+            with self._lock:
+                self._fetch_done = None
+            fetch_done.set()
+    
+    def _fetch(self, generation: int) -> list:
+        try:
+            response = elevenlabs.get('list_voices', '/voices')
+        except Exception:
+            self._fetch_failed()
+            raise
+        voices = None
+        if response is None or response.status_code != 200:
+            print(f"⚠️  Could not list ElevenLabs voices ({response.status_code if response is not None else 'no response'})")
+        else:
+            try:
+                voices = response.json().get('voices', [])
+            except ValueError as e:
+                print(f"⚠️  Could not parse ElevenLabs voice listing: {e}")
+        if voices is None:
+            self._fetch_failed()
+            # Serve the stale listing rather than nothing
+            with self._lock:
+                return self._voices or []
+        
+        with self._lock:
+            self._voices = voices
+            self._by_name = {voice.get('name', '').lower().strip(): voice for voice in voices}
+            self._match_index = None  # rebuilt lazily for the new listing
+            # A voice created while this listing was fetched may be missing from it: refetch on next use
+            self._fetched_at = time.time() if generation == self._generation else 0.0
+            self._retry_at = 0.0
+        return voices
+    
+    def _fetch_failed(self):
+        with self._lock:
+            self._retry_at = time.time() + self.retry_after
+    
+    def match_index_for(self, voices: list) -> 'VoiceMatchIndex':
+        """Voice match index for a voice list; built once per library listing."""
+        with self._lock:
+            if voices is not self._voices:
+                return VoiceMatchIndex(voices)
+            if self._match_index is None:
+                self._match_index = VoiceMatchIndex(voices)
+            return self._match_index
+    
+    def find_voice_for_person(self, person_name: str) -> Optional[dict]:
+        """Find a voice we previously created for this person ('<name> Voice') or one named after them."""
+        self.get_voices()
+        person_lower = person_name.lower().strip()
+        with self._lock:
+            return self._by_name.get(f"{person_lower} voice") or self._by_name.get(person_lower)
+    
+    def invalidate(self):
+        with self._lock:
+            self._voices = None
+            self._by_name = {}
+            self._match_index = None
+            self._retry_at = 0.0
+            self._generation += 1
+
+VOICE_LIBRARY = VoiceLibraryCache(VOICE_LIBRARY_TTL, VOICE_LIBRARY_RETRY_AFTER)
+
+class AgentValidityCache:
+    """
+    Cache of "does this ElevenLabs agent still exist" checks for the agent-status endpoint.
+    Results live in memory and on the figure document (agent_valid / agent_checked_at), so
+    other instances and cold starts reuse them. Fresh results are served directly; stale
+    ones (up to AGENT_VALIDITY_STALE_TTL) are served while a background refresh runs.
+    """
+    
+    def __init__(self, ttl: int, stale_ttl: int):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._entries = {}  # agent_id -> (valid, checked_at epoch seconds)
+        self._refreshing = set()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='agent-validity')
+    
+    def get(self, agent_id: str, figure: Optional[dict] = None) -> bool:
+        """
+        Whether the agent is valid. figure may carry the persisted agent_valid /
+        agent_checked_at fields (already loaded by the caller, so no extra read).
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(agent_id)
+        
+        if figure and figure.get('agent_checked_at') is not None:
+            checked_at = figure['agent_checked_at'].replace(tzinfo=timezone.utc).timestamp()
+            if entry is None or checked_at > entry[1]:
+                entry = (bool(figure.get('agent_valid')), checked_at)
+                with self._lock:
+                    self._entries[agent_id] = entry
+        
+        if entry is None:
+            # Never checked: the first caller pays for one synchronous check
+            valid = self.refresh(agent_id)
+            return bool(valid)
+        
+        valid, checked_at = entry
+        age = now - checked_at
+        if age >= self.stale_ttl:
+            refreshed = self.refresh(agent_id)
+            return valid if refreshed is None else refreshed
+        if age >= self.ttl:
+            self._refresh_in_background(agent_id)
+        return valid
+    
+    def refresh(self, agent_id: str) -> Optional[bool]:
+        """Check the agent against ElevenLabs and store the result. None if the check failed."""
+        try:
+            # Single attempt: this can be on the user's critical path
+            response = elevenlabs.get('check_agent', f"/convai/agents/{agent_id}", max_retries=0)
+        except Exception as e:
+            print(f"⚠️  Could not check agent {agent_id}: {e}")
+            return None
+        
+        if response.status_code == 200:
+            valid = True
+        elif response.status_code in [404, 422]:
+            valid = False
+        else:
+            # Rate limits or outages say nothing about the agent
+            return None
+        self.set(agent_id, valid)
+        return valid
+    
+    def _refresh_in_background(self, agent_id: str):
+        with self._lock:
+            if agent_id in self._refreshing:
+                return
+            self._refreshing.add(agent_id)
+        
+        def run():
+            try:
+                self.refresh(agent_id)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(agent_id)
+        
+        self._executor.submit(run)
+    
+    def set(self, agent_id: str, valid: bool, persist: bool = True):
+        """Record a known validity (e.g. right after creating or deleting the agent)."""
+        with self._lock:
+            self._entries[agent_id] = (valid, time.time())
+        if persist:
+            try:
+                db[HISTORICAL_FIGURES_COLLECTION].update_one(
+                    {'elevenlabs_agent_id': agent_id},
+                    {'$set': {'agent_valid': valid, 'agent_checked_at': utc_now()}}
+                )
+            except Exception as e:
+                print(f"⚠️  Could not persist validity for agent {agent_id}: {e}")
+
+AGENT_VALIDITY = AgentValidityCache(AGENT_VALIDITY_TTL, AGENT_VALIDITY_STALE_TTL)
 
 # Helper function to format figure data for frontend
 def format_figure_for_list(fig: dict) -> dict:
@@ -204,26 +883,544 @@ def format_figure_for_list(fig: dict) -> dict:
         'voice_id': fig.get('elevenlabs_voice_id')
     }
 
-# Initialize database (creates it if it doesn't exist)
-def init_database():
-    """Initialize the database by creating a test collection if needed"""
+# Collection for historical figures
+HISTORICAL_FIGURES_COLLECTION = 'historical_figures'
+# Collection holding cross-instance profile generation leases (one document per person_name_lower)
+FIGURE_LEASES_COLLECTION = 'figure_generation_leases'
+# Collection holding background job progress
+JOBS_COLLECTION = 'jobs'
+# Collection holding small bookkeeping documents (index provisioning marker, etc.)
+META_COLLECTION = '_meta'
+# Collection holding cached Gemini responses (one document per prompt hash)
+GEMINI_CACHE_COLLECTION = 'gemini_response_cache'
+# Collection holding cluster-wide rate limit buckets (one document per bucket)
+RATE_LIMIT_COLLECTION = 'rate_limits'
+
+# Cluster-wide rate limits
+# Gemini and ElevenLabs quotas are per project/account, not per instance, so every instance
+# takes a token from shared buckets in MongoDB (see rate_limit.py) before each call and
+# waits for the refill when the quota is used up, instead of bursting into 429 backoff.
+RATE_LIMITER = TokenBucketLimiter(db[RATE_LIMIT_COLLECTION]) if RATE_LIMITING else None
+
+def acquire_rate_limit(bucket: str, limit: tuple, max_wait: float = RATE_LIMIT_MAX_WAIT,
+                       use_budget: bool = True):
+    """
+    Wait (at most max_wait seconds) for a token from bucket, limited to (requests per
+    minute, burst). On request threads the wait is bounded by, and drawn from, the
+    request's retry budget unless use_budget is False.
+    """
+    if RATE_LIMITER is None:
+        return
+    requests_per_minute, burst = limit
+    budget = current_retry_budget() if use_budget else None
+    max_wait = min(max_wait, RATE_LIMIT_MAX_WAIT)
+    if budget is not None:
+        max_wait = min(max_wait, budget.remaining)
+    try:
+        waited = RATE_LIMITER.acquire(bucket, requests_per_minute / 60.0, burst, max_wait)
+    except DependencyUnavailable:
+        RATE_LIMIT_REJECTIONS.inc(bucket=bucket)
+        raise
+    RATE_LIMIT_WAIT_SECONDS.observe(waited, bucket=bucket)
+    if budget is not None:
+        budget.spend(min(waited, budget.remaining))
+
+# META_COLLECTION document whose counter changes whenever the figure listing changes
+FIGURES_VERSION_ID = 'figures_version'
+
+def bump_figures_version():
+    """Record a change to the figure listing (new figure, agent added or removed)."""
     try:
-        test_collection = db['_init']
-        test_collection.insert_one({'init': True})
-        test_collection.delete_one({'init': True})
-        print(f"Database '{DATABASE_NAME}' initialized successfully")
+        db[META_COLLECTION].update_one(
+            {'_id': FIGURES_VERSION_ID},
+            {'$inc': {'version': 1}, '$set': {'updated_at': utc_now()}},
+            upsert=True
+        )
     except Exception as e:
-        print(f"Warning: Could not initialize database: {e}")
+        print(f"⚠️  Could not bump figures version: {e}")
 
-# Initialize database on startup
-init_database()
+def get_figures_version() -> int:
+    """Current figure listing version (0 before the first recorded change)."""
+    meta = db[META_COLLECTION].find_one({'_id': FIGURES_VERSION_ID}, {'version': 1}) or {}
+    return meta.get('version', 0)
 
-# Collection for historical figures
-HISTORICAL_FIGURES_COLLECTION = 'historical_figures'
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key within this process.
+    The first caller runs the function; concurrent callers for the same key block
+    until it finishes and receive a copy of its result (or its exception).
+    """
+    
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+    
+    def do(self, key: str, fn: Callable):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = SingleFlight._Call()
+                self._calls[key] = call
+        
+        if not is_leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result)
+        
+        try:
+            call.result = fn()
+            return copy.deepcopy(call.result)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+# In-process coalescing of profile generation, keyed by person_name_lower
+_FIGURE_GENERATION_FLIGHTS = SingleFlight()
+def acquire_figure_lease(person_lower: str) -> bool:
+    """
+    Try to take the cross-instance generation lease for a figure.
+    Returns True if this instance now owns the lease, False if another live instance holds it.
+    """
+    leases = db[FIGURE_LEASES_COLLECTION]
+    now = utc_now()
+    lease = {
+        'owner': INSTANCE_ID,
+        'acquired_at': now,
+        'expires_at': now + timedelta(seconds=FIGURE_LEASE_TTL)
+    }
+    
+    try:
+        leases.insert_one({'_id': person_lower, **lease})
+        return True
+    except DuplicateKeyError:
+        pass
+    
+    # Take over a lease left behind by an instance that crashed or timed out
+    taken = leases.find_one_and_update(
+        {'_id': person_lower, 'expires_at': {'$lt': now}},
+        {'$set': lease}
+    )
+    return taken is not None
+
+def release_figure_lease(person_lower: str):
+    """Release the generation lease if this instance still owns it."""
+    try:
+        db[FIGURE_LEASES_COLLECTION].delete_one({'_id': person_lower, 'owner': INSTANCE_ID})
+    except Exception as e:
+        print(f"⚠️  Could not release generation lease for {person_lower}: {e}")
+
+# Index provisioning
+# Every lookup path keys on these fields; without the indexes each one is a collection scan.
+# Indexes are created once per deploy: the first instance that sees a new spec version
+# creates them and records the version in META_COLLECTION; later cold starts only read the marker.
+JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+INDEX_SPECS = [
+    # (collection, keys, options)
+    (HISTORICAL_FIGURES_COLLECTION, [('person_name_lower', 1)], {'unique': True}),
+    (HISTORICAL_FIGURES_COLLECTION, [('elevenlabs_agent_id', 1)], {'sparse': True}),
+    # LRU eviction: least recently used agents first, only figures that have an agent
+    (HISTORICAL_FIGURES_COLLECTION, [('last_used_at', 1)],
+     {'partialFilterExpression': {'elevenlabs_agent_id': {'$exists': True}}}),
+    (FIGURE_LEASES_COLLECTION, [('expires_at', 1)], {'expireAfterSeconds': 0}),
+    # At most one active job per type and figure, even when two requests race to enqueue one.
+    # Keyed on the boolean 'active' flag: equality filters work on every server version,
+    # '$in' in a partialFilterExpression needs MongoDB 6.0+
+    (JOBS_COLLECTION, [('type', 1), ('person_name_lower', 1)],
+     {'unique': True, 'partialFilterExpression': {'active': True}}),
+    (JOBS_COLLECTION, [('created_at', 1)], {'expireAfterSeconds': JOB_RETENTION_SECONDS}),
+    (HISTORICAL_FIGURES_COLLECTION, [('pipeline_timings.recorded_at', -1)], {'sparse': True}),
+    (GEMINI_CACHE_COLLECTION, [('expires_at', 1)], {'expireAfterSeconds': 0}),
+    (GEMINI_CACHE_COLLECTION, [('last_hit_at', 1)], {}),
+]
+
+# Indexes dropped from INDEX_SPECS; ensure_indexes removes them from existing deployments
+OBSOLETE_INDEXES = [
+    # (collection, index name)
+    (HISTORICAL_FIGURES_COLLECTION, 'created_at_1'),
+    (HISTORICAL_FIGURES_COLLECTION, 'updated_at_1'),
+    (JOBS_COLLECTION, 'type_1_person_name_lower_1_status_1'),
+]
+
+# Index options compared with existing indexes; an index whose options changed is rebuilt
+INDEX_OPTIONS = ('unique', 'sparse', 'partialFilterExpression', 'expireAfterSeconds')
+
+def index_name(keys: list) -> str:
+    """Default MongoDB index name for a key list, e.g. [('a', 1), ('b', -1)] -> 'a_1_b_-1'."""
+    return '_'.join(f"{field}_{direction}" for field, direction in keys)
+
+INDEX_SPEC_VERSION = hashlib.sha1(json.dumps(
+    [[collection_name, keys, options] for collection_name, keys, options in INDEX_SPECS] + OBSOLETE_INDEXES,
+    sort_keys=True
+).encode('utf-8')).hexdigest()[:12]
+
+def find_missing_indexes() -> list:
+    """Return the expected indexes that don't exist, as [{'collection', 'name'}]."""
+    missing = []
+    existing_by_collection = {}
+    for collection_name, keys, options in INDEX_SPECS:
+        if collection_name not in existing_by_collection:
+            existing_by_collection[collection_name] = set(db[collection_name].index_information().keys())
+        name = index_name(keys)
+        if name not in existing_by_collection[collection_name]:
+            missing.append({'collection': collection_name, 'name': name})
+    return missing
+
+def ensure_indexes() -> list:
+    """
+    Create all indexes in INDEX_SPECS (idempotent), rebuild those whose options changed,
+    drop OBSOLETE_INDEXES and record the spec version.
+    Returns the indexes that could not be created or dropped.
+    """
+    failed = []
+    for collection_name, name in OBSOLETE_INDEXES:
+        try:
+            if name in db[collection_name].index_information():
+                db[collection_name].drop_index(name)
+                print(f"Dropped obsolete index {name} on {collection_name}")
+        except Exception as e:
+            print(f"⚠️  Could not drop index {name} on {collection_name}: {e}")
+            failed.append({'collection': collection_name, 'name': name, 'error': str(e)})
+    
+    for collection_name, keys, options in INDEX_SPECS:
+        try:
+            existing = db[collection_name].index_information().get(index_name(keys))
+            if existing and any(existing.get(option) != options.get(option) for option in INDEX_OPTIONS):
+                # Same keys, different options: create_index would fail with IndexOptionsConflict
+                db[collection_name].drop_index(index_name(keys))
+                print(f"Rebuilding index {index_name(keys)} on {collection_name} with new options")
+            db[collection_name].create_index(keys, **options)
+        except Exception as e:
+            # e.g. duplicate person_name_lower values left over from before the unique index
+            print(f"⚠️  Could not create index {index_name(keys)} on {collection_name}: {e}")
+            failed.append({'collection': collection_name, 'name': index_name(keys), 'error': str(e)})
+    
+    if not failed:
+        db[META_COLLECTION].update_one(
+            {'_id': 'indexes'},
+            {'$set': {'version': INDEX_SPEC_VERSION, 'updated_at': utc_now()}},
+            upsert=True
+        )
+        print(f"✅ Indexes provisioned (spec version {INDEX_SPEC_VERSION})")
+    return failed
+
+def provision_indexes_once():
+    """Create indexes if this deploy's spec version hasn't been provisioned yet."""
+    try:
+        marker = db[META_COLLECTION].find_one({'_id': 'indexes'})
+        if marker and marker.get('version') == INDEX_SPEC_VERSION:
+            return
+        print(f"Provisioning indexes for database '{DATABASE_NAME}'...")
+        ensure_indexes()
+        missing = find_missing_indexes()
+        if missing:
+            print(f"⚠️  Missing indexes: {', '.join(m['collection'] + '.' + m['name'] for m in missing)}")
+    except Exception as e:
+        print(f"Warning: Could not provision indexes: {e}")
+
+# Provision in the background so cold starts don't wait on MongoDB
+threading.Thread(target=provision_indexes_once, name='index-provisioning', daemon=True).start()
+
+@app.cli.command('ensure-indexes')
+def ensure_indexes_command():
+    """Create missing MongoDB indexes and report any that could not be created."""
+    failed = ensure_indexes()
+    missing = find_missing_indexes()
+    for index in missing:
+        print(f"missing: {index['collection']}.{index['name']}")
+    if failed or missing:
+        raise SystemExit(1)
+    print("All indexes present")
+
+@app.cli.command('migrate-figures')
+@click.option('--batch-size', default=100, show_default=True, help='Documents per bulk_write batch.')
+@click.option('--pause', default=0.0, show_default=True, help='Seconds to sleep between batches.')
+@click.option('--no-compress', is_flag=True, help='Keep full_response uncompressed.')
+def migrate_figures_command(batch_size, pause, no_compress):
+    """Convert figure documents to the compact schema (resumable)."""
+    stats = migrate_figures(
+        db, HISTORICAL_FIGURES_COLLECTION, META_COLLECTION,
+        batch_size=batch_size, compress=not no_compress, pause=pause
+    )
+    if stats['migrated']:
+        # Running instances cache figures in the old shape; make clients refetch the listing
+        bump_figures_version()
+    print(f"✅ Migration finished: {stats['migrated']} migrated, {stats['skipped']} skipped in {stats['batches']} batches")
 
 # Cache for Gemini model selection
 _GEMINI_MODEL_CACHE = None
 
+# Gemini response cache
+# Responses are content-addressed by (model, prompt, generation config), so a retried job,
+# a re-seed or a repeated dev run reuses the earlier response instead of paying for it again.
+class MongoResponseCacheBackend:
+    """Cached responses in GEMINI_CACHE_COLLECTION; TTL index expiry, LRU trimming by entry count."""
+    
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+    
+    def get(self, key: str) -> Optional[str]:
+        entry = db[GEMINI_CACHE_COLLECTION].find_one_and_update(
+            # The TTL monitor runs once a minute, so expiry is also checked here
+            {'_id': key, 'expires_at': {'$gt': utc_now()}},
+            {'$set': {'last_hit_at': utc_now()}, '$inc': {'hits': 1}},
+            projection={'response': 1}
+        )
+        return entry.get('response') if entry else None
+    
+    def put(self, key: str, model_name: str, response: str):
+        collection = db[GEMINI_CACHE_COLLECTION]
+        now = utc_now()
+        collection.replace_one({'_id': key}, {
+            'model': model_name,
+            'response': response,
+            'size': len(response),
+            'hits': 0,
+            'created_at': now,
+            'last_hit_at': now,
+            'expires_at': now + timedelta(seconds=self.ttl)
+        }, upsert=True)
+        
+        excess = collection.estimated_document_count() - self.max_entries
+        if excess > 0:
+            victims = [entry['_id'] for entry in collection.find({}, {'_id': 1}).sort('last_hit_at', 1).limit(excess)]
+            collection.delete_many({'_id': {'$in': victims}})
+
+class DiskResponseCacheBackend:
+    """Cached responses as one JSON file per key; expiry by age, LRU trimming by total bytes."""
+    
+    def __init__(self, directory: str, ttl: int, max_bytes: int):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+    
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if time.time() - entry.get('created_at', 0) > self.ttl:
+            self._remove(path)
+            return None
+        # The modification time doubles as the last hit time for LRU trimming
+        os.utime(path)
+        return entry.get('response')
+    
+    def put(self, key: str, model_name: str, response: str):
+        path = self._path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'model': model_name, 'response': response, 'created_at': time.time()}, f)
+        os.replace(temp_path, path)
+        self._trim()
+    
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    
+    def _trim(self):
+        with self._lock:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')]
+            total = sum(entry.stat().st_size for entry in entries)
+            if total <= self.max_bytes:
+                return
+            for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+                if total <= self.max_bytes:
+                    break
+                total -= entry.stat().st_size
+                self._remove(entry.path)
+
+class GeminiResponseCache:
+    """
+    Prompt-hash cache in front of Gemini generate_content calls, with hit/miss counters.
+    Backend failures are logged and treated as misses; the cache never fails a request.
+    Callers pass validate(response) so that only usable responses are stored (and a stored
+    response that no longer validates is a miss).
+    """
+    
+    def __init__(self, backend):
+        self.backend = backend
+        self._stats_lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stores': 0, 'rejected': 0, 'errors': 0}
+    
+    @staticmethod
+    def key(model_name: str, prompt: str, generation_config: Optional[Dict] = None) -> str:
+        payload = json.dumps(
+            {'model': model_name, 'prompt': prompt, 'config': generation_config or {}},
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+        GEMINI_CACHE_EVENTS.inc(event=name)
+    
+    def get(self, model_name: str, prompt: str, generation_config: Optional[Dict] = None,
+            validate: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        if not self.backend:
+            return None
+        try:
+            response = self.backend.get(self.key(model_name, prompt, generation_config))
+        except Exception as e:
+            print(f"⚠️  Gemini cache read failed: {e}")
+            self._count('errors')
+            response = None
+        if response and validate and not validate(response):
+            response = None
+        self._count('hits' if response else 'misses')
+        return response
+    
+    def put(self, model_name: str, prompt: str, generation_config: Optional[Dict], response: str,
+            validate: Optional[Callable[[str], bool]] = None):
+        if not self.backend or not response:
+            return
+        if validate and not validate(response):
+            # e.g. a truncated profile: caching it would serve the same gaps until the TTL
+            self._count('rejected')
+            return
+        try:
+            self.backend.put(self.key(model_name, prompt, generation_config), model_name, response)
+            self._count('stores')
+        except Exception as e:
+            print(f"⚠️  Gemini cache write failed: {e}")
+            self._count('errors')
+    
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        stats['backend'] = GEMINI_CACHE_BACKEND if self.backend else 'none'
+        return stats
+
+def create_gemini_cache_backend():
+    """Backend selected by GEMINI_CACHE_BACKEND (None disables caching)."""
+    if GEMINI_CACHE_BACKEND == 'mongo':
+        return MongoResponseCacheBackend(GEMINI_CACHE_TTL, GEMINI_CACHE_MAX_ENTRIES)
+    if GEMINI_CACHE_BACKEND == 'disk':
+        try:
+            return DiskResponseCacheBackend(GEMINI_CACHE_DIR, GEMINI_CACHE_TTL, GEMINI_CACHE_MAX_BYTES)
+        except OSError as e:
+            print(f"⚠️  Gemini disk cache unavailable ({e}); caching disabled")
+            return None
+    return None
+
+GEMINI_CACHE = GeminiResponseCache(create_gemini_cache_backend())
+
+# Gemini resilience
+# Every Gemini call goes through call_gemini: a circuit breaker per model fails fast while
+# Gemini is down, and retries use jittered backoff (or Retry-After) within a total deadline.
+# Request threads only get GEMINI_REQUEST_RETRY_BUDGET seconds of backoff per request and
+# answer 503 with Retry-After beyond it, so they stay free to serve stored figures;
+# background jobs retry up to the deadline.
+CIRCUIT_STATE_VALUES = {HALF_OPEN: 1, OPEN: 2}
+
+def record_circuit_state(model_name: str, state: str):
+    GEMINI_CIRCUIT_STATE.set(CIRCUIT_STATE_VALUES.get(state, 0), model=model_name)
+    print(f"⚠️  Gemini circuit for {model_name} is now {state}")
+
+GEMINI_BREAKERS = CircuitBreakerRegistry(
+    failure_threshold=GEMINI_BREAKER_THRESHOLD,
+    reset_timeout=GEMINI_BREAKER_RESET,
+    on_state_change=record_circuit_state
+)
+_RETRY_BUDGET = threading.local()
+
+@app.before_request
+def open_retry_budget():
+    _RETRY_BUDGET.budget = RetryBudget(GEMINI_REQUEST_RETRY_BUDGET)
+
+@app.teardown_request
+def close_retry_budget(_error=None):
+    _RETRY_BUDGET.budget = None
+
+def current_retry_budget() -> Optional[RetryBudget]:
+    """The current request's retry budget, or None on background threads (no budget)."""
+    return getattr(_RETRY_BUDGET, 'budget', None)
+
+class GeminiRequestFailed(Exception):
+    """A Gemini request failed on every attempt; the message is ready to show to API clients."""
+
+def call_gemini(model_name: str, operation: str, attempt: Callable[[int, Dict], object],
+                max_attempts: int = GEMINI_MAX_RETRIES, fan_out: bool = False):
+    """
+    Call attempt(attempt number, request_options) with the Gemini retry policy, taking a
+    rate limit token before each attempt. request_options must be passed to
+    generate_content: its timeout is what is left of the deadline (at most GEMINI_TIMEOUT),
+    so the deadline bounds the requests themselves, not just the sleeps between them.
+    Raises DependencyUnavailable when the call fails fast, RetriesExhausted when every
+    attempt failed with a retryable error, and non-retryable errors as they are.
+    Pass fan_out=True for one of many concurrent calls made for a single request (e.g.
+    profile shards): their token waits are bounded by the deadline, not drawn from the
+    request's retry budget, which is too small for a fan-out larger than the burst.
+    """
+    deadline = time.monotonic() + GEMINI_RETRY_DEADLINE
+    
+    def on_retry(attempt_number: int, delay: float, error: Exception):
+        record_retry('gemini', operation, delay)
+        print(f"⚠️  Gemini {operation} error (attempt {attempt_number}): {str(error)[:200]}")
+        print(f"   Retrying in {delay:.1f} seconds...")
+    
+    def before_attempt():
+        remaining = deadline - time.monotonic()
+        if remaining < GEMINI_MIN_ATTEMPT_TIME:
+            raise DependencyUnavailable(f"Gemini {operation}: no time left before the deadline", 0.0, 'deadline')
+        acquire_rate_limit(f"gemini:{model_name}", GEMINI_RATE_LIMIT, max_wait=remaining - GEMINI_MIN_ATTEMPT_TIME,
+                           use_budget=not fan_out)
+    
+    def timed_attempt(attempt_number: int):
+        timeout = max(GEMINI_MIN_ATTEMPT_TIME, min(GEMINI_TIMEOUT, deadline - time.monotonic()))
+        return attempt(attempt_number, {'timeout': timeout})
+    
+    try:
+        return call_with_retries(
+            timed_attempt,
+            GEMINI_BREAKERS.get(model_name),
+            max_attempts=max_attempts,
+            deadline=deadline,
+            budget=current_retry_budget(),
+            base_delay=GEMINI_RETRY_DELAY,
+            max_delay=GEMINI_RETRY_MAX_DELAY,
+            on_retry=on_retry,
+            before_attempt=before_attempt
+        )
+    except DependencyUnavailable as e:
+        GEMINI_CALLS_REJECTED.inc(model=model_name, reason=e.reason)
+        raise
+
+def dependency_unavailable_response(error: DependencyUnavailable):
+    """503 response telling the client when to try again (circuit open, retry or rate limit wait too long)."""
+    response = jsonify({'error': str(error), 'retry_after': math.ceil(error.retry_after)})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(max(1, math.ceil(error.retry_after)))
+    return response
+
+# Shared pool for sharded profile generation; bounds concurrent Gemini requests per instance
+_GEMINI_SHARD_EXECUTOR = ThreadPoolExecutor(max_workers=GEMINI_SHARD_WORKERS, thread_name_prefix='gemini-shard')
+
 def get_available_gemini_model():
     """Get an available Gemini model by listing available models. Cached to avoid repeated API calls."""
     global _GEMINI_MODEL_CACHE
@@ -259,12 +1456,8 @@ def get_available_gemini_model():
     except Exception as e:
         raise Exception(f"Could not determine available models: {str(e)}. Please check your API key.")
 
-def query_gemini_for_historical_figure(person_name: str) -> Dict:
-    """Query Google Gemini API with all questions about a historical figure.
-    Includes retry logic with exponential backoff for timeout handling."""
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY is not configured")
-    
+def build_historical_figure_prompt(person_name: str, numbered_questions: list) -> str:
+    """Build the profile prompt for a list of (question number, question) pairs."""
     prompt = f"""You are an expert historian and biographer. I need comprehensive information about the historical figure: {person_name}
 
 Please answer ALL of the following questions about {person_name} in detail. Be specific and accurate based on historical records and facts.
@@ -280,11 +1473,22 @@ Q2: [Answer to question 2]
 Questions:
 """
     
-    for i, question in enumerate(HISTORICAL_FIGURE_QUESTIONS, 1):
+    for i, question in numbered_questions:
         prompt += f"Q{i}: {question}\n"
     
     prompt += "\nPlease provide detailed, accurate answers to each question. If information is not available or uncertain, please note that. Be thorough and comprehensive."
-    
+    return prompt
+
+def generate_historical_figure_response(person_name: str, prompt: str, on_answer: Optional[Callable[[int, str], None]] = None,
+                                        question_numbers: Optional[list] = None,
+                                        on_retract: Optional[Callable[[list], None]] = None,
+                                        fan_out: bool = False) -> str:
+    """Send a profile prompt to Gemini and return the raw text.
+    If on_answer is given, the response is streamed and on_answer(question number, answer)
+    is called as each answer completes; when a streamed attempt fails, on_retract(question
+    numbers) withdraws the answers it published before the retry starts over.
+    Retried per the Gemini retry policy (see call_gemini; fan_out is passed on).
+    The response is only cached if it answers every question in question_numbers (default: all)."""
     model_name = get_available_gemini_model()
     model = genai.GenerativeModel(model_name)
     
@@ -296,155 +1500,216 @@ Questions:
         "max_output_tokens": 8192,  # Maximum tokens for response
     }
     
-    # Retry logic with exponential backoff
-    last_exception = None
-    full_response = None
-    for attempt in range(GEMINI_MAX_RETRIES):
-        try:
-            print(f"Querying Gemini for {person_name} (attempt {attempt + 1}/{GEMINI_MAX_RETRIES})...")
-            response = model.generate_content(
-                prompt,
-                generation_config=generation_config
-            )
-            full_response = response.text
-            break  # Success, exit retry loop
-            
-        except Exception as e:
-            last_exception = e
-            error_msg = str(e).lower()
-            
-            # Check if it's a timeout or rate limit error
-            is_timeout = any(keyword in error_msg for keyword in ['timeout', 'deadline', 'timed out', '504', '503'])
-            is_rate_limit = any(keyword in error_msg for keyword in ['rate limit', '429', 'quota'])
-            
-            if attempt < GEMINI_MAX_RETRIES - 1:
-                # Calculate exponential backoff delay
-                delay = GEMINI_RETRY_DELAY * (2 ** attempt)
-                print(f"⚠️  Gemini API error (attempt {attempt + 1}): {str(e)[:200]}")
-                print(f"   Retrying in {delay} seconds...")
-                time.sleep(delay)
+    expected = [HISTORICAL_FIGURE_QUESTIONS[n - 1] for n in question_numbers] if question_numbers else HISTORICAL_FIGURE_QUESTIONS
+    
+    def answers_every_question(text: str) -> bool:
+        answers = parse_historical_figure_answers(text)
+        return all(question in answers for question in expected)
+    
+    cached = GEMINI_CACHE.get(model_name, prompt, generation_config, validate=answers_every_question)
+    if cached:
+        print(f"Using cached Gemini response for {person_name}")
+        if on_answer:
+            # Replay the cached text so streaming subscribers still get each answer
+            parser = StreamingAnswerParser(HISTORICAL_FIGURE_QUESTIONS, on_answer)
+            parser.feed(cached)
+            parser.finish()
+        return cached
+    
+    def attempt(attempt_number: int, request_options: Dict) -> str:
+        print(f"Querying Gemini for {person_name} (attempt {attempt_number + 1}/{GEMINI_MAX_RETRIES})...")
+        start = time.perf_counter()
+        published = []
+        
+        def publish(q_num: int, answer: str):
+            published.append(q_num)
+            on_answer(q_num, answer)
+        
+        try:
+            if on_answer:
+                # A retry restarts the response, so each attempt gets a fresh parser
+                parser = StreamingAnswerParser(HISTORICAL_FIGURE_QUESTIONS, publish)
+                chunks = []
+                response = model.generate_content(prompt, generation_config=generation_config, stream=True,
+                                                  request_options=request_options)
+                for chunk in response:
+                    chunks.append(chunk.text)
+                    parser.feed(chunk.text)
+                parser.finish()
+                text = ''.join(chunks)
             else:
-                # Last attempt failed
-                if is_timeout:
-                    raise Exception(f"Gemini API request timed out after {GEMINI_MAX_RETRIES} attempts. The prompt may be too long or the response too large. Try again later.")
-                elif is_rate_limit:
-                    raise Exception(f"Gemini API rate limit exceeded after {GEMINI_MAX_RETRIES} attempts. Please wait before trying again.")
-                else:
-                    raise Exception(f"Error querying Gemini API after {GEMINI_MAX_RETRIES} attempts: {str(e)}")
+                response = model.generate_content(
+                    prompt,
+                    generation_config=generation_config,
+                    request_options=request_options
+                )
+                text = response.text
+        except Exception:
+            observe_gemini_call(model_name, 'profile', start, error=True)
+            if published and on_retract:
+                on_retract(published)
+            raise
+        observe_gemini_call(model_name, 'profile', start, response)
+        return text
+    
+    try:
+        full_response = call_gemini(model_name, 'profile', attempt, fan_out=fan_out)
+    except RetriesExhausted as e:
+        if e.kind == TIMEOUT:
+            raise GeminiRequestFailed(f"Gemini API request timed out after {e.attempts} attempts. The prompt may be too long or the response too large. Try again later.") from e
+        elif e.kind == RATE_LIMITED:
+            raise GeminiRequestFailed(f"Gemini API rate limit exceeded after {e.attempts} attempts. Please wait before trying again.") from e
+        else:
+            raise GeminiRequestFailed(f"Error querying Gemini API after {e.attempts} attempts: {str(e.error)}") from e
     
     if not full_response:
-        raise Exception(f"Failed to get response from Gemini API: {last_exception}")
+        raise Exception("Failed to get response from Gemini API: empty response")
+    
+    GEMINI_CACHE.put(model_name, prompt, generation_config, full_response, validate=answers_every_question)
+    return full_response
+
+class AnswerChannel:
+    """
+    Fan-out of streamed answers for one figure generation.
+    Subscribers get a queue pre-filled with the answers published so far; a retracted
+    answer is delivered as (question number, None).
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._answers = {}
+        self._subscribers = []
+    
+    def publish(self, q_num: int, answer: str):
+        with self._lock:
+            self._answers[q_num] = answer
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put((q_num, answer))
+    
+    def retract(self, q_nums: list):
+        """Withdraw answers published by a failed Gemini attempt."""
+        with self._lock:
+            for q_num in q_nums:
+                self._answers.pop(q_num, None)
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            for q_num in q_nums:
+                subscriber.put((q_num, None))
+    
+    def subscribe(self) -> queue.Queue:
+        subscriber = queue.Queue()
+        with self._lock:
+            for item in self._answers.items():
+                subscriber.put(item)
+            self._subscribers.append(subscriber)
+        return subscriber
+    
+    def unsubscribe(self, subscriber: queue.Queue):
+        with self._lock:
+            if subscriber in self._subscribers:
+                self._subscribers.remove(subscriber)
+    
+    def has_subscribers(self) -> bool:
+        with self._lock:
+            return bool(self._subscribers)
+
+_ANSWER_CHANNELS = {}
+_ANSWER_CHANNELS_LOCK = threading.Lock()
+# Streaming requests generate on their own pool so they never queue behind background jobs
+_STREAM_EXECUTOR = ThreadPoolExecutor(max_workers=STREAM_WORKERS, thread_name_prefix='profile-stream')
+
+def get_answer_channel(person_lower: str) -> AnswerChannel:
+    """Get (or open) the answer channel for a figure being generated."""
+    with _ANSWER_CHANNELS_LOCK:
+        channel = _ANSWER_CHANNELS.get(person_lower)
+        if channel is None:
+            channel = _ANSWER_CHANNELS[person_lower] = AnswerChannel()
+        return channel
+
+def close_answer_channel(person_lower: str):
+    """Drop the answer channel once generation has finished."""
+    with _ANSWER_CHANNELS_LOCK:
+        _ANSWER_CHANNELS.pop(person_lower, None)
+
+def release_answer_channel(person_lower: str, channel: AnswerChannel):
+    """Drop a channel opened by a stream listener if nobody is listening any more."""
+    with _ANSWER_CHANNELS_LOCK:
+        if _ANSWER_CHANNELS.get(person_lower) is channel and not channel.has_subscribers():
+            del _ANSWER_CHANNELS[person_lower]
+
+def parse_historical_figure_answers(full_response: str) -> Dict:
+    """Parse 'Q<n>: answer' blocks from a profile response into {question text: answer} (see answer_parser)."""
+    return parse_answers(HISTORICAL_FIGURE_QUESTIONS, full_response)
+
+def query_gemini_for_historical_figure(person_name: str) -> Dict:
+    """Query Google Gemini API with all questions about a historical figure.
+    In sharded mode, each question category is sent as its own prompt and the shards run
+    concurrently, so latency tracks the slowest shard and a truncated shard only affects
+    its own answers."""
+    if not GEMINI_API_KEY:
+        raise ValueError("GEMINI_API_KEY is not configured")
     
     try:
+        numbered_questions = list(enumerate(HISTORICAL_FIGURE_QUESTIONS, 1))
+        if GEMINI_PROFILE_SHARDING:
+            shards = []
+            for questions in HISTORICAL_FIGURE_QUESTION_CATEGORIES.values():
+                shards.append(numbered_questions[:len(questions)])
+                numbered_questions = numbered_questions[len(questions):]
+        else:
+            shards = [numbered_questions]
+        
+        channel = get_answer_channel(person_name.lower().strip()) if GEMINI_STREAMING else None
+        
+        def run_shard(shard: list) -> str:
+            return generate_historical_figure_response(
+                person_name,
+                build_historical_figure_prompt(person_name, shard),
+                channel.publish if channel else None,
+                question_numbers=[number for number, _ in shard],
+                on_retract=channel.retract if channel else None,
+                fan_out=len(shards) > 1
+            )
+        
+        if len(shards) == 1:
+            responses = [run_shard(shards[0])]
+        else:
+            print(f"Querying Gemini for {person_name} in {len(shards)} category shards...")
+            futures = [_GEMINI_SHARD_EXECUTOR.submit(bind_pipeline_context(run_shard), shard) for shard in shards]
+            # Wait for every shard before raising so no request is left running unobserved
+            errors = [future.exception() for future in futures]
+            for error in errors:
+                if error is not None:
+                    raise error
+            responses = [future.result() for future in futures]
         
         result = {
             'person_name': person_name,
-            'full_response': full_response,
+            'full_response': '\n'.join(responses),
             'answers': {}
         }
         
-        # Parse Q1:, Q2:, etc. format
-        q_pattern = re.compile(r'Q(\d+):\s*(.*?)(?=\nQ\d+:|$)', re.DOTALL)
-        matches = q_pattern.findall(full_response)
-        
-        question_answers = {}
-        for q_num_str, content in matches:
-            q_num = int(q_num_str)
-            if 1 <= q_num <= len(HISTORICAL_FIGURE_QUESTIONS):
-                content = content.strip()
-                if not content:
-                    continue
-                    
-                question_text = HISTORICAL_FIGURE_QUESTIONS[q_num - 1]
-                content_lower = content.lower()
-                question_lower = question_text.lower()
-                
-                is_question_repetition = (
-                    content_lower.startswith(question_lower[:50]) or
-                    (question_lower in content_lower and len(content) < len(question_text) + 100)
-                )
-                
-                if is_question_repetition:
-                    continue
-                
-                if q_num in question_answers:
-                    if len(content) > len(question_answers[q_num]):
-                        question_answers[q_num] = content
-                else:
-                    question_answers[q_num] = content
-        
-        for q_num, answer in question_answers.items():
-            question_text = HISTORICAL_FIGURE_QUESTIONS[q_num - 1]
-            clean_answer = answer.strip()
-            if clean_answer.lower().startswith(question_text.lower()[:50]):
-                clean_answer = clean_answer[len(question_text):].strip()
-                if clean_answer.startswith(':'):
-                    clean_answer = clean_answer[1:].strip()
-            result['answers'][question_text] = clean_answer
-        
-        # Fallback parsing if regex didn't work well (less than 50% parsed)
-        MIN_ANSWERS_THRESHOLD = len(HISTORICAL_FIGURE_QUESTIONS) * 0.5
-        if len(result['answers']) < MIN_ANSWERS_THRESHOLD:
-            result['answers'] = {}
-            lines = full_response.split('\n')
-            current_answer = None
-            current_question_num = None
-            seen_questions = set()
-            
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    if current_answer:
-                        current_answer += "\n"
-                    continue
-                
-                if re.match(r'^Q\d+:', line):
-                    try:
-                        q_part = line.split(':', 1)[0]
-                        q_num = int(q_part[1:])
-                        
-                        if 1 <= q_num <= len(HISTORICAL_FIGURE_QUESTIONS):
-                            content_after_colon = line.split(':', 1)[1].strip() if ':' in line else ""
-                            question_text = HISTORICAL_FIGURE_QUESTIONS[q_num - 1]
-                            
-                            if question_text.lower() in content_after_colon.lower() and len(content_after_colon) < len(question_text) + 100:
-                                continue
-                            
-                            if current_question_num is not None and current_question_num not in seen_questions:
-                                prev_question = HISTORICAL_FIGURE_QUESTIONS[current_question_num - 1]
-                                if prev_question not in result['answers'] and current_answer:
-                                    result['answers'][prev_question] = current_answer.strip()
-                                    seen_questions.add(current_question_num)
-                            
-                            current_question_num = q_num
-                            current_answer = content_after_colon
-                    except (ValueError, IndexError):
-                        if current_answer is not None:
-                            current_answer += " " + line
-                else:
-                    if current_answer is not None:
-                        current_answer += " " + line
-            
-            if current_question_num is not None and current_question_num not in seen_questions:
-                question_text = HISTORICAL_FIGURE_QUESTIONS[current_question_num - 1]
-                if question_text not in result['answers'] and current_answer:
-                    result['answers'][question_text] = current_answer.strip()
+        for response_text in responses:
+            result['answers'].update(parse_historical_figure_answers(response_text))
         
         for question in HISTORICAL_FIGURE_QUESTIONS:
             if question not in result['answers']:
                 result['answers'][question] = ""
         
+        # Keep answers in question order regardless of shard completion order
+        result['answers'] = {question: result['answers'][question] for question in HISTORICAL_FIGURE_QUESTIONS}
         return result
         
+    except (DependencyUnavailable, GeminiRequestFailed):
+        # Already formatted by the retry logic
+        raise
     except Exception as e:
-        # Re-raise if it's already been formatted by retry logic
-        if "after" in str(e) and "attempts" in str(e):
-            raise
         raise Exception(f"Error querying Gemini API: {str(e)}")
 
 def generate_elevenlabs_voice_summary(person_name: str, answers: Dict, full_response: str) -> str:
     """Query Gemini to generate a concise voice and personality summary (1000 chars or less) for ElevenLabs.
-    Includes retry logic for reliability."""
+    Retried per the Gemini retry policy (see call_gemini)."""
     if not GEMINI_API_KEY:
         raise ValueError("GEMINI_API_KEY is not configured")
     
@@ -466,27 +1731,31 @@ Please provide a concise summary in 1000 characters or less that captures their
     model_name = get_available_gemini_model()
     model = genai.GenerativeModel(model_name)
     
-    # Retry logic for voice summary generation
-    last_exception = None
-    summary = None
-    for attempt in range(GEMINI_MAX_RETRIES):
+    def attempt(_attempt_number: int, request_options: Dict) -> str:
+        start = time.perf_counter()
         try:
-            response = model.generate_content(prompt)
-            summary = response.text.strip()
-            break  # Success, exit retry loop
-            
+            response = model.generate_content(prompt, request_options=request_options)
+            text = response.text.strip()
+        except Exception:
+            observe_gemini_call(model_name, 'voice_summary', start, error=True)
+            raise
+        observe_gemini_call(model_name, 'voice_summary', start, response)
+        return text
+    
+    summary = GEMINI_CACHE.get(model_name, prompt)
+    if not summary:
+        try:
+            summary = call_gemini(model_name, 'voice_summary', attempt)
+        except DependencyUnavailable:
+            raise
+        except RetriesExhausted as e:
+            raise GeminiRequestFailed(f"Error generating ElevenLabs summary after {e.attempts} attempts: {str(e.error)}") from e
         except Exception as e:
-            last_exception = e
-            if attempt < GEMINI_MAX_RETRIES - 1:
-                delay = GEMINI_RETRY_DELAY * (2 ** attempt)
-                print(f"⚠️  Voice summary generation error (attempt {attempt + 1}): {str(e)[:200]}")
-                print(f"   Retrying in {delay} seconds...")
-                time.sleep(delay)
-            else:
-                raise Exception(f"Error generating ElevenLabs summary after {GEMINI_MAX_RETRIES} attempts: {str(e)}")
+            raise Exception(f"Error generating ElevenLabs summary: {str(e)}")
+        GEMINI_CACHE.put(model_name, prompt, None, summary)
     
     if not summary:
-        raise Exception(f"Failed to generate voice summary: {last_exception}")
+        raise Exception("Failed to generate voice summary: empty response")
     
     try:
         
@@ -498,36 +1767,103 @@ Please provide a concise summary in 1000 characters or less that captures their
     except Exception as e:
         raise Exception(f"Error generating ElevenLabs summary: {str(e)}")
 
-def get_or_create_historical_figure(person_name: str) -> Dict:
-    """Check if historical figure exists in database. If not, query Gemini and save."""
+def get_or_create_historical_figure(person_name: str, fields: Optional[list] = None) -> Dict:
+    """Check if historical figure exists in database. If not, query Gemini and save.
+    Concurrent requests for the same figure share a single Gemini generation.
+    With fields, only those top-level fields (and _id) are read and returned.
+    Inside a unit of work, full documents are tracked in its identity map and later
+    reads of the same figure are served from there."""
     collection = db[HISTORICAL_FIGURES_COLLECTION]
     
     person_lower = person_name.lower().strip()
-    existing = collection.find_one({'person_name_lower': person_lower})
+    figures = current_figure_map()
+    tracked = figures.get(person_lower) if figures is not None else None
+    if tracked:
+        return select_fields(tracked, fields)
+    
+    # 'elevenlabs' is always read so a missing summary can be backfilled
+    projection = storage_projection(fields + ['elevenlabs']) if fields else None
+    existing = load_figure(collection.find_one({'person_name_lower': person_lower}, projection))
     
     if existing:
+        if figures is not None and not projection:
+            existing = figures.add(person_lower, existing)
         if 'elevenlabs' not in existing or not existing.get('elevenlabs'):
             print(f"Generating ElevenLabs summary for existing record: {person_name}")
-            elevenlabs_summary = generate_elevenlabs_voice_summary(
-                person_name,
-                existing.get('answers', {}),
-                existing.get('full_response', '')
-            )
+            if projection:
+                existing = load_figure(collection.find_one({'person_name_lower': person_lower})) or existing
+                if figures is not None:
+                    existing = figures.add(person_lower, existing)
+            with trace_stage('voice_summary'):
+                elevenlabs_summary = generate_elevenlabs_voice_summary(
+                    person_name,
+                    existing.get('answers', {}),
+                    existing.get('full_response', '')
+                )
             collection.update_one(
                 {'person_name_lower': person_lower},
                 {'$set': {'elevenlabs': elevenlabs_summary}}
             )
             existing['elevenlabs'] = elevenlabs_summary
         
-        return serialize_doc(existing)
+        return select_fields(existing, fields)
+    
+    figure = _FIGURE_GENERATION_FLIGHTS.do(
+        person_lower,
+        lambda: generate_historical_figure_with_lease(person_name, person_lower)
+    )
+    if figures is not None:
+        # Concurrent callers share the generated document; track a copy of our own
+        figure = figures.add(person_lower, dict(figure))
+    return select_fields(figure, fields)
+
+def generate_historical_figure_with_lease(person_name: str, person_lower: str) -> Dict:
+    """
+    Generate a figure profile while holding the cross-instance lease.
+    If another instance holds the lease, wait for its document to appear instead of
+    paying for a second Gemini round-trip.
+    """
+    collection = db[HISTORICAL_FIGURES_COLLECTION]
+    deadline = time.time() + FIGURE_LEASE_TTL + FIGURE_LEASE_POLL_INTERVAL
+    
+    while True:
+        if acquire_figure_lease(person_lower):
+            try:
+                # Another instance may have finished between our lookup and taking the lease
+                existing = collection.find_one({'person_name_lower': person_lower})
+                if existing:
+                    return load_figure(existing)
+                return generate_and_store_historical_figure(person_name, person_lower)
+            finally:
+                release_figure_lease(person_lower)
+        
+        existing = collection.find_one({'person_name_lower': person_lower})
+        if existing:
+            print(f"Using profile for {person_name} generated by another instance")
+            return load_figure(existing)
+        
+        if time.time() > deadline:
+            raise Exception(f"Timed out waiting for another instance to generate {person_name}. Try again later.")
+        
+        time.sleep(FIGURE_LEASE_POLL_INTERVAL)
+
+def generate_and_store_historical_figure(person_name: str, person_lower: str) -> Dict:
+    """Query Gemini for a new figure, generate its voice summary and insert the document."""
+    collection = db[HISTORICAL_FIGURES_COLLECTION]
     
     print(f"Querying Gemini for information about: {person_name}")
-    gemini_data = query_gemini_for_historical_figure(person_name)
+    try:
+        with trace_stage('gemini_profile'):
+            gemini_data = query_gemini_for_historical_figure(person_name)
+    finally:
+        close_answer_channel(person_lower)
     
     answers = gemini_data.get('answers', {})
     full_response = gemini_data.get('full_response', '')
+    report_job_stage('voice_summary')
     print(f"Generating ElevenLabs voice and personality summary...")
-    elevenlabs_summary = generate_elevenlabs_voice_summary(person_name, answers, full_response)
+    with trace_stage('voice_summary'):
+        elevenlabs_summary = generate_elevenlabs_voice_summary(person_name, answers, full_response)
     
     document = {
         'person_name': person_name,
@@ -536,15 +1872,622 @@ def get_or_create_historical_figure(person_name: str) -> Dict:
         'answers': answers,
         'full_response': full_response,
         'elevenlabs': elevenlabs_summary,
-        'created_at': None
+        'created_at': utc_now()
     }
     
-    result = collection.insert_one(document)
+    try:
+        # Stored in the compact schema; the legacy-shaped document is returned
+        result = collection.insert_one(to_compact_document(db, document, FIGURE_COMPRESS_FULL_RESPONSE))
+    except DuplicateKeyError:
+        # Lost a race with a writer that did not hold the lease (e.g. an expired lease)
+        existing = collection.find_one({'person_name_lower': person_lower})
+        if existing:
+            return load_figure(existing)
+        raise
     document['_id'] = result.inserted_id
+    FIGURE_SEARCH_INDEX.add(result.inserted_id, person_lower)
+    bump_figures_version()
     
     print(f"Saved information about {person_name} to database")
     return serialize_doc(document)
 
+# Background job subsystem
+# Long-running pipelines (figure + agent creation) run on a bounded worker pool so they
+# don't hold gunicorn request threads. Progress is persisted in MongoDB so any instance
+# can answer status requests.
+_CREATION_EXECUTOR = ThreadPoolExecutor(max_workers=CREATION_WORKERS, thread_name_prefix='creation-job')
+_JOB_CONTEXT = threading.local()
+
+def fail_stale_jobs(query: dict) -> int:
+    """
+    Mark active jobs matching query as failed when they have not reported progress for
+    JOB_STALE_AFTER seconds (their worker died with its instance). Returns how many were marked.
+    """
+    now = utc_now()
+    result = db[JOBS_COLLECTION].update_many(
+        {
+            **query,
+            'status': {'$in': JOB_ACTIVE_STATUSES},
+            'updated_at': {'$lt': now - timedelta(seconds=JOB_STALE_AFTER)}
+        },
+        {
+            '$set': {'status': 'failed', 'stage': 'failed', 'error': JOB_STALE_ERROR, 'finished_at': now, 'updated_at': now},
+            '$unset': {'active': ''},
+            '$push': {'events': {'stage': 'failed', 'at': now}}
+        }
+    )
+    return result.modified_count
+
+def load_job(job_id: str) -> Optional[Dict]:
+    """Read a job, first marking it failed if it is active but stale."""
+    jobs = db[JOBS_COLLECTION]
+    job = jobs.find_one({'_id': job_id})
+    if job and job.get('status') in JOB_ACTIVE_STATUSES and fail_stale_jobs({'_id': job_id}):
+        job = jobs.find_one({'_id': job_id})
+    return job
+
+def enqueue_job(job_type: str, person_name: str, target: Callable[[str], Dict]) -> Dict:
+    """
+    Create a job document and schedule target(person_name) on the worker pool.
+    If an active job of the same type already exists for this figure, return it instead.
+    """
+    jobs = db[JOBS_COLLECTION]
+    person_lower = person_name.lower().strip()
+    active_query = {'type': job_type, 'person_name_lower': person_lower, 'status': {'$in': JOB_ACTIVE_STATUSES}}
+    
+    # A stale job would otherwise block new ones (see the unique index on active jobs)
+    fail_stale_jobs({'type': job_type, 'person_name_lower': person_lower})
+    
+    now = utc_now()
+    job_id = uuid.uuid4().hex
+    try:
+        job = jobs.find_one_and_update(
+            active_query,
+            {'$setOnInsert': {
+                '_id': job_id,
+                'person_name': person_name,
+                'status': 'queued',
+                'active': True,
+                'stage': 'queued',
+                'events': [{'stage': 'queued', 'at': now}],
+                'result': None,
+                'error': None,
+                'created_at': now,
+                'updated_at': now
+            }},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # A concurrent request inserted the active job between our lookup and insert
+        job = jobs.find_one(active_query)
+        if job is None:
+            raise
+    
+    if job['_id'] == job_id:
+        _CREATION_EXECUTOR.submit(run_job, job_id, person_name, target)
+        print(f"Queued {job_type} job {job_id} for {person_name}")
+    else:
+        print(f"Reusing active {job_type} job {job['_id']} for {person_name}")
+    
+    return job
+
+@track_in_flight(CREATION_JOBS_IN_FLIGHT)
+def run_job(job_id: str, person_name: str, target: Callable[[str], Dict]):
+    """Worker entry point: run the job target and record its outcome."""
+    jobs = db[JOBS_COLLECTION]
+    _JOB_CONTEXT.job_id = job_id
+    try:
+        jobs.update_one({'_id': job_id}, {'$set': {'status': 'running', 'started_at': utc_now()}})
+        report_job_stage('started')
+        with figure_unit_of_work():
+            result = target(person_name)
+        now = utc_now()
+        jobs.update_one({'_id': job_id}, {
+            '$set': {'status': 'succeeded', 'stage': 'done', 'result': result, 'finished_at': now, 'updated_at': now},
+            '$unset': {'active': ''},
+            '$push': {'events': {'stage': 'done', 'at': now}}
+        })
+        print(f"✅ Job {job_id} for {person_name} succeeded")
+    except Exception as e:
+        now = utc_now()
+        jobs.update_one({'_id': job_id}, {
+            '$set': {'status': 'failed', 'stage': 'failed', 'error': str(e), 'finished_at': now, 'updated_at': now},
+            '$unset': {'active': ''},
+            '$push': {'events': {'stage': 'failed', 'at': now}}
+        })
+        print(f"⚠️  Job {job_id} for {person_name} failed: {e}")
+    finally:
+        _JOB_CONTEXT.job_id = None
+
+def report_job_stage(stage: str):
+    """Record pipeline progress on the current background job. No-op outside a job."""
+    job_id = getattr(_JOB_CONTEXT, 'job_id', None)
+    if not job_id:
+        return
+    
+    now = utc_now()
+    try:
+        db[JOBS_COLLECTION].update_one({'_id': job_id}, {
+            '$set': {'stage': stage, 'updated_at': now},
+            '$push': {'events': {'stage': stage, 'at': now}}
+        })
+    except Exception as e:
+        print(f"⚠️  Could not record stage {stage} for job {job_id}: {e}")
+
+def report_job_progress(progress: dict):
+    """Record counters (e.g. processed/total) on the current background job. No-op outside a job."""
+    job_id = getattr(_JOB_CONTEXT, 'job_id', None)
+    if not job_id:
+        return
+    
+    try:
+        db[JOBS_COLLECTION].update_one({'_id': job_id}, {'$set': {'progress': progress, 'updated_at': utc_now()}})
+    except Exception as e:
+        print(f"⚠️  Could not record progress for job {job_id}: {e}")
+
+# Pipeline tracing
+# Agent creation records one span per stage (duration, attempts, outcome). The trace is
+# shared by every thread working on the run (see bind_pipeline_context); the stack of open
+# spans is per thread. The spans are stored on the figure document as pipeline_timings.
+_PIPELINE_TRACE = threading.local()
+
+class PipelineTrace:
+    """Spans recorded for one pipeline run."""
+    
+    def __init__(self):
+        self.started_at = utc_now()
+        self.start = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+    
+    def add(self, span: dict):
+        with self._lock:
+            self.spans.append(span)
+
+def _open_spans() -> list:
+    stack = getattr(_PIPELINE_TRACE, 'stack', None)
+    if stack is None:
+        stack = _PIPELINE_TRACE.stack = []
+    return stack
+
+@contextlib.contextmanager
+def trace_stage(stage: str):
+    """
+    Time a pipeline stage. Spans nest (a span records its parent stage); outside a
+    traced pipeline this does nothing. An exception marks the span as 'error'.
+    """
+    trace = getattr(_PIPELINE_TRACE, 'trace', None)
+    if trace is None:
+        yield None
+        return
+    
+    stack = _open_spans()
+    start = time.perf_counter()
+    span = {
+        'stage': stage,
+        'parent': stack[-1]['stage'] if stack else None,
+        'offset_ms': round((start - trace.start) * 1000, 1),
+        'attempts': 1,
+        'outcome': 'ok'
+    }
+    stack.append(span)
+    try:
+        yield span
+    except Exception:
+        span['outcome'] = 'error'
+        raise
+    finally:
+        span['duration_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        stack.pop()
+        trace.add(span)
+
+def record_cancelled_stage(stage: str):
+    """Record a stage that never ran because a stage it depends on failed."""
+    trace = getattr(_PIPELINE_TRACE, 'trace', None)
+    if trace is not None:
+        trace.add({
+            'stage': stage,
+            'parent': None,
+            'offset_ms': round((time.perf_counter() - trace.start) * 1000, 1),
+            'duration_ms': 0.0,
+            'attempts': 0,
+            'outcome': 'cancelled'
+        })
+
+def set_stage_outcome(outcome: str):
+    """Set the outcome of the innermost running stage (e.g. 'failed' without an exception)."""
+    stack = getattr(_PIPELINE_TRACE, 'stack', None)
+    if getattr(_PIPELINE_TRACE, 'trace', None) and stack:
+        stack[-1]['outcome'] = outcome
+
+def note_stage_retry():
+    """Count a retried call against the innermost running stage."""
+    stack = getattr(_PIPELINE_TRACE, 'stack', None)
+    if getattr(_PIPELINE_TRACE, 'trace', None) and stack:
+        stack[-1]['attempts'] += 1
+
+def bind_pipeline_context(function: Callable) -> Callable:
+    """
+    Wrap function so that, on a pool thread, it runs with the calling thread's job,
+    pipeline trace, unit of work and retry budget (job stages and spans land on the right
+    job and figure, figure reads share the caller's identity map, and Gemini retries on
+    behalf of a request draw on that request's budget).
+    """
+    job_id = getattr(_JOB_CONTEXT, 'job_id', None)
+    trace = getattr(_PIPELINE_TRACE, 'trace', None)
+    parents = list(getattr(_PIPELINE_TRACE, 'stack', None) or [])
+    figures = current_figure_map()
+    budget = current_retry_budget()
+    
+    @functools.wraps(function)
+    def bound(*args, **kwargs):
+        saved = (getattr(_JOB_CONTEXT, 'job_id', None), getattr(_PIPELINE_TRACE, 'trace', None),
+                 getattr(_PIPELINE_TRACE, 'stack', None), current_figure_map(), current_retry_budget())
+        (_JOB_CONTEXT.job_id, _PIPELINE_TRACE.trace, _PIPELINE_TRACE.stack,
+         _FIGURE_UNIT_OF_WORK.figures, _RETRY_BUDGET.budget) = job_id, trace, list(parents), figures, budget
+        try:
+            return function(*args, **kwargs)
+        finally:
+            (_JOB_CONTEXT.job_id, _PIPELINE_TRACE.trace, _PIPELINE_TRACE.stack,
+             _FIGURE_UNIT_OF_WORK.figures, _RETRY_BUDGET.budget) = saved
+    
+    return bound
+
+def run_traced_pipeline(person_name: str, target: Callable[[], Dict]) -> Dict:
+    """
+    Run target with a pipeline trace and store the spans on the figure as pipeline_timings.
+    Inside an already traced pipeline, target's spans join that trace instead. A run that
+    recorded no spans (nothing had to be generated) keeps the figure's previous timings.
+    """
+    if getattr(_PIPELINE_TRACE, 'trace', None) is not None:
+        return target()
+    
+    previous_stack = getattr(_PIPELINE_TRACE, 'stack', None)
+    trace = _PIPELINE_TRACE.trace = PipelineTrace()
+    _PIPELINE_TRACE.stack = []
+    outcome = 'error'
+    try:
+        result = target()
+        outcome = 'ok'
+        return result
+    finally:
+        _PIPELINE_TRACE.trace, _PIPELINE_TRACE.stack = None, previous_stack
+        if trace.spans:
+            store_pipeline_timings(person_name, trace, outcome)
+
+def store_pipeline_timings(person_name: str, trace: PipelineTrace, outcome: str):
+    """Store a finished trace on the figure as pipeline_timings."""
+    timings = {
+        'recorded_at': utc_now(),
+        'started_at': trace.started_at,
+        'outcome': outcome,
+        'total_ms': round((time.perf_counter() - trace.start) * 1000, 1),
+        'stages': sorted(trace.spans, key=lambda span: span['offset_ms'])
+    }
+    try:
+        db[HISTORICAL_FIGURES_COLLECTION].update_one(
+            {'person_name_lower': person_name.lower().strip()},
+            {'$set': {'pipeline_timings': timings}}
+        )
+        update_tracked_figure(person_name.lower().strip(), {'pipeline_timings': timings})
+    except Exception as e:
+        print(f"⚠️  Could not store pipeline timings for {person_name}: {e}")
+
+# Stage graph
+# Pipelines are declared as stages with dependencies; stages whose dependencies are done
+# run concurrently on a shared pool. Only the coordinating thread waits, never a pool
+# thread, so nested or concurrent graphs can't deadlock the pool.
+_PIPELINE_STAGE_EXECUTOR = ThreadPoolExecutor(max_workers=PIPELINE_STAGE_WORKERS, thread_name_prefix='pipeline-stage')
+
+class StageGraph:
+    """
+    Small dependency graph of pipeline stages. Each stage is called with a dict of the
+    results of the stages it depends on, inside a trace_stage span of the same name.
+    When a stage fails, its (transitive) dependents are cancelled; independent stages
+    still finish, then run() raises the first failure.
+    """
+    
+    def __init__(self, executor: ThreadPoolExecutor = None):
+        self.executor = executor or _PIPELINE_STAGE_EXECUTOR
+        self._stages = {}
+    
+    def add(self, name: str, function: Callable[[Dict], object], after: tuple = ()):
+        unknown = [dependency for dependency in after if dependency not in self._stages]
+        if unknown:
+            raise ValueError(f"Stage {name} depends on unknown stage(s): {', '.join(unknown)}")
+        self._stages[name] = (function, tuple(after))
+        return self
+    
+    @staticmethod
+    def _run_stage(name: str, function: Callable[[Dict], object], inputs: Dict):
+        with trace_stage(name):
+            return function(inputs)
+    
+    def run(self) -> Dict:
+        """Run every stage; returns {stage name: result}."""
+        pending = dict(self._stages)
+        running = {}
+        results = {}
+        failures = []  # (name, exception) in the order they happened
+        failed = set()
+        
+        while pending or running:
+            # Cancel stages downstream of a failure (repeat for transitive dependents)
+            cancelled = True
+            while cancelled:
+                cancelled = [name for name, (_, after) in pending.items() if failed.intersection(after)]
+                for name in cancelled:
+                    del pending[name]
+                    failed.add(name)
+                    record_cancelled_stage(name)
+            
+            for name in [name for name, (_, after) in pending.items() if all(dep in results for dep in after)]:
+                function, after = pending.pop(name)
+                inputs = {dep: results[dep] for dep in after}
+                future = self.executor.submit(bind_pipeline_context(self._run_stage), name, function, inputs)
+                running[future] = name
+            
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                error = future.exception()
+                if error is None:
+                    results[name] = future.result()
+                else:
+                    failed.add(name)
+                    failures.append((name, error))
+        
+        if failures:
+            name, error = failures[0]
+            print(f"⚠️  Pipeline stage {name} failed: {error}")
+            raise error
+        return results
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def aggregate_pipeline_timings(timings: list) -> Dict:
+    """Per-stage count, error rate, mean attempts and p50/p90/p99/max durations (ms)."""
+    samples = {}
+    for timing in timings:
+        samples.setdefault('total', []).append((timing.get('total_ms', 0.0), timing.get('outcome'), 1))
+        for span in timing.get('stages', []):
+            samples.setdefault(span['stage'], []).append(
+                (span.get('duration_ms', 0.0), span.get('outcome'), span.get('attempts', 1))
+            )
+    
+    stages = {}
+    for stage, values in samples.items():
+        durations = sorted(value[0] for value in values)
+        stages[stage] = {
+            'count': len(values),
+            'error_rate': round(sum(1 for value in values if value[1] != 'ok') / len(values), 3),
+            'mean_attempts': round(sum(value[2] for value in values) / len(values), 2),
+            'mean_ms': round(sum(durations) / len(durations), 1),
+            'p50_ms': percentile(durations, 0.5),
+            'p90_ms': percentile(durations, 0.9),
+            'p99_ms': percentile(durations, 0.99),
+            'max_ms': durations[-1]
+        }
+    return stages
+
+def format_timestamp(value: Optional[datetime]) -> Optional[str]:
+    """Format a naive UTC datetime from MongoDB as an ISO-8601 string."""
+    return value.isoformat() + 'Z' if value else None
+
+def format_sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def format_job(job: dict) -> dict:
+    """Format a job document for API responses."""
+    job_id = job.get('_id')
+    return {
+        'job_id': job_id,
+        'type': job.get('type'),
+        'person_name': job.get('person_name'),
+        'status': job.get('status'),
+        'stage': job.get('stage'),
+        'progress': job.get('progress'),
+        'events': [
+            {'stage': event.get('stage'), 'at': format_timestamp(event.get('at'))}
+            for event in job.get('events', [])
+        ],
+        'result': job.get('result'),
+        'error': job.get('error'),
+        'status_url': url_for('get_job_status', job_id=job_id),
+        'events_url': url_for('stream_job_events', job_id=job_id)
+    }
+
+# In-process name search index
+# Serves /api/historical-figures/search without scanning the collection. Names are kept in
+# sorted lists for prefix lookups (bisect) and in a trigram posting map for substring lookups.
+class FigureSearchIndex:
+    """
+    Name index over historical figures, ranked as:
+    0. the full name starts with the query
+    1. a word in the name starts with the query
+    2. the query appears anywhere in the name (queries of 3+ characters)
+    """
+    
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self.ready = False
+        self._last_refresh = 0.0
+        self._last_rebuild = 0.0
+        # Rebuilds and refreshes run one at a time on a background worker, never on a request thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='search-index')
+        self._refreshing = False
+        self._added_during_rebuild = None  # figures added while a rebuild reads the collection
+    
+    def _reset(self):
+        self._names = {}  # figure id -> person_name_lower
+        self._sorted_names = []  # (person_name_lower, figure id)
+        self._sorted_tokens = []  # (token, figure id)
+        self._trigrams = {}  # trigram -> set of figure ids
+        self._max_object_id = None
+    
+    @staticmethod
+    def _trigrams_of(text: str) -> set:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+    
+    @staticmethod
+    def _tokens_of(text: str) -> set:
+        return set(re.findall(r'\w+', text))
+    
+    def _add_locked(self, figure_id, name_lower: str):
+        key = str(figure_id)
+        if key in self._names or not name_lower:
+            return
+        self._names[key] = name_lower
+        bisect.insort(self._sorted_names, (name_lower, key))
+        for token in self._tokens_of(name_lower):
+            bisect.insort(self._sorted_tokens, (token, key))
+        for trigram in self._trigrams_of(name_lower):
+            self._trigrams.setdefault(trigram, set()).add(key)
+        if isinstance(figure_id, ObjectId) and (self._max_object_id is None or figure_id > self._max_object_id):
+            self._max_object_id = figure_id
+    
+    def add(self, figure_id, person_name_lower: str):
+        """Add a newly created figure."""
+        with self._lock:
+            self._add_locked(figure_id, person_name_lower)
+            if self._added_during_rebuild is not None:
+                self._added_during_rebuild.append((figure_id, person_name_lower))
+    
+    def rebuild(self):
+        """
+        Reload every figure name from MongoDB (projected, names only). The new index is
+        built without the lock (sorted once, not per insert) and swapped in; searches keep
+        using the old one meanwhile.
+        """
+        with self._lock:
+            self._added_during_rebuild = []
+        try:
+            names = {}
+            max_object_id = None
+            for fig in db[HISTORICAL_FIGURES_COLLECTION].find({}, {'person_name_lower': 1}):
+                name_lower = fig.get('person_name_lower')
+                if not name_lower:
+                    continue
+                names[str(fig['_id'])] = name_lower
+                if isinstance(fig['_id'], ObjectId) and (max_object_id is None or fig['_id'] > max_object_id):
+                    max_object_id = fig['_id']
+            
+            sorted_names = sorted((name_lower, key) for key, name_lower in names.items())
+            sorted_tokens = sorted(
+                (token, key) for key, name_lower in names.items() for token in self._tokens_of(name_lower)
+            )
+            trigrams = {}
+            for key, name_lower in names.items():
+                for trigram in self._trigrams_of(name_lower):
+                    trigrams.setdefault(trigram, set()).add(key)
+            
+            with self._lock:
+                self._names, self._sorted_names, self._sorted_tokens = names, sorted_names, sorted_tokens
+                self._trigrams, self._max_object_id = trigrams, max_object_id
+                # Figures created while the collection was being read may be missing from it
+                for figure_id, name_lower in self._added_during_rebuild:
+                    self._add_locked(figure_id, name_lower)
+                self.ready = True
+                self._last_rebuild = self._last_refresh = time.time()
+                count = len(self._names)
+        finally:
+            with self._lock:
+                self._added_during_rebuild = None
+        print(f"✅ Search index built with {count} figures")
+    
+    def refresh(self):
+        """Pick up figures inserted by other instances since the newest indexed one."""
+        with self._lock:
+            query = {'_id': {'$gt': self._max_object_id}} if self._max_object_id else {}
+        for fig in db[HISTORICAL_FIGURES_COLLECTION].find(query, {'person_name_lower': 1}):
+            self.add(fig['_id'], fig.get('person_name_lower'))
+    
+    def refresh_if_stale(self):
+        """
+        Schedule a refresh (figures inserted by other instances) or, periodically, a full
+        rebuild (drops deleted figures) on the background worker. Never blocks the caller;
+        searches use the current index until the update is swapped in.
+        """
+        now = time.time()
+        with self._lock:
+            if self._refreshing:
+                return
+            # Until a rebuild has succeeded, retry it at the refresh interval
+            rebuild_after = SEARCH_INDEX_REBUILD_INTERVAL if self.ready else SEARCH_INDEX_REFRESH_INTERVAL
+            if now - self._last_rebuild > rebuild_after:
+                task = self.rebuild
+                self._last_rebuild = self._last_refresh = now
+            elif now - self._last_refresh >= SEARCH_INDEX_REFRESH_INTERVAL:
+                task = self.refresh
+                self._last_refresh = now
+            else:
+                return
+            self._refreshing = True
+        self._executor.submit(self._run_refresh, task)
+    
+    def rebuild_in_background(self):
+        """Schedule a full rebuild (e.g. at startup)."""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+            self._last_rebuild = self._last_refresh = time.time()
+        self._executor.submit(self._run_refresh, self.rebuild)
+    
+    def _run_refresh(self, task: Callable[[], None]):
+        try:
+            task()
+        except Exception as e:
+            print(f"Warning: Could not update search index: {e}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+    
+    @staticmethod
+    def _prefix_range(sorted_pairs: list, prefix: str) -> list:
+        start = bisect.bisect_left(sorted_pairs, (prefix,))
+        # '\uffff' sorts after any character that can follow the prefix
+        end = bisect.bisect_left(sorted_pairs, (prefix + '\uffff',))
+        return sorted_pairs[start:end]
+    
+    def search(self, query: str, limit: int) -> list:
+        """Return up to limit figure ids (strings) ranked by match quality."""
+        query = ' '.join(query.lower().split())
+        if not query:
+            return []
+        
+        with self._lock:
+            ranks = {}
+            for _, key in self._prefix_range(self._sorted_names, query):
+                ranks[key] = 0
+            for _, key in self._prefix_range(self._sorted_tokens, query):
+                ranks.setdefault(key, 1)
+            
+            if len(query) >= 3:
+                postings = [self._trigrams.get(trigram, set()) for trigram in self._trigrams_of(query)]
+                postings.sort(key=len)
+                candidates = set.intersection(*postings) if postings else set()
+                for key in candidates:
+                    if key not in ranks and query in self._names[key]:
+                        ranks[key] = 2
+            
+            ranked = sorted(ranks, key=lambda key: (ranks[key], len(self._names[key]), self._names[key]))
+            return ranked[:limit]
+
+FIGURE_SEARCH_INDEX = FigureSearchIndex()
+
+FIGURE_SEARCH_INDEX.rebuild_in_background()
+
 @app.route('/')
 def index():
     return jsonify({
@@ -553,6 +2496,15 @@ def index():
         'status': 'connected'
     })
 
+AGENTS_CURRENT.set_function(
+    lambda: db[HISTORICAL_FIGURES_COLLECTION].count_documents({'elevenlabs_agent_id': {'$exists': True}})
+)
+
+@app.route('/metrics')
+def metrics():
+    """Instance metrics in the Prometheus text exposition format."""
+    return Response(METRICS_REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route('/health')
 def health():
     try:
@@ -567,52 +2519,217 @@ def health():
             'error': str(e)
         }), 500
 
+@app.route('/health/indexes')
+def health_indexes():
+    """Report expected MongoDB indexes that are missing."""
+    try:
+        missing = find_missing_indexes()
+        return jsonify({
+            'status': 'ok' if not missing else 'missing_indexes',
+            'spec_version': INDEX_SPEC_VERSION,
+            'missing': missing
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'status': 'unhealthy',
+            'error': str(e)
+        }), 500
+
 @app.route('/api/historical-figure/<person_name>', methods=['GET'])
 def get_historical_figure(person_name):
-    """Get or create historical figure profile. Queries Gemini if not in database."""
+    """
+    Get or create historical figure profile. Queries Gemini if not in database.
+    
+    Query parameters:
+    - fields: comma-separated top-level fields to return (projected in MongoDB), e.g.
+      fields=person_name,elevenlabs_agent_id
+    
+    Responses carry a content-hash ETag (If-None-Match answers 304) and are compressed
+    with br or gzip when the client accepts it.
+    """
     try:
         if not GEMINI_API_KEY:
             return jsonify({
                 'error': 'GEMINI_API_KEY is not configured. Please set it as an environment variable.'
             }), 500
         
-        figure_data = get_or_create_historical_figure(person_name)
-        return jsonify(figure_data), 200
+        try:
+            fields = parse_fields_param(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        figure_data = get_or_create_historical_figure(person_name, fields)
+        
+        response = jsonify(figure_data)
+        # Weak ETag: the same representation is served gzip-, br- or un-encoded
+        response.set_etag(hashlib.sha1(response.get_data()).hexdigest(), weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        response = response.make_conditional(request)
+        return compress_response(response)
         
+    except DependencyUnavailable as e:
+        return dependency_unavailable_response(e)
     except ValueError as e:
         return jsonify({'error': str(e)}), 500
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/historical-figure/<person_name>/stream', methods=['GET'])
+def stream_historical_figure(person_name):
+    """
+    Stream a historical figure profile as Server-Sent Events.
+    Emits an 'answer' event ({q, question, answer}) as soon as each answer is available,
+    then a 'done' event with the stored figure (or 'error'). If a Gemini attempt fails
+    after answers were sent, a 'retract' event ({q}) withdraws each of them before the
+    retry sends new ones. Existing figures are replayed from the database; new figures are
+    generated (and persisted as usual) on the streaming pool while streaming.
+    """
+    if not GEMINI_API_KEY:
+        return jsonify({
+            'error': 'GEMINI_API_KEY is not configured. Please set it as an environment variable.'
+        }), 500
+    
+    person_lower = person_name.lower().strip()
+    channel = get_answer_channel(person_lower)
+    subscriber = channel.subscribe()
+    existing = db[HISTORICAL_FIGURES_COLLECTION].find_one({'person_name_lower': person_lower}, {'elevenlabs': 1})
+    if existing and existing.get('elevenlabs'):
+        # Nothing to generate: read it here rather than wait behind generations in the pool
+        generation = Future()
+        try:
+            generation.set_result(get_or_create_historical_figure(person_name))
+        except Exception as e:
+            generation.set_exception(e)
+    else:
+        generation = _STREAM_EXECUTOR.submit(get_or_create_historical_figure, person_name)
+    
+    def format_answer(q_num: int, answer: str) -> str:
+        return format_sse_event('answer', {'q': q_num, 'question': HISTORICAL_FIGURE_QUESTIONS[q_num - 1], 'answer': answer})
+    
+    def generate():
+        sent = {}
+        last_write = time.time()
+        try:
+            while not (generation.done() and subscriber.empty()):
+                try:
+                    q_num, answer = subscriber.get(timeout=1)
+                except queue.Empty:
+                    if time.time() - last_write > ANSWER_STREAM_KEEPALIVE:
+                        last_write = time.time()
+                        yield ": keep-alive\n\n"
+                    continue
+                last_write = time.time()
+                if answer is None:
+                    if sent.pop(q_num, None) is not None:
+                        yield format_sse_event('retract', {'q': q_num})
+                    continue
+                sent[q_num] = answer
+                yield format_answer(q_num, answer)
+            
+            try:
+                figure_data = generation.result()
+            except Exception as e:
+                yield format_sse_event('error', {'error': str(e)})
+                return
+            
+            # Send anything not streamed (existing figures, other instances, final parse differences)
+            stored_answers = figure_data.get('answers', {})
+            for q_num, question in enumerate(HISTORICAL_FIGURE_QUESTIONS, 1):
+                answer = stored_answers.get(question)
+                if answer and sent.get(q_num) != answer:
+                    yield format_answer(q_num, answer)
+            yield format_sse_event('done', {'figure': figure_data})
+        finally:
+            channel.unsubscribe(subscriber)
+            release_answer_channel(person_lower, channel)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @app.route('/api/historical-figures', methods=['GET'])
 def list_historical_figures():
     """
-    List all historical figures in the database.
+    List historical figures in the database, one page at a time.
     Returns summary information suitable for frontend display.
+    
+    Query parameters:
+    - limit: page size (default LIST_DEFAULT_LIMIT, max LIST_MAX_LIMIT)
+    - cursor: next_cursor from the previous page
+    - since: an id from an earlier listing; only figures added after it are returned
+    - has_agent: "true" to list only figures with an agent
+    
+    Pages are ordered by _id (insertion order) and fetched with a keyset query, so
+    every page costs the same however large the collection grows. The ETag follows
+    the collection version, so an unchanged listing answers 304 Not Modified.
     """
-    collection = db[HISTORICAL_FIGURES_COLLECTION]
+    try:
+        limit = int(request.args.get('limit', LIST_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'Parameter "limit" must be an integer'}), 400
+    limit = max(1, min(limit, LIST_MAX_LIMIT))
+    
+    # cursor and since are both ids to continue after; the later one wins
+    after = None
+    for param in ('cursor', 'since'):
+        value = request.args.get(param)
+        if not value:
+            continue
+        if not ObjectId.is_valid(value):
+            return jsonify({'error': f'Parameter "{param}" is not a valid id'}), 400
+        value = ObjectId(value)
+        after = value if after is None else max(after, value)
+    has_agent = request.args.get('has_agent', '').lower() == 'true'
+    
+    # Step 1: Conditional GET against the collection version (one _id lookup)
+    params_key = f"{limit}:{after}:{has_agent}"
+    etag = f"figures-{get_figures_version()}-{hashlib.sha1(params_key.encode('utf-8')).hexdigest()[:8]}"
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    
+    # Step 2: Keyset query; one extra document tells whether another page exists
+    query = {}
+    if after is not None:
+        query['_id'] = {'$gt': after}
+    if has_agent:
+        query['elevenlabs_agent_id'] = {'$exists': True}
     
-    # Get all figures with relevant fields for listing (projection for efficiency)
-    figures = list(collection.find({}, {
+    collection = db[HISTORICAL_FIGURES_COLLECTION]
+    figures = list(collection.find(query, {
         'person_name': 1,
         'elevenlabs_agent_id': 1,
         'elevenlabs_voice_id': 1,
         '_id': 1
-    }))
+    }).sort('_id', 1).limit(limit + 1))
+    
+    has_more = len(figures) > limit
+    figures = figures[:limit]
     
     # Format for frontend
     result = [format_figure_for_list(fig) for fig in figures]
     
-    return jsonify({
+    response = jsonify({
         'figures': result,
-        'count': len(result)
-    }), 200
+        'count': len(result),
+        'next_cursor': result[-1]['id'] if has_more else None,
+        'last_id': result[-1]['id'] if result else (str(after) if after else None),
+        'has_more': has_more
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response, 200
 
 @app.route('/api/historical-figures/search', methods=['GET'])
 def search_historical_figures():
     """
     Search for historical figures by name.
-    Query parameter: 'q' - search query
+    Query parameters:
+    - 'q' - search query
+    - 'limit' - maximum number of results (default 20, max 100)
+    Results are ranked: name prefix matches, then word prefix matches, then substring matches.
     """
     search_query = request.args.get('q', '').strip()
     
@@ -621,18 +2738,34 @@ def search_historical_figures():
             'error': 'Missing search query parameter "q"'
         }), 400
     
-    collection = db[HISTORICAL_FIGURES_COLLECTION]
+    try:
+        limit = int(request.args.get('limit', SEARCH_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'Parameter "limit" must be an integer'}), 400
+    limit = max(1, min(limit, SEARCH_MAX_LIMIT))
     
-    # Case-insensitive search (optimized: use index on person_name_lower)
-    search_lower = search_query.lower()
-    figures = list(collection.find({
-        'person_name_lower': {'$regex': search_lower, '$options': 'i'}
-    }, {
+    collection = db[HISTORICAL_FIGURES_COLLECTION]
+    projection = {
         'person_name': 1,
         'elevenlabs_agent_id': 1,
         'elevenlabs_voice_id': 1,
         '_id': 1
-    }))
+    }
+    
+    FIGURE_SEARCH_INDEX.refresh_if_stale()
+    if FIGURE_SEARCH_INDEX.ready:
+        ranked_ids = FIGURE_SEARCH_INDEX.search(search_query, limit)
+        # Fetch current agent fields by _id so has_agent reflects creations/evictions
+        figures_by_id = {
+            str(fig['_id']): fig
+            for fig in collection.find({'_id': {'$in': [ObjectId(fid) for fid in ranked_ids]}}, projection)
+        }
+        figures = [figures_by_id[fid] for fid in ranked_ids if fid in figures_by_id]
+    else:
+        # Index still building: fall back to a bounded regex query
+        figures = list(collection.find({
+            'person_name_lower': {'$regex': re.escape(search_query.lower())}
+        }, projection).limit(limit))
     
     result = [format_figure_for_list(fig) for fig in figures]
     
@@ -642,84 +2775,316 @@ def search_historical_figures():
         'count': len(result)
     }), 200
 
-@app.route('/api/historical-figure/<person_name>/create-with-agent', methods=['POST'])
-def create_figure_with_agent(person_name):
+def build_figure_with_agent(person_name: str) -> Dict:
+    """
+    Get or create a historical figure profile and create its ElevenLabs agent if needed.
+    Returns the create-with-agent response body. Profile generation and agent creation
+    are recorded in one pipeline trace.
+    """
+    with figure_unit_of_work():
+        return run_traced_pipeline(person_name, lambda: _build_figure_with_agent(person_name))
+
+def _build_figure_with_agent(person_name: str) -> Dict:
+    # Step 1: Get or create historical figure
+    report_job_stage('profile')
+    figure_data = get_or_create_historical_figure(person_name)
+    
+    # Step 2: Check if agent already exists
+    agent_id = figure_data.get('elevenlabs_agent_id')
+    voice_id = figure_data.get('elevenlabs_voice_id')
+    
+    agent_status = 'existing' if agent_id else 'none'
+    
+    # Step 3: Create agent if it doesn't exist and ElevenLabs is configured
+    if not agent_id and ELEVENLABS_API_KEY:
+        try:
+            agent_result = create_elevenlabs_agent_for_figure(person_name)
+            agent_id = agent_result.get('agent_id')
+            voice_id = agent_result.get('voice_id')
+            agent_status = 'created'
+            
+            # The agent pipeline updated the tracked figure in place; outside a unit of
+            # work, re-read it to get the updated IDs
+            if current_figure_map() is None:
+                figure_data = get_or_create_historical_figure(person_name)
+        except Exception as e:
+            agent_status = f'creation_failed: {str(e)}'
+            print(f"Agent creation failed: {e}")
+    
+    return {
+        'figure': figure_data,
+        'agent': {
+            'agent_id': agent_id,
+            'voice_id': voice_id,
+            'status': agent_status,
+            'ready': bool(agent_id)
+        }
+    }
+
+@app.route('/api/historical-figure/<person_name>/create-with-agent', methods=['POST'])
+def create_figure_with_agent(person_name):
+    """
+    Create or get historical figure profile AND create ElevenLabs agent.
+    Perfect for frontend: user searches, creates figure, gets agent ready to use.
+    
+    If the figure already has an agent, returns 200 with:
+    - Complete figure data
+    - voice_id and agent_id
+    - Status of agent creation
+    
+    Otherwise queues a background job and returns 202 with the job id, a status URL
+    (GET /api/jobs/<job_id>) and a Server-Sent Events URL (GET /api/jobs/<job_id>/events).
+    The finished job's result has the same shape as the 200 response.
+    """
+    try:
+        if not GEMINI_API_KEY:
+            return jsonify({
+                'error': 'GEMINI_API_KEY is not configured.'
+            }), 500
+        
+        collection = db[HISTORICAL_FIGURES_COLLECTION]
+        person_lower = person_name.lower().strip()
+        existing = collection.find_one(
+            {'person_name_lower': person_lower},
+            {'elevenlabs_agent_id': 1, 'elevenlabs': 1}
+        )
+        
+        # Nothing to do in the background: answer directly
+        if existing and existing.get('elevenlabs') and (existing.get('elevenlabs_agent_id') or not ELEVENLABS_API_KEY):
+            return jsonify(build_figure_with_agent(person_name)), 200
+        
+        job = enqueue_job('create_with_agent', person_name, build_figure_with_agent)
+        response = jsonify(format_job(job))
+        response.headers['Location'] = url_for('get_job_status', job_id=job['_id'])
+        return response, 202
+        
+    except DependencyUnavailable as e:
+        return dependency_unavailable_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Get the status, progress events and (when finished) result of a background job."""
+    job = load_job(job_id)
+    if not job:
+        return jsonify({'error': f'Job {job_id} not found'}), 404
+    return jsonify(format_job(job)), 200
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def stream_job_events(job_id):
+    """
+    Stream job progress as Server-Sent Events.
+    Emits a 'progress' event whenever the job changes stage and a final 'done' or
+    'failed' event with the job result. The stream closes after JOB_EVENTS_MAX_DURATION
+    seconds; EventSource clients reconnect automatically.
+    """
+    jobs = db[JOBS_COLLECTION]
+    if not jobs.find_one({'_id': job_id}, {'_id': 1}):
+        return jsonify({'error': f'Job {job_id} not found'}), 404
+    
+    # url_for needs the request context, which is gone once streaming starts
+    status_url = url_for('get_job_status', job_id=job_id)
+    events_url = url_for('stream_job_events', job_id=job_id)
+    
+    def generate():
+        deadline = time.time() + JOB_EVENTS_MAX_DURATION
+        last_event_count = 0
+        last_progress = None
+        while time.time() < deadline:
+            job = load_job(job_id)
+            if not job:
+                yield format_sse_event('failed', {'job_id': job_id, 'error': 'Job not found'})
+                return
+            
+            events = job.get('events', [])
+            for event in events[last_event_count:]:
+                yield format_sse_event('progress', {'job_id': job_id, 'stage': event.get('stage'), 'at': format_timestamp(event.get('at'))})
+            last_event_count = len(events)
+            
+            if job.get('progress') and job['progress'] != last_progress:
+                last_progress = job['progress']
+                yield format_sse_event('progress', {'job_id': job_id, 'stage': job.get('stage'), 'progress': last_progress})
+            
+            if job.get('status') in JOB_TERMINAL_STATUSES:
+                yield format_sse_event('done' if job['status'] == 'succeeded' else 'failed', {
+                    'job_id': job_id,
+                    'status': job['status'],
+                    'result': job.get('result'),
+                    'error': job.get('error'),
+                    'status_url': status_url,
+                    'events_url': events_url
+                })
+                return
+            
+            # Comment line keeps proxies from closing an idle connection
+            yield ": keep-alive\n\n"
+            time.sleep(JOB_EVENTS_POLL_INTERVAL)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+# Voice attributes detected in voice descriptions and ElevenLabs voice labels.
+# For each attribute, the value with the most keyword hits wins (ties go to the first listed).
+VOICE_ATTRIBUTE_KEYWORDS = {
+    'gender': {
+        'male': ['male', 'man', 'masculine', 'he', 'his', 'him', 'gentleman'],
+        'female': ['female', 'woman', 'feminine', 'she', 'her', 'lady']
+    },
+    'age': {
+        'young': ['young', 'youth', 'youthful', 'teen', 'child'],
+        'middle_aged': ['middle', 'mature'],
+        'old': ['old', 'elderly', 'aged', 'senior']
+    },
+    'accent': {
+        'british': ['british', 'england', 'english', 'uk'],
+        'american': ['american', 'us', 'usa'],
+        'french': ['french'],
+        'spanish': ['spanish', 'latin'],
+        'german': ['german'],
+        'italian': ['italian'],
+        'irish': ['irish'],
+        'australian': ['australian'],
+        'indian': ['indian']
+    },
+    'pitch': {
+        'low': ['deep', 'low', 'bass', 'baritone'],
+        'high': ['high', 'soprano', 'squeaky'],
+        'soft': ['soft', 'quiet', 'gentle', 'calm'],
+        'strong': ['loud', 'powerful', 'strong', 'bold']
+    }
+}
+
+# Score added for a matching attribute (and subtracted for a conflicting one)
+VOICE_ATTRIBUTE_WEIGHTS = {'gender': 1.0, 'age': 0.5, 'accent': 0.5, 'pitch': 0.3}
+
+def tokenize_voice_text(text: str) -> list:
+    """Lowercase word tokens; hyphenated words also yield their parts."""
+    tokens = []
+    for token in re.findall(r"[a-z]+(?:-[a-z]+)*", text.lower()):
+        tokens.append(token)
+        if '-' in token:
+            tokens.extend(token.split('-'))
+    return tokens
+
+def detect_voice_attributes(tokens: list) -> dict:
+    """Map tokens to {attribute: value} using VOICE_ATTRIBUTE_KEYWORDS."""
+    token_set = set(tokens)
+    attributes = {}
+    for attribute, values in VOICE_ATTRIBUTE_KEYWORDS.items():
+        best_value, best_hits = None, 0
+        for value, keywords in values.items():
+            hits = sum(1 for keyword in keywords if keyword in token_set)
+            if hits > best_hits:
+                best_value, best_hits = value, hits
+        if best_value:
+            attributes[attribute] = best_value
+    return attributes
+
+class VoiceMatchIndex:
     """
-    Create or get historical figure profile AND create ElevenLabs agent in one call.
-    Perfect for frontend: user searches, creates figure, gets agent ready to use.
-    
-    Returns:
-    - Complete figure data
-    - voice_id and agent_id if agent was created
-    - Status of agent creation
+    Precomputed features for every voice in the library: gender/age/accent/pitch attributes
+    (from ElevenLabs labels, falling back to name and description) and an L2-normalised
+    TF-IDF vector over name, description and labels. Ranking a description is a sparse dot
+    product through an inverted index plus attribute agreement, over the whole library.
     """
-    try:
-        if not GEMINI_API_KEY:
-            return jsonify({
-                'error': 'GEMINI_API_KEY is not configured.'
-            }), 500
+    
+    def __init__(self, voices: list):
+        self.voices = voices
+        self._attributes = []
+        self._postings = {}  # term -> [(voice position, weight)]
+        self._idf = {}
         
-        # Step 1: Get or create historical figure
-        figure_data = get_or_create_historical_figure(person_name)
+        documents = []
+        for voice in voices:
+            labels = voice.get('labels') or {}
+            label_text = ' '.join(str(value) for value in labels.values())
+            tokens = tokenize_voice_text(f"{voice.get('name', '')} {voice.get('description') or ''} {label_text}")
+            documents.append(tokens)
+            
+            attributes = detect_voice_attributes(tokens)
+            # Explicit labels are more reliable than free text
+            for attribute in ['gender', 'age', 'accent']:
+                if labels.get(attribute):
+                    attributes.update({
+                        key: value for key, value in detect_voice_attributes(tokenize_voice_text(str(labels[attribute]))).items()
+                        if key == attribute
+                    })
+            self._attributes.append(attributes)
         
-        # Step 2: Check if agent already exists
-        agent_id = figure_data.get('elevenlabs_agent_id')
-        voice_id = figure_data.get('elevenlabs_voice_id')
+        document_frequency = {}
+        for tokens in documents:
+            for term in set(tokens):
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+        count = len(documents)
+        self._idf = {term: math.log((1 + count) / (1 + df)) + 1 for term, df in document_frequency.items()}
         
-        agent_status = 'existing' if agent_id else 'none'
+        for position, tokens in enumerate(documents):
+            vector = self._vectorize(tokens)
+            for term, weight in vector.items():
+                self._postings.setdefault(term, []).append((position, weight))
+    
+    def _vectorize(self, tokens: list) -> dict:
+        counts = {}
+        for token in tokens:
+            if token in self._idf:
+                counts[token] = counts.get(token, 0) + 1
+        vector = {term: tf * self._idf[term] for term, tf in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {term: weight / norm for term, weight in vector.items()} if norm else {}
+    
+    def rank(self, description: str) -> list:
+        """Return [(score, voice)] for every voice, best first."""
+        tokens = tokenize_voice_text(description)
+        query_vector = self._vectorize(tokens)
+        query_attributes = detect_voice_attributes(tokens)
         
-        # Step 3: Create agent if it doesn't exist and ElevenLabs is configured
-        if not agent_id and ELEVENLABS_API_KEY:
-            try:
-                agent_result = create_elevenlabs_agent_for_figure(person_name)
-                agent_id = agent_result.get('agent_id')
-                voice_id = agent_result.get('voice_id')
-                agent_status = 'created'
-                
-                # Refresh figure data to get updated IDs
-                figure_data = get_or_create_historical_figure(person_name)
-            except Exception as e:
-                agent_status = f'creation_failed: {str(e)}'
-                print(f"Agent creation failed: {e}")
+        scores = [0.0] * len(self.voices)
+        for term, query_weight in query_vector.items():
+            for position, weight in self._postings.get(term, []):
+                scores[position] += query_weight * weight
         
-        return jsonify({
-            'figure': figure_data,
-            'agent': {
-                'agent_id': agent_id,
-                'voice_id': voice_id,
-                'status': agent_status,
-                'ready': bool(agent_id)
-            }
-        }), 200
+        for position, voice_attributes in enumerate(self._attributes):
+            for attribute, value in query_attributes.items():
+                voice_value = voice_attributes.get(attribute)
+                if voice_value:
+                    weight = VOICE_ATTRIBUTE_WEIGHTS[attribute]
+                    scores[position] += weight if voice_value == value else -weight
         
-    except ValueError as e:
-        return jsonify({'error': str(e)}), 400
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        order = sorted(range(len(self.voices)), key=lambda position: scores[position], reverse=True)
+        return [(scores[position], self.voices[position]) for position in order]
 
 def select_best_voice_from_description(voices: list, voice_description: str) -> Optional[str]:
     """
     Select the best matching voice from available voices based on description.
-    Uses Gemini AI to intelligently match the voice description to available voices.
+    Ranks the whole library locally with the voice match index; Gemini is only asked to
+    break a tie between the top few candidates.
     """
     if not voices:
         return None
     
-    if not GEMINI_API_KEY:
-        # Fallback to keyword matching if Gemini is not available
-        return select_voice_by_keywords(voices, voice_description)
+    ranked = VOICE_LIBRARY.match_index_for(voices).rank(voice_description)
+    best_score, best_voice = ranked[0]
+    if best_score <= 0:
+        return None
+    
+    tied = [voice for score, voice in ranked[:VOICE_MATCH_TIE_CANDIDATES] if best_score - score <= VOICE_MATCH_TIE_MARGIN]
+    if len(tied) > 1 and GEMINI_API_KEY:
+        tie_winner = break_voice_tie_with_gemini(tied, voice_description)
+        if tie_winner:
+            return tie_winner
     
+    voice_id = best_voice.get('voice_id')
+    print(f"✅ Selected best matching voice: {best_voice.get('name')} (score: {best_score:.2f})")
+    return voice_id
+
+def break_voice_tie_with_gemini(candidates: list, voice_description: str) -> Optional[str]:
+    """Ask Gemini to pick between equally scored voices. Returns None if it can't decide."""
     try:
-        # Prepare voice list for Gemini
-        voice_list = []
-        for voice in voices:
-            voice_list.append({
-                'voice_id': voice.get('voice_id'),
-                'name': voice.get('name', ''),
-                'description': voice.get('description', '')
-            })
-        
-        # Use Gemini to select the best matching voice
         prompt = f"""You are helping to select the best ElevenLabs voice for a historical figure.
 
 Voice Description:
@@ -727,8 +3092,8 @@ Voice Description:
 
 Available Voices:
 """
-        for i, voice in enumerate(voice_list[:20], 1):  # Limit to first 20 voices
-            prompt += f"{i}. Name: {voice['name']}, Description: {voice.get('description', 'N/A')}, ID: {voice['voice_id']}\n"
+        for i, voice in enumerate(candidates, 1):
+            prompt += f"{i}. Name: {voice.get('name', '')}, Description: {voice.get('description') or 'N/A'}, ID: {voice.get('voice_id')}\n"
         
         prompt += """
 Based on the voice description, select the BEST matching voice from the list above.
@@ -738,34 +3103,95 @@ Respond with ONLY the voice number (1, 2, 3, etc.) that best matches the descrip
 If no voice is a good match, respond with "0".
 """
         
-        model_name = get_available_gemini_model()
-        model = genai.GenerativeModel(model_name)
-        response = model.generate_content(prompt)
-        result = response.text.strip()
-        
-        # Parse the response
-        try:
-            voice_number = int(result.split()[0])
-            if 1 <= voice_number <= len(voice_list):
-                selected_voice = voice_list[voice_number - 1]
-                voice_id = selected_voice['voice_id']
-                print(f"✅ Gemini selected voice: {selected_voice['name']} ({voice_id})")
-                return voice_id
-        except (ValueError, IndexError):
-            pass
+        def is_voice_number(text: str) -> bool:
+            return bool(re.match(r'\d+\b', text))
         
-        print(f"⚠️  Gemini response unclear: {result}, falling back to keyword matching")
-        return select_voice_by_keywords(voices, voice_description)
+        model_name = get_available_gemini_model()
+        result = GEMINI_CACHE.get(model_name, prompt, validate=is_voice_number)
+        if not result:
+            model = genai.GenerativeModel(model_name)
+            
+            def attempt(_attempt_number: int, request_options: Dict):
+                start = time.perf_counter()
+                try:
+                    response = model.generate_content(prompt, request_options=request_options)
+                except Exception:
+                    observe_gemini_call(model_name, 'voice_tiebreak', start, error=True)
+                    raise
+                observe_gemini_call(model_name, 'voice_tiebreak', start, response)
+                return response
+            
+            # Optional refinement: a single attempt, and none while the circuit is open
+            result = call_gemini(model_name, 'voice_tiebreak', attempt, max_attempts=1).text.strip()
+            GEMINI_CACHE.put(model_name, prompt, None, result, validate=is_voice_number)
         
+        voice_number = int(result.split()[0])
+        if 1 <= voice_number <= len(candidates):
+            selected_voice = candidates[voice_number - 1]
+            print(f"✅ Gemini broke voice tie: {selected_voice.get('name')} ({selected_voice.get('voice_id')})")
+            return selected_voice.get('voice_id')
     except Exception as e:
-        print(f"⚠️  Error using Gemini for voice selection: {e}")
-        return select_voice_by_keywords(voices, voice_description)
+        print(f"⚠️  Gemini voice tie-break failed: {e}")
+    
+    return None
+
+class KeywordMatcher:
+    """
+    Multi-keyword substring matcher compiled into one regex alternation.
+    A single scan returns every (position, keyword) hit, including keywords that overlap
+    (the alternation is a lookahead, and keywords that are prefixes of a longer keyword
+    are reported alongside it). Results are memoized per text.
+    """
+    
+    def __init__(self, keywords: list, cache_size: int = 512):
+        self.keywords = list(dict.fromkeys(keyword.lower() for keyword in keywords))
+        longest_first = sorted(self.keywords, key=len, reverse=True)
+        self._pattern = re.compile('(?=(' + '|'.join(re.escape(keyword) for keyword in longest_first) + '))')
+        # The alternation reports the longest keyword at a position; shorter ones starting
+        # there are necessarily prefixes of it
+        self._prefixes = {
+            keyword: [other for other in self.keywords if other != keyword and keyword.startswith(other)]
+            for keyword in self.keywords
+        }
+        self.find_all = functools.lru_cache(maxsize=cache_size)(self._find_all)
+    
+    def _find_all(self, text: str) -> tuple:
+        hits = []
+        for match in self._pattern.finditer(text.lower()):
+            keyword = match.group(1)
+            hits.append((match.start(), keyword))
+            hits.extend((match.start(), prefix) for prefix in self._prefixes[keyword])
+        return tuple(hits)
+    
+    def keywords_in(self, text: str) -> set:
+        return {keyword for _, keyword in self.find_all(text)}
+
+# Technical voice characteristics keywords to extract
+VOICE_DESCRIPTION_KEYWORDS = [
+    'baritone', 'tenor', 'bass', 'soprano', 'alto',
+    'deep', 'high', 'low', 'pitch', 'tone', 'timbre',
+    'smooth', 'rough', 'gritty', 'clear', 'muffled',
+    'resonant', 'nasal', 'breathy', 'powerful', 'soft', 'quiet', 'loud',
+    'vibrato', 'tremolo', 'staccato', 'legato',
+    'slow', 'fast', 'quick', 'measured', 'deliberate',
+    'accent', 'dialect', 'pronunciation', 'enunciation',
+    'southern', 'northern', 'british', 'american', 'english',
+    'drawl', 'twang', 'lilt', 'cadence', 'rhythm',
+    'monotone', 'expressive', 'animated', 'flat',
+    'warm', 'cold', 'harsh', 'gentle', 'mellow',
+    'young', 'mature', 'aged', 'elderly', 'weak', 'strong',
+    'three-octave', 'range', 'versatile', 'distinctive'
+]
+
+VOICE_KEYWORD_MATCHER = KeywordMatcher(VOICE_DESCRIPTION_KEYWORDS)
 
+@functools.lru_cache(maxsize=256)
 def sanitize_voice_description(description: str) -> str:
     """
     Sanitize voice description to focus on technical voice characteristics only.
     Removes personality traits, historical context, names, and potentially problematic content
-    that might trigger ElevenLabs safety filters.
+    that might trigger ElevenLabs safety filters. Memoized, since bulk runs sanitize the
+    same summaries repeatedly.
     """
     # Remove any person names - split into words and filter
     words = description.split()
@@ -781,32 +3207,21 @@ def sanitize_voice_description(description: str) -> str:
     
     # Rejoin and continue with keyword extraction
     description = ' '.join(filtered_words)
-    description_lower = description.lower()
-    
-    # Technical voice characteristics keywords to extract
-    voice_keywords = [
-        'baritone', 'tenor', 'bass', 'soprano', 'alto',
-        'deep', 'high', 'low', 'pitch', 'tone', 'timbre',
-        'smooth', 'rough', 'gritty', 'clear', 'muffled',
-        'resonant', 'nasal', 'breathy', 'powerful', 'soft', 'quiet', 'loud',
-        'vibrato', 'tremolo', 'staccato', 'legato',
-        'slow', 'fast', 'quick', 'measured', 'deliberate',
-        'accent', 'dialect', 'pronunciation', 'enunciation',
-        'southern', 'northern', 'british', 'american', 'english',
-        'drawl', 'twang', 'lilt', 'cadence', 'rhythm',
-        'monotone', 'expressive', 'animated', 'flat',
-        'warm', 'cold', 'harsh', 'gentle', 'mellow',
-        'young', 'mature', 'aged', 'elderly', 'weak', 'strong',
-        'three-octave', 'range', 'versatile', 'distinctive'
-    ]
     
-    # Extract sentences that contain voice-related keywords
+    # One scan over the whole description; each hit is assigned to its sentence by position
+    hits = VOICE_KEYWORD_MATCHER.find_all(description)
     sentences = description.split('.')
-    relevant_sentences = []
-    
+    sentence_starts = []
+    offset = 0
     for sentence in sentences:
-        sentence_lower = sentence.lower()
-        if any(keyword in sentence_lower for keyword in voice_keywords):
+        sentence_starts.append(offset)
+        offset += len(sentence) + 1
+    matched_sentences = {bisect.bisect_right(sentence_starts, position) - 1 for position, _ in hits}
+    
+    # Extract sentences that contain voice-related keywords
+    relevant_sentences = []
+    for index, sentence in enumerate(sentences):
+        if index in matched_sentences:
             cleaned = sentence.strip()
             if cleaned:
                 relevant_sentences.append(cleaned)
@@ -816,7 +3231,8 @@ def sanitize_voice_description(description: str) -> str:
         sanitized = '. '.join(relevant_sentences[:3])
     else:
         # Fallback: extract keywords and create a simple description
-        found_keywords = [kw for kw in voice_keywords if kw in description_lower]
+        found = {keyword for _, keyword in hits}
+        found_keywords = [kw for kw in VOICE_DESCRIPTION_KEYWORDS if kw in found]
         if found_keywords:
             sanitized = f"A voice with {', '.join(found_keywords[:5])} characteristics."
         else:
@@ -831,70 +3247,6 @@ def sanitize_voice_description(description: str) -> str:
     # Ensure it's not too long
     return sanitized[:500]
 
-def select_voice_by_keywords(voices: list, voice_description: str) -> Optional[str]:
-    """
-    Fallback: Select voice using keyword matching.
-    """
-    description_lower = voice_description.lower()
-    keywords_to_match = []
-    
-    # Gender indicators
-    if any(word in description_lower for word in ['male', 'man', 'he', 'his', 'masculine']):
-        keywords_to_match.extend(['male', 'man', 'masculine'])
-    elif any(word in description_lower for word in ['female', 'woman', 'she', 'her', 'feminine']):
-        keywords_to_match.extend(['female', 'woman', 'feminine'])
-    
-    # Age indicators
-    if any(word in description_lower for word in ['young', 'youth', 'teen', 'child']):
-        keywords_to_match.extend(['young', 'youth'])
-    elif any(word in description_lower for word in ['old', 'elderly', 'aged', 'senior']):
-        keywords_to_match.extend(['old', 'elderly', 'mature'])
-    
-    # Accent/region indicators
-    if 'british' in description_lower or 'england' in description_lower:
-        keywords_to_match.extend(['british', 'english', 'uk'])
-    elif 'american' in description_lower or 'us' in description_lower:
-        keywords_to_match.extend(['american', 'us'])
-    elif 'french' in description_lower:
-        keywords_to_match.extend(['french'])
-    elif 'spanish' in description_lower or 'latin' in description_lower:
-        keywords_to_match.extend(['spanish', 'latin'])
-    
-    # Voice characteristics
-    if 'deep' in description_lower or 'low' in description_lower or 'bass' in description_lower:
-        keywords_to_match.extend(['deep', 'low', 'bass'])
-    elif 'high' in description_lower or 'soprano' in description_lower or 'squeaky' in description_lower:
-        keywords_to_match.extend(['high', 'soprano'])
-    elif 'soft' in description_lower or 'quiet' in description_lower or 'gentle' in description_lower:
-        keywords_to_match.extend(['soft', 'gentle', 'calm'])
-    elif 'loud' in description_lower or 'powerful' in description_lower or 'strong' in description_lower:
-        keywords_to_match.extend(['powerful', 'strong', 'bold'])
-    
-    # Score each voice based on keyword matches
-    scored_voices = []
-    for voice in voices:
-        voice_name = voice.get('name', '').lower()
-        voice_description_text = voice.get('description', '').lower()
-        combined_text = f"{voice_name} {voice_description_text}"
-        
-        score = 0
-        for keyword in keywords_to_match:
-            if keyword in combined_text:
-                score += 1
-        
-        if score > 0:
-            scored_voices.append((score, voice))
-    
-    # Return the highest scoring voice
-    if scored_voices:
-        scored_voices.sort(key=lambda x: x[0], reverse=True)
-        best_voice = scored_voices[0][1]
-        voice_id = best_voice.get('voice_id')
-        print(f"✅ Selected best matching voice (keyword match): {best_voice.get('name')} (score: {scored_voices[0][0]})")
-        return voice_id
-    
-    return None
-
 def create_elevenlabs_voice(person_name: str, voice_description: str) -> Optional[str]:
     """
     Create an ElevenLabs voice using the Voice Design API from text description.
@@ -907,18 +3259,13 @@ def create_elevenlabs_voice(person_name: str, voice_description: str) -> Optiona
         raise ValueError("ELEVENLABS_API_KEY is not configured")
     
     try:
-        headers = get_elevenlabs_headers()
-        
         # First, check if a voice with this person's name already exists
-        voices_url = f"{ELEVENLABS_API_BASE}/voices"
-        voices_response = requests.get(voices_url, headers=headers)
-        if voices_response.status_code == 200:
-            voices = voices_response.json().get('voices', [])
-            for voice in voices:
-                if person_name.lower() in voice.get('name', '').lower():
-                    voice_id = voice.get('voice_id')
-                    print(f"✅ Using existing voice for {person_name}: {voice_id} ({voice.get('name')})")
-                    return voice_id
+        with trace_stage('voice_listing'):
+            existing_voice = VOICE_LIBRARY.find_voice_for_person(person_name)
+        if existing_voice:
+            voice_id = existing_voice.get('voice_id')
+            print(f"✅ Using existing voice for {person_name}: {voice_id} ({existing_voice.get('name')})")
+            return voice_id
         
         # Step 1: Sanitize the voice description to avoid safety filter issues
         sanitized_description = sanitize_voice_description(voice_description)
@@ -926,8 +3273,6 @@ def create_elevenlabs_voice(person_name: str, voice_description: str) -> Optiona
         print(f"Original description: {voice_description[:150]}...")
         print(f"Sanitized description: {sanitized_description[:150]}...")
         
-        design_url = f"{ELEVENLABS_API_BASE}/text-to-voice/design"
-        
         # Prepare a sample text that would be appropriate for the historical figure
         # The API requires at least 100 characters, so we create a longer sample
         # This text will be used to generate the voice preview
@@ -945,20 +3290,23 @@ How may I assist you today? I'm here to answer your questions and share my persp
             "text": sample_text
         }
         
-        design_response = requests.post(design_url, json=design_payload, headers=headers, timeout=60)
+        with trace_stage('voice_design'):
+            design_response = elevenlabs.post('design_voice', '/text-to-voice/design', json=design_payload)
+            if design_response.status_code not in [200, 201]:
+                set_stage_outcome('failed')
         
         if design_response.status_code not in [200, 201]:
             error_text = design_response.text[:500]
             print(f"⚠️  Voice design failed ({design_response.status_code}): {error_text}")
             # Fallback to voice selection if design fails
-            return fallback_voice_selection(person_name, voice_description, headers)
+            return fallback_voice_selection(person_name, voice_description)
         
         design_data = design_response.json()
         previews = design_data.get('previews', [])
         
         if not previews:
             print(f"⚠️  No voice previews generated")
-            return fallback_voice_selection(person_name, voice_description, headers)
+            return fallback_voice_selection(person_name, voice_description)
         
         # Step 2: Use the first preview to create the voice
         # (In a production app, you might want to let the user choose, but for automation we'll use the first)
@@ -966,20 +3314,21 @@ How may I assist you today? I'm here to answer your questions and share my persp
         
         if not generated_voice_id:
             print(f"⚠️  No generated_voice_id in preview response")
-            return fallback_voice_selection(person_name, voice_description, headers)
+            return fallback_voice_selection(person_name, voice_description)
         
         print(f"✅ Generated voice preview, creating voice in library...")
         
         # Step 3: Create the voice in the library using the generated voice ID
-        create_url = f"{ELEVENLABS_API_BASE}/text-to-voice/create"
-        
         create_payload = {
             "voice_name": f"{person_name} Voice",
             "voice_description": voice_description[:500],  # Limit description length
             "generated_voice_id": generated_voice_id
         }
         
-        create_response = requests.post(create_url, json=create_payload, headers=headers, timeout=30)
+        with trace_stage('voice_create'):
+            create_response = elevenlabs.post('create_voice', '/text-to-voice/create', json=create_payload)
+            if create_response.status_code not in [200, 201]:
+                set_stage_outcome('failed')
         
         if create_response.status_code in [200, 201]:
             voice_data = create_response.json()
@@ -990,51 +3339,52 @@ How may I assist you today? I'm here to answer your questions and share my persp
             )
             if voice_id:
                 print(f"✅ Created ElevenLabs voice for {person_name}: {voice_id}")
+                VOICE_LIBRARY.invalidate()
                 return voice_id
             else:
                 print(f"⚠️  Voice created but no voice_id in response: {voice_data}")
         
         # If creation fails, try fallback
         print(f"⚠️  Voice creation failed ({create_response.status_code}): {create_response.text[:300]}")
-        return fallback_voice_selection(person_name, voice_description, headers)
+        return fallback_voice_selection(person_name, voice_description)
             
     except Exception as e:
         print(f"⚠️  Error creating ElevenLabs voice: {e}")
         import traceback
         traceback.print_exc()
-        return fallback_voice_selection(person_name, voice_description, headers)
+        return fallback_voice_selection(person_name, voice_description)
 
-def fallback_voice_selection(person_name: str, voice_description: str, headers: Optional[dict] = None) -> Optional[str]:
+def fallback_voice_selection(person_name: str, voice_description: str) -> Optional[str]:
     """
     Fallback: Select best matching voice from existing voices if voice design fails.
     """
+    with trace_stage('voice_fallback'):
+        return _fallback_voice_selection(person_name, voice_description)
+
+def _fallback_voice_selection(person_name: str, voice_description: str) -> Optional[str]:
     try:
-        if headers is None:
-            headers = get_elevenlabs_headers()
-        voices_url = f"{ELEVENLABS_API_BASE}/voices"
-        voices_response = requests.get(voices_url, headers=headers)
-        if voices_response.status_code == 200:
-            voices = voices_response.json().get('voices', [])
-            if voices:
-                # Try intelligent selection
-                selected_voice_id = select_best_voice_from_description(voices, voice_description)
-                if selected_voice_id:
-                    return selected_voice_id
-                
-                # Use first available voice
-                default_voice = voices[0]
-                voice_id = default_voice.get('voice_id')
-                print(f"⚠️  Using fallback voice: {default_voice.get('name')} ({voice_id})")
-                return voice_id
+        voices = VOICE_LIBRARY.get_voices()
+        if voices:
+            # Try intelligent selection
+            selected_voice_id = select_best_voice_from_description(voices, voice_description)
+            if selected_voice_id:
+                return selected_voice_id
+            
+            # Use first available voice
+            default_voice = voices[0]
+            voice_id = default_voice.get('voice_id')
+            print(f"⚠️  Using fallback voice: {default_voice.get('name')} ({voice_id})")
+            return voice_id
     except Exception as e:
         print(f"⚠️  Fallback voice selection failed: {e}")
     
     return None
 
-def create_elevenlabs_agent(person_name: str, voice_id: str, system_prompt: str, knowledge_base_text: str) -> Optional[str]:
+def create_elevenlabs_agent(person_name: str, voice_id: str, system_prompt: str, knowledge_base_text: Optional[str] = None) -> Optional[str]:
     """
     Create an ElevenLabs agent with knowledge base from MongoDB answers.
-    Returns agent_id if successful, None otherwise.
+    Returns agent_id if successful, None otherwise. Without knowledge_base_text the
+    caller uploads the knowledge base itself (add_knowledge_to_agent).
     
     Uses the correct endpoint: /v1/convai/agents/create
     """
@@ -1042,12 +3392,6 @@ def create_elevenlabs_agent(person_name: str, voice_id: str, system_prompt: str,
         raise ValueError("ELEVENLABS_API_KEY is not configured")
     
     try:
-        headers = get_elevenlabs_headers()
-        headers["Content-Type"] = "application/json"
-        
-        # Correct endpoint for Agents Platform
-        url = f"{ELEVENLABS_API_BASE}/convai/agents/create"
-        
         # Build conversation_config according to ElevenLabs API
         # The structure needs agent.prompt.prompt, not system_prompt at top level
         conversation_config = {
@@ -1071,7 +3415,11 @@ def create_elevenlabs_agent(person_name: str, voice_id: str, system_prompt: str,
         }
         
         # Create agent
-        response = requests.post(url, json=agent_payload, headers=headers, timeout=30)
+        # Correct endpoint for Agents Platform
+        with trace_stage('agent_create'):
+            response = elevenlabs.post('create_agent', '/convai/agents/create', json=agent_payload)
+            if response.status_code not in [200, 201]:
+                set_stage_outcome('failed')
         
         if response.status_code in [200, 201]:
             result = response.json()
@@ -1089,7 +3437,9 @@ def create_elevenlabs_agent(person_name: str, voice_id: str, system_prompt: str,
                 
                 # Try to add knowledge base content
                 if knowledge_base_text:
-                    add_knowledge_to_agent(agent_id, person_name, knowledge_base_text, headers)
+                    with trace_stage('kb_upload'):
+                        if not add_knowledge_to_agent(agent_id, person_name, knowledge_base_text):
+                            set_stage_outcome('failed')
                 
                 return agent_id
             else:
@@ -1108,30 +3458,158 @@ def create_elevenlabs_agent(person_name: str, voice_id: str, system_prompt: str,
         print(f"⚠️  Error creating ElevenLabs agent: {e}")
         raise
 
-def add_knowledge_to_agent(agent_id: str, person_name: str, knowledge_base_text: str, headers: dict):
-    """Add knowledge base content to an agent"""
-    knowledge_endpoints = [
-        f"{ELEVENLABS_API_BASE}/convai/agents/{agent_id}/knowledge",
-        f"{ELEVENLABS_API_BASE}/convai/agents/{agent_id}/knowledge-base",
-        f"{ELEVENLABS_API_BASE}/agents/{agent_id}/knowledge"
-    ]
-    
-    knowledge_payloads = [
-        {"content": knowledge_base_text, "name": f"{person_name} Knowledge Base"},
-        {"text": knowledge_base_text, "name": f"{person_name} Knowledge Base"},
-        {"document": knowledge_base_text}
-    ]
+# Knowledge base upload variants (endpoint, payload) in probe order. Only one works for a
+# given account/API version; it is discovered once, stored in META_COLLECTION and reused
+# until it stops working. When every variant is rejected, that is stored too, and uploads
+# are skipped for KNOWLEDGE_VARIANT_RETRY_AFTER seconds instead of probing on every creation.
+KNOWLEDGE_VARIANTS = {
+    'convai_knowledge': (
+        '/convai/agents/{agent_id}/knowledge',
+        lambda person_name, text: {"content": text, "name": f"{person_name} Knowledge Base"}
+    ),
+    'convai_knowledge_base': (
+        '/convai/agents/{agent_id}/knowledge-base',
+        lambda person_name, text: {"text": text, "name": f"{person_name} Knowledge Base"}
+    ),
+    'agents_knowledge': (
+        '/agents/{agent_id}/knowledge',
+        lambda person_name, text: {"document": text}
+    ),
+}
+KNOWLEDGE_VARIANT_META_ID = 'knowledge_endpoint_variant'
+# Responses meaning the endpoint or payload shape is wrong (as opposed to a transient failure)
+KNOWLEDGE_VARIANT_MISMATCH_STATUSES = {400, 404, 405, 415, 422}
+KNOWLEDGE_VARIANT_RETRY_AFTER = 3600  # seconds before probing again after every variant was rejected
+
+_knowledge_variant = None  # cached variant name; None until loaded or discovered
+_knowledge_unsupported_until = 0.0  # epoch seconds; no variant works until then
+_knowledge_variant_lock = threading.Lock()
+
+def get_knowledge_variant() -> Optional[str]:
+    """
+    The known working knowledge base variant, from the process cache or MongoDB. Also
+    loads a stored "no variant works" result (see knowledge_upload_unsupported).
+    """
+    global _knowledge_variant, _knowledge_unsupported_until
+    if _knowledge_variant or knowledge_upload_unsupported():
+        return _knowledge_variant
+    try:
+        meta = db[META_COLLECTION].find_one({'_id': KNOWLEDGE_VARIANT_META_ID}) or {}
+    except Exception as e:
+        print(f"⚠️  Could not load knowledge base variant: {e}")
+        return None
+    variant = meta.get('variant')
+    with _knowledge_variant_lock:
+        if variant in KNOWLEDGE_VARIANTS:
+            _knowledge_variant = variant
+        elif meta.get('unsupported_until'):
+            _knowledge_unsupported_until = meta['unsupported_until'].replace(tzinfo=timezone.utc).timestamp()
+    return _knowledge_variant
+
+def knowledge_upload_unsupported() -> bool:
+    """Whether every variant was recently rejected, so uploads should be skipped."""
+    return time.time() < _knowledge_unsupported_until
+
+def set_knowledge_variant(variant: Optional[str], previous: Optional[str] = None):
+    """Record the working variant (or forget a broken one when variant is None)."""
+    global _knowledge_variant
+    with _knowledge_variant_lock:
+        _knowledge_variant = variant
+    try:
+        meta = db[META_COLLECTION]
+        if variant:
+            meta.update_one(
+                {'_id': KNOWLEDGE_VARIANT_META_ID},
+                {
+                    '$set': {'variant': variant, 'discovered_at': utc_now(), 'discovered_by': INSTANCE_ID},
+                    '$unset': {'unsupported_until': ''}
+                },
+                upsert=True
+            )
+        else:
+            # Only forget the variant we saw fail; another instance may already have found a new one
+            meta.delete_one({'_id': KNOWLEDGE_VARIANT_META_ID, 'variant': previous})
+    except Exception as e:
+        print(f"⚠️  Could not store knowledge base variant: {e}")
+
+def set_knowledge_upload_unsupported():
+    """Remember (for KNOWLEDGE_VARIANT_RETRY_AFTER seconds) that every variant was rejected."""
+    global _knowledge_unsupported_until
+    now = utc_now()
+    until = now + timedelta(seconds=KNOWLEDGE_VARIANT_RETRY_AFTER)
+    with _knowledge_variant_lock:
+        _knowledge_unsupported_until = until.replace(tzinfo=timezone.utc).timestamp()
+    try:
+        # Don't overwrite a variant another instance has found meanwhile
+        db[META_COLLECTION].update_one(
+            {'_id': KNOWLEDGE_VARIANT_META_ID, 'variant': {'$exists': False}},
+            {'$set': {'unsupported_until': until, 'discovered_at': now, 'discovered_by': INSTANCE_ID}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        pass
+    except Exception as e:
+        print(f"⚠️  Could not store knowledge base variant: {e}")
+
+def post_knowledge_variant(variant: str, agent_id: str, person_name: str, knowledge_base_text: str) -> Optional[requests.Response]:
+    """Send the knowledge base with one variant. Returns None on a network error."""
+    endpoint, build_payload = KNOWLEDGE_VARIANTS[variant]
+    try:
+        return elevenlabs.post(
+            'add_knowledge',
+            endpoint.format(agent_id=agent_id),
+            json=build_payload(person_name, knowledge_base_text)
+        )
+    except requests.exceptions.RequestException as e:
+        print(f"⚠️  Knowledge base upload ({variant}) failed: {e}")
+        return None
+
+def add_knowledge_to_agent(agent_id: str, person_name: str, knowledge_base_text: str):
+    """
+    Add knowledge base content to an agent.
+    Uses the variant known to work. Variants are (re-)probed only when none is known or
+    the known one answers with a mismatch status (it no longer fits the API); a transient
+    failure of the known variant is not a reason to try the others. The agent already
+    exists, so a rate limit rejection only skips the upload.
+    """
+    try:
+        return _add_knowledge_to_agent(agent_id, person_name, knowledge_base_text)
+    except DependencyUnavailable as e:
+        print(f"⚠️  Could not add knowledge base ({e}), but agent created successfully")
+        return False
+
+def _add_knowledge_to_agent(agent_id: str, person_name: str, knowledge_base_text: str):
+    known = get_knowledge_variant()
+    if known:
+        response = post_knowledge_variant(known, agent_id, person_name, knowledge_base_text)
+        if response is not None and response.status_code in [200, 201]:
+            print(f"✅ Added knowledge base to agent {agent_id}")
+            return True
+        if response is None or response.status_code not in KNOWLEDGE_VARIANT_MISMATCH_STATUSES:
+            print("⚠️  Could not add knowledge base, but agent created successfully")
+            return False
+        print(f"⚠️  Knowledge base variant {known} returned {response.status_code}; probing again")
+        set_knowledge_variant(None, previous=known)
+    elif knowledge_upload_unsupported():
+        print("⚠️  No knowledge base variant works for this account; skipped, but agent created successfully")
+        return False
     
-    for endpoint, payload in zip(knowledge_endpoints, knowledge_payloads):
-        try:
-            kb_response = requests.post(endpoint, json=payload, headers=headers, timeout=30)
-            if kb_response.status_code in [200, 201]:
-                print(f"✅ Added knowledge base to agent {agent_id}")
-                return True
-        except Exception as e:
+    all_rejected = True
+    for variant in KNOWLEDGE_VARIANTS:
+        if variant == known:
             continue
+        response = post_knowledge_variant(variant, agent_id, person_name, knowledge_base_text)
+        if response is not None and response.status_code in [200, 201]:
+            set_knowledge_variant(variant)
+            print(f"✅ Added knowledge base to agent {agent_id} (discovered variant {variant})")
+            return True
+        if response is None or response.status_code not in KNOWLEDGE_VARIANT_MISMATCH_STATUSES:
+            all_rejected = False
     
-    print(f"⚠️  Could not add knowledge base, but agent created successfully")
+    # Only a rejection by every variant says anything about the API; transient failures don't
+    if all_rejected:
+        set_knowledge_upload_unsupported()
+    print("⚠️  Could not add knowledge base, but agent created successfully")
     return False
 
 def format_knowledge_base_from_answers(answers: Dict) -> str:
@@ -1153,53 +3631,23 @@ def format_knowledge_base_from_answers(answers: Dict) -> str:
     
     return "\n".join(knowledge_sections)
 
-def create_elevenlabs_agent_for_figure(person_name: str) -> Dict:
+@track_in_flight(AGENT_CREATIONS_IN_FLIGHT)
+def create_elevenlabs_agent_for_figure(person_name: str, evict: bool = True) -> Dict:
     """
     Create ElevenLabs voice and agent for a historical figure using MongoDB data.
-    Returns dict with voice_id and agent_id.
+    Returns dict with voice_id and agent_id. Pass evict=False when the caller enforces
+    MAX_AGENTS itself (bulk runs evict once at the end). Stage timings are stored on
+    the figure as pipeline_timings. Runs in the caller's unit of work, or its own.
     """
     if not ELEVENLABS_API_KEY:
         raise ValueError("ELEVENLABS_API_KEY is not configured")
     
-    # Get historical figure data
-    figure_data = get_or_create_historical_figure(person_name)
-    
-    if not figure_data:
-        raise ValueError(f"Could not retrieve data for {person_name}")
-    
-    elevenlabs_summary = figure_data.get('elevenlabs', '')
-    answers = figure_data.get('answers', {})
-    
-    if not elevenlabs_summary:
-        raise ValueError(f"No ElevenLabs summary found for {person_name}. Please generate the profile first.")
-    
-    # Step 1: Create voice using the elevenlabs field as description
-    print(f"Creating ElevenLabs voice for {person_name}...")
-    voice_id = create_elevenlabs_voice(person_name, elevenlabs_summary)
-    
-    if not voice_id:
-        # Try to use a default voice or get first available voice
-        try:
-            voices_url = f"{ELEVENLABS_API_BASE}/voices"
-            headers = get_elevenlabs_headers()
-            voices_response = requests.get(voices_url, headers=headers)
-            if voices_response.status_code == 200:
-                voices = voices_response.json().get('voices', [])
-                if voices:
-                    voice_id = voices[0].get('voice_id')
-                    print(f"Using default voice: {voice_id}")
-        except:
-            pass
-    
-    if not voice_id:
-        raise ValueError("Could not create or retrieve a voice for the agent")
-    
-    # Step 2: Format knowledge base from answers
-    knowledge_base_text = format_knowledge_base_from_answers(answers)
-    
-    # Step 3: Create agent with system prompt and knowledge base
-    print(f"Creating ElevenLabs agent for {person_name}...")
-    system_prompt = f"""You ARE {person_name}. You are not an assistant, helper, or AI. You are the actual historical figure speaking from your own perspective and experience.
+    with figure_unit_of_work():
+        return run_traced_pipeline(person_name, lambda: _create_elevenlabs_agent_for_figure(person_name, evict))
+
+def build_agent_system_prompt(person_name: str, elevenlabs_summary: str) -> str:
+    """System prompt that has the agent speak as the historical figure."""
+    return f"""You ARE {person_name}. You are not an assistant, helper, or AI. You are the actual historical figure speaking from your own perspective and experience.
 
 {elevenlabs_summary}
 
@@ -1215,85 +3663,206 @@ CRITICAL INSTRUCTIONS:
 - Answer questions as YOU would have answered them, not as a helpful assistant would
 
 You speak with the authority, knowledge, and character of {person_name}. Every word should reflect your true nature, beliefs, and the way you actually spoke and thought."""
+
+def _create_elevenlabs_agent_for_figure(person_name: str, evict: bool) -> Dict:
+    """
+    The agent pipeline as a stage graph. Voice creation runs alongside building the
+    knowledge base text and system prompt; once the agent exists, the KB upload runs
+    alongside storing the IDs (and evicting, which needs the new agent stored).
     
-    agent_id = create_elevenlabs_agent(person_name, voice_id, system_prompt, knowledge_base_text)
-    
-    if not agent_id:
-        raise ValueError("Could not create ElevenLabs agent")
-    
-    # Step 4: Store voice_id and agent_id in MongoDB
+        profile -> voice ---------> agent_create -> mongo_update -> eviction
+                -> system_prompt -/              -> kb_upload
+                -> kb_format ---------------------/
+    """
     collection = db[HISTORICAL_FIGURES_COLLECTION]
     person_lower = person_name.lower().strip()
     
-    collection.update_one(
-        {'person_name_lower': person_lower},
-        {'$set': {
-            'elevenlabs_voice_id': voice_id,
-            'elevenlabs_agent_id': agent_id,
-            'updated_at': None  # Will be set by MongoDB
-        }}
-    )
+    def load_profile(_inputs):
+        # Get historical figure data
+        figure_data = get_or_create_historical_figure(person_name)
+        
+        if not figure_data:
+            raise ValueError(f"Could not retrieve data for {person_name}")
+        if not figure_data.get('elevenlabs'):
+            raise ValueError(f"No ElevenLabs summary found for {person_name}. Please generate the profile first.")
+        return figure_data
+    
+    def create_voice(inputs):
+        # Create voice using the elevenlabs field as description
+        report_job_stage('voice')
+        print(f"Creating ElevenLabs voice for {person_name}...")
+        voice_id = create_elevenlabs_voice(person_name, inputs['profile']['elevenlabs'])
+        
+        if not voice_id:
+            # Try to use a default voice or get first available voice
+            with trace_stage('voice_default'):
+                try:
+                    voices = VOICE_LIBRARY.get_voices()
+                    if voices:
+                        voice_id = voices[0].get('voice_id')
+                        print(f"Using default voice: {voice_id}")
+                except:
+                    pass
+        
+        if not voice_id:
+            raise ValueError("Could not create or retrieve a voice for the agent")
+        return voice_id
     
-    print(f"✅ Stored ElevenLabs IDs in MongoDB for {person_name}")
+    def create_agent(inputs):
+        # Create agent with the system prompt; the knowledge base is uploaded by its own stage
+        report_job_stage('agent')
+        print(f"Creating ElevenLabs agent for {person_name}...")
+        agent_id = create_elevenlabs_agent(person_name, inputs['voice'], inputs['system_prompt'])
+        
+        if not agent_id:
+            raise ValueError("Could not create ElevenLabs agent")
+        return agent_id
     
-    # Step 5: Ensure we don't exceed MAX_AGENTS (delete oldest if needed)
-    ensure_max_agents(MAX_AGENTS)
+    def upload_knowledge(inputs):
+        if inputs['kb_format'] and not add_knowledge_to_agent(inputs['agent_create'], person_name, inputs['kb_format']):
+            set_stage_outcome('failed')
+    
+    def store_ids(inputs):
+        # Store voice_id and agent_id in MongoDB
+        report_job_stage('store')
+        agent_id = inputs['agent_create']
+        changes = {
+            'elevenlabs_voice_id': inputs['voice'],
+            'elevenlabs_agent_id': agent_id,
+            'agent_valid': True,
+            'agent_checked_at': utc_now(),
+            'last_used_at': utc_now(),  # a new agent starts at the front of the LRU order
+            'updated_at': utc_now()
+        }
+        collection.update_one({'person_name_lower': person_lower}, {'$set': changes})
+        update_tracked_figure(person_lower, changes)
+        AGENT_VALIDITY.set(agent_id, True, persist=False)
+        bump_figures_version()
+        print(f"✅ Stored ElevenLabs IDs in MongoDB for {person_name}")
+    
+    graph = StageGraph()
+    graph.add('profile', load_profile)
+    graph.add('voice', create_voice, after=('profile',))
+    graph.add('kb_format', lambda inputs: format_knowledge_base_from_answers(inputs['profile'].get('answers', {})), after=('profile',))
+    graph.add('system_prompt', lambda inputs: build_agent_system_prompt(person_name, inputs['profile']['elevenlabs']), after=('profile',))
+    graph.add('agent_create', create_agent, after=('voice', 'system_prompt'))
+    graph.add('kb_upload', upload_knowledge, after=('agent_create', 'kb_format'))
+    graph.add('mongo_update', store_ids, after=('agent_create', 'voice'))
+    if evict:
+        # Ensure we don't exceed MAX_AGENTS (delete least recently used if needed); counts stored agents
+        graph.add('eviction', lambda _inputs: ensure_max_agents(MAX_AGENTS), after=('mongo_update',))
+    results = graph.run()
     
     return {
         'person_name': person_name,
-        'voice_id': voice_id,
-        'agent_id': agent_id,
+        'voice_id': results['voice'],
+        'agent_id': results['agent_create'],
         'status': 'success'
     }
 
+_AGENT_EVICTION_EXECUTOR = ThreadPoolExecutor(max_workers=AGENT_EVICTION_WORKERS, thread_name_prefix='agent-eviction')
+_AGENT_USAGE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='agent-usage')
+_agent_usage_recorded = OrderedDict()  # agent_id -> monotonic time of the last last_used_at write
+_agent_usage_pending = 0
+_agent_usage_lock = threading.Lock()
+
+def record_agent_usage(agent_id: str):
+    """
+    Mark an agent as used now, for LRU eviction.
+    Writes happen off the request thread and at most once per AGENT_USAGE_WRITE_INTERVAL
+    per agent, so hot endpoints don't turn every hit into a MongoDB write. Only agents of
+    stored figures stay in the throttle map, which is capped at AGENT_USAGE_TRACKED_MAX;
+    usage is best effort, so writes are dropped while AGENT_USAGE_MAX_PENDING are queued.
+    """
+    global _agent_usage_pending
+    if not agent_id:
+        return
+    now = time.monotonic()
+    with _agent_usage_lock:
+        last = _agent_usage_recorded.get(agent_id)
+        if last is not None and now - last < AGENT_USAGE_WRITE_INTERVAL:
+            return
+        if _agent_usage_pending >= AGENT_USAGE_MAX_PENDING:
+            return
+        _agent_usage_pending += 1
+        _agent_usage_recorded[agent_id] = now
+        _agent_usage_recorded.move_to_end(agent_id)
+        while len(_agent_usage_recorded) > AGENT_USAGE_TRACKED_MAX:
+            _agent_usage_recorded.popitem(last=False)
+    
+    def write():
+        global _agent_usage_pending
+        matched = True
+        try:
+            result = db[HISTORICAL_FIGURES_COLLECTION].update_one(
+                {'elevenlabs_agent_id': agent_id},
+                {'$set': {'last_used_at': utc_now()}}
+            )
+            matched = result.matched_count > 0
+        except Exception as e:
+            print(f"⚠️  Could not record usage for agent {agent_id}: {e}")
+        finally:
+            with _agent_usage_lock:
+                _agent_usage_pending -= 1
+                if not matched:
+                    # Not the agent of any stored figure (e.g. a made-up id): don't remember it
+                    _agent_usage_recorded.pop(agent_id, None)
+    
+    _AGENT_USAGE_EXECUTOR.submit(write)
+
+def delete_elevenlabs_agent(agent_id: str, person_name: str):
+    """Delete an agent from ElevenLabs. Failures are logged; the figure is already detached."""
+    try:
+        response = elevenlabs.delete('delete_agent', f"/convai/agents/{agent_id}")
+        
+        if response.status_code in [200, 204]:
+            print(f"✅ Deleted ElevenLabs agent: {agent_id} ({person_name})")
+        else:
+            print(f"⚠️  Failed to delete ElevenLabs agent {agent_id}: {response.status_code}")
+    except Exception as e:
+        print(f"⚠️  Error deleting ElevenLabs agent {agent_id}: {e}")
+
 def ensure_max_agents(max_count: int = MAX_AGENTS):
     """
     Ensure we don't exceed max_count agents.
-    If we do, delete the oldest agents (by creation date or updated_at).
+    If we do, evict the least recently used agents (by last_used_at; agents never used
+    since usage tracking began go first). Victims are detached from their figures here
+    and deleted from ElevenLabs in the background, in parallel.
     """
     collection = db[HISTORICAL_FIGURES_COLLECTION]
+    has_agent = {'elevenlabs_agent_id': {'$exists': True}}
     
-    # Get all agents with their creation/update dates
-    agents = list(collection.find(
-        {'elevenlabs_agent_id': {'$exists': True, '$ne': None}},
-        {'person_name': 1, 'elevenlabs_agent_id': 1, 'created_at': 1, 'updated_at': 1, '_id': 1}
-    ))
-    
-    if len(agents) <= max_count:
+    # Step 1: Count agents (served by the sparse elevenlabs_agent_id index)
+    excess = collection.count_documents(has_agent) - max_count
+    if excess <= 0:
         return
     
-    # Sort by created_at (oldest first), then by updated_at
-    agents.sort(key=lambda x: (
-        x.get('created_at') or x.get('updated_at') or x.get('_id').generation_time
-    ))
-    
-    # Delete oldest agents
-    agents_to_delete = agents[:-max_count]  # Keep the newest max_count agents
+    # Step 2: Pick the least recently used agents (served by the partial last_used_at index)
+    victims = collection.find(
+        has_agent,
+        {'person_name': 1, 'person_name_lower': 1, 'elevenlabs_agent_id': 1}
+    ).sort('last_used_at', 1).limit(excess)
     
-    for agent in agents_to_delete:
-        agent_id = agent.get('elevenlabs_agent_id')
-        person_name = agent.get('person_name')
-        
-        if agent_id:
-            try:
-                # Delete from ElevenLabs
-                delete_url = f"{ELEVENLABS_API_BASE}/convai/agents/{agent_id}"
-                headers = get_elevenlabs_headers()
-                response = requests.delete(delete_url, headers=headers)
-                
-                if response.status_code in [200, 204]:
-                    print(f"✅ Deleted ElevenLabs agent: {agent_id} ({person_name})")
-                else:
-                    print(f"⚠️  Failed to delete ElevenLabs agent {agent_id}: {response.status_code}")
-            except Exception as e:
-                print(f"⚠️  Error deleting ElevenLabs agent {agent_id}: {e}")
+    for victim in victims:
+        agent_id = victim.get('elevenlabs_agent_id')
+        person_name = victim.get('person_name')
         
-        # Remove agent_id from MongoDB (keep the figure data)
-        collection.update_one(
-            {'_id': agent['_id']},
-            {'$unset': {'elevenlabs_agent_id': '', 'elevenlabs_voice_id': ''}}
+        # Step 3: Detach the agent (keep the figure data). Matching on the agent id means a
+        # concurrent eviction or a new agent for the same figure is never deleted twice.
+        detached = ('elevenlabs_agent_id', 'elevenlabs_voice_id', 'agent_valid', 'agent_checked_at', 'last_used_at')
+        result = collection.update_one(
+            {'_id': victim['_id'], 'elevenlabs_agent_id': agent_id},
+            {'$unset': {field: '' for field in detached}}
         )
+        if result.modified_count == 0 or not agent_id:
+            continue
+        update_tracked_figure(victim.get('person_name_lower', ''), {}, unset=detached)
+        AGENT_VALIDITY.set(agent_id, False, persist=False)
+        bump_figures_version()
         print(f"✅ Removed agent association for {person_name}")
+        
+        # Step 4: Delete from ElevenLabs in the background
+        _AGENT_EVICTION_EXECUTOR.submit(delete_elevenlabs_agent, agent_id, person_name)
     
     print(f"✅ Maintained agent limit: {max_count} agents")
 
@@ -1312,6 +3881,8 @@ def create_agent_for_figure(person_name):
         result = create_elevenlabs_agent_for_figure(person_name)
         return jsonify(result), 200
         
+    except DependencyUnavailable as e:
+        return dependency_unavailable_response(e)
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
@@ -1329,9 +3900,7 @@ def get_agent_info(agent_id):
         }), 500
     
     try:
-        url = f"{ELEVENLABS_API_BASE}/convai/agents/{agent_id}"
-        headers = get_elevenlabs_headers()
-        response = requests.get(url, headers=headers)
+        response = elevenlabs.get('get_agent', f"/convai/agents/{agent_id}")
         
         if response.status_code == 200:
             return jsonify(response.json()), 200
@@ -1341,6 +3910,8 @@ def get_agent_info(agent_id):
                 'details': response.text
             }), response.status_code
             
+    except DependencyUnavailable as e:
+        return dependency_unavailable_response(e)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1400,11 +3971,12 @@ def start_agent_conversation(agent_id):
     try:
         # Start conversation using the correct convai endpoint
         # Try different possible formats
-        url = f"{ELEVENLABS_API_BASE}/convai/conversation/start?agent_id={agent_id}"
-        
-        headers = get_elevenlabs_headers()
-        headers["Content-Type"] = "application/json"
-        response = requests.post(url, json={}, headers=headers)
+        response = elevenlabs.post(
+            'start_conversation',
+            '/convai/conversation/start',
+            params={'agent_id': agent_id},
+            json={}
+        )
         
         if response.status_code in [200, 201]:
             return jsonify(response.json()), 200
@@ -1437,12 +4009,48 @@ def get_agent_websocket_url(agent_id):
         }), 500
     
     ws_url = f"wss://api.elevenlabs.io/v1/convai/conversation?agent_id={agent_id}&xi-api-key={ELEVENLABS_API_KEY}"
+    record_agent_usage(agent_id)
     
     return jsonify({
         'websocket_url': ws_url,
         'agent_id': agent_id
     }), 200
 
+@app.route('/api/elevenlabs/stats', methods=['GET'])
+def get_elevenlabs_stats():
+    """Per-operation ElevenLabs call counts and latency for this instance."""
+    return jsonify({'operations': elevenlabs.stats()}), 200
+
+@app.route('/api/gemini/cache/stats', methods=['GET'])
+def get_gemini_cache_stats():
+    """Gemini response cache hit/miss counters for this instance."""
+    return jsonify(GEMINI_CACHE.stats()), 200
+
+@app.route('/api/gemini/circuits', methods=['GET'])
+def get_gemini_circuits():
+    """Circuit breaker state per Gemini model for this instance."""
+    return jsonify({'models': GEMINI_BREAKERS.snapshot()}), 200
+
+@app.route('/api/rate-limits', methods=['GET'])
+def get_rate_limits():
+    """Cluster-wide rate limit buckets: configured limits and stored token counts."""
+    if RATE_LIMITER is None:
+        return jsonify({'enabled': False, 'buckets': {}}), 200
+    try:
+        return jsonify({
+            'enabled': True,
+            'limits': {
+                'gemini': {'requests_per_minute': GEMINI_RATE_LIMIT[0], 'burst': GEMINI_RATE_LIMIT[1]},
+                **{
+                    f"elevenlabs:{endpoint_class}": {'requests_per_minute': rpm, 'burst': burst}
+                    for endpoint_class, (rpm, burst) in ELEVENLABS_RATE_LIMITS.items()
+                }
+            },
+            'buckets': RATE_LIMITER.snapshot()
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/elevenlabs-api-key', methods=['GET'])
 def get_elevenlabs_api_key():
     """
@@ -1473,7 +4081,9 @@ def get_figure_agent_status(person_name):
             'person_name': 1,
             'elevenlabs_agent_id': 1,
             'elevenlabs_voice_id': 1,
-            'elevenlabs': 1
+            'elevenlabs': 1,
+            'agent_valid': 1,
+            'agent_checked_at': 1
         })
         
         if not figure:
@@ -1488,16 +4098,11 @@ def get_figure_agent_status(person_name):
         voice_id = figure.get('elevenlabs_voice_id')
         has_summary = bool(figure.get('elevenlabs'))
         
-        # Verify agent exists in ElevenLabs if agent_id is present
+        # Verify agent exists in ElevenLabs if agent_id is present (cached, revalidated in the background)
         agent_valid = False
         if agent_id and ELEVENLABS_API_KEY:
-            try:
-                url = f"{ELEVENLABS_API_BASE}/convai/agents/{agent_id}"
-                headers = get_elevenlabs_headers()
-                response = requests.get(url, headers=headers, timeout=5)
-                agent_valid = response.status_code == 200
-            except:
-                pass
+            agent_valid = AGENT_VALIDITY.get(agent_id, figure)
+        record_agent_usage(agent_id)
         
         return jsonify({
             'person_name': figure.get('person_name'),
@@ -1513,11 +4118,180 @@ def get_figure_agent_status(person_name):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/historical-figure/<person_name>/timings', methods=['GET'])
+def get_figure_pipeline_timings(person_name):
+    """
+    Stage timings of the figure's most recent agent creation.
+    Returns: {person_name, pipeline_timings: {recorded_at, outcome, total_ms, stages: [...]}}
+    """
+    collection = db[HISTORICAL_FIGURES_COLLECTION]
+    figure = collection.find_one(
+        {'person_name_lower': person_name.lower().strip()},
+        {'person_name': 1, 'pipeline_timings': 1}
+    )
+    if not figure:
+        return jsonify({'error': f"{person_name} not found"}), 404
+    
+    timings = figure.get('pipeline_timings')
+    if timings:
+        timings = {
+            **timings,
+            'recorded_at': format_timestamp(timings.get('recorded_at')),
+            'started_at': format_timestamp(timings.get('started_at'))
+        }
+    return jsonify({
+        'person_name': figure.get('person_name'),
+        'pipeline_timings': timings
+    }), 200
+
+@app.route('/api/pipeline-timings', methods=['GET'])
+def get_pipeline_timings():
+    """
+    Aggregate stage timings (count, error rate, mean attempts, p50/p90/p99/max ms) over
+    the most recent agent creations (?limit=, default PIPELINE_TIMINGS_SAMPLE).
+    """
+    try:
+        limit = int(request.args.get('limit', PIPELINE_TIMINGS_SAMPLE))
+    except ValueError:
+        return jsonify({'error': 'Parameter "limit" must be an integer'}), 400
+    limit = max(1, min(limit, 1000))
+    
+    cursor = db[HISTORICAL_FIGURES_COLLECTION].find(
+        {'pipeline_timings': {'$exists': True}},
+        {'pipeline_timings': 1}
+    ).sort('pipeline_timings.recorded_at', -1).limit(limit)
+    timings = [figure['pipeline_timings'] for figure in cursor]
+    
+    return jsonify({
+        'sample_size': len(timings),
+        'stages': aggregate_pipeline_timings(timings)
+    }), 200
+
+BULK_CHECKPOINT_ID = 'create_all_agents_checkpoint'
+
+def run_bulk_agent_creation(_subject: str) -> Dict:
+    """
+    Create agents for every figure without one, BULK_AGENT_CONCURRENCY at a time.
+    Figures are streamed from a projected cursor in _id order. A checkpoint in
+    META_COLLECTION records the _id up to which every figure has been processed, so an
+    interrupted run resumes after it. MAX_AGENTS is enforced every BULK_EVICT_INTERVAL
+    figures and at the end, so the account holds at most MAX_AGENTS + BULK_EVICT_INTERVAL
+    + BULK_AGENT_CONCURRENCY agents while the run is going, even if it is interrupted.
+    """
+    collection = db[HISTORICAL_FIGURES_COLLECTION]
+    meta = db[META_COLLECTION]
+    
+    checkpoint = meta.find_one({'_id': BULK_CHECKPOINT_ID}) or {}
+    last_id = checkpoint.get('last_id')
+    query = {'elevenlabs_agent_id': None}
+    if last_id:
+        query['_id'] = {'$gt': last_id}
+        print(f"Resuming bulk agent creation after {last_id}")
+    
+    # total counts figures as the cursor reaches them (a count_documents on a null match
+    # would scan the whole collection); it is final once counted is true
+    progress = {
+        'total': 0,
+        'counted': False,
+        'processed': 0,
+        'created': 0,
+        'failed': 0,
+        'resumed_from': str(last_id) if last_id else None
+    }
+    errors = []
+    created = []
+    report_job_progress(progress)
+    
+    # Watermark bookkeeping: in_flight is ordered by _id, so the checkpoint can only move
+    # past a figure once every earlier figure has finished
+    lock = threading.Lock()
+    in_flight = []
+    finished = set()
+    eviction_lock = threading.Lock()
+    
+    def advance_checkpoint():
+        watermark = None
+        while in_flight and in_flight[0] in finished:
+            watermark = in_flight.pop(0)
+            finished.discard(watermark)
+        if watermark is not None:
+            meta.update_one(
+                {'_id': BULK_CHECKPOINT_ID},
+                {'$set': {'last_id': watermark, 'updated_at': utc_now()}},
+                upsert=True
+            )
+    
+    def create_one(figure_id, person_name: str):
+        # Runs with the job's context (for progress reports), but each figure gets its own
+        # unit of work rather than the job's
+        _FIGURE_UNIT_OF_WORK.figures = None
+        try:
+            result = create_elevenlabs_agent_for_figure(person_name, evict=False)
+            outcome = ('created', result)
+        except Exception as e:
+            print(f"⚠️  Bulk agent creation failed for {person_name}: {e}")
+            outcome = ('failed', {'person_name': person_name, 'error': str(e)})
+        
+        with lock:
+            status, detail = outcome
+            progress['processed'] += 1
+            progress[status] += 1
+            (created if status == 'created' else errors).append(detail)
+            finished.add(figure_id)
+            advance_checkpoint()
+            report_job_progress(dict(progress))
+            evict_now = status == 'created' and progress['created'] % BULK_EVICT_INTERVAL == 0
+        
+        # One eviction at a time; a worker that finds one running leaves it to that one
+        if evict_now and eviction_lock.acquire(blocking=False):
+            try:
+                ensure_max_agents(MAX_AGENTS)
+            except Exception as e:
+                print(f"⚠️  Could not enforce the agent limit during bulk creation: {e}")
+            finally:
+                eviction_lock.release()
+    
+    cursor = collection.find(query, {'person_name': 1}).sort('_id', 1)
+    # Bound queued work so the cursor is consumed as workers free up
+    slots = threading.Semaphore(BULK_AGENT_CONCURRENCY * 2)
+    with ThreadPoolExecutor(max_workers=BULK_AGENT_CONCURRENCY, thread_name_prefix='bulk-agent') as executor:
+        for figure in cursor:
+            person_name = figure.get('person_name')
+            if not person_name:
+                continue
+            slots.acquire()
+            with lock:
+                in_flight.append(figure['_id'])
+                progress['total'] += 1
+            future = executor.submit(bind_pipeline_context(create_one), figure['_id'], person_name)
+            future.add_done_callback(lambda _: slots.release())
+        with lock:
+            progress['counted'] = True
+            report_job_progress(dict(progress))
+    
+    # Every figure has been processed: the next run starts from the beginning
+    meta.update_one(
+        {'_id': BULK_CHECKPOINT_ID},
+        {'$set': {'last_id': None, 'completed_at': utc_now()}},
+        upsert=True
+    )
+    
+    ensure_max_agents(MAX_AGENTS)
+    
+    return {
+        'total_figures': progress['total'],
+        'created': created,
+        'errors': errors,
+        'summary': f"Created {progress['created']} agents, {progress['failed']} errors"
+    }
+
 @app.route('/api/create-all-agents', methods=['POST'])
 def create_all_agents():
     """
-    Create ElevenLabs agents for all historical figures in the database.
-    Returns a summary of created agents.
+    Create ElevenLabs agents for all historical figures in the database that don't have one.
+    Runs as a background job and returns 202 with the job id; progress counters are
+    available at GET /api/jobs/<job_id> and its events stream. An interrupted run resumes
+    where it stopped the next time this endpoint is called.
     """
     try:
         if not ELEVENLABS_API_KEY:
@@ -1525,48 +4299,10 @@ def create_all_agents():
                 'error': 'ELEVENLABS_API_KEY is not configured. Please set it in your .env file.'
             }), 500
         
-        collection = db[HISTORICAL_FIGURES_COLLECTION]
-        figures = list(collection.find({}))
-        
-        if not figures:
-            return jsonify({
-                'message': 'No historical figures found in database',
-                'created': []
-            }), 200
-        
-        results = []
-        errors = []
-        
-        for figure in figures:
-            person_name = figure.get('person_name')
-            if not person_name:
-                continue
-            
-            # Skip if agent already exists
-            if figure.get('elevenlabs_agent_id'):
-                results.append({
-                    'person_name': person_name,
-                    'status': 'skipped',
-                    'reason': 'Agent already exists',
-                    'agent_id': figure.get('elevenlabs_agent_id')
-                })
-                continue
-            
-            try:
-                result = create_elevenlabs_agent_for_figure(person_name)
-                results.append(result)
-            except Exception as e:
-                errors.append({
-                    'person_name': person_name,
-                    'error': str(e)
-                })
-        
-        return jsonify({
-            'total_figures': len(figures),
-            'created': results,
-            'errors': errors,
-            'summary': f"Created {len(results)} agents, {len(errors)} errors"
-        }), 200
+        job = enqueue_job('create_all_agents', 'all figures', run_bulk_agent_creation)
+        response = jsonify(format_job(job))
+        response.headers['Location'] = url_for('get_job_status', job_id=job['_id'])
+        return response, 202
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -4,6 +4,8 @@ import os
 from pymongo import MongoClient
 from dotenv import load_dotenv
 
+from figure_schema import utc_now
+
 load_dotenv()
 
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
@@ -19,6 +21,14 @@ print(f"Collections: {db.list_collection_names()}")
 result = db.historical_figures.delete_many({})
 print(f"\n✅ Deleted {result.deleted_count} historical figure(s)")
 
+# Bump the figure listing version (as app.bump_figures_version does) so clients
+# holding an ETag for the old listing get the empty one instead of a 304
+db['_meta'].update_one(
+    {'_id': 'figures_version'},
+    {'$inc': {'version': 1}, '$set': {'updated_at': utc_now()}},
+    upsert=True
+)
+
 # Optionally clear other collections
 # db.items.delete_many({})
 # print("✅ Cleared items collection")
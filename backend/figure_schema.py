@@ -0,0 +1,209 @@
+"""
+Storage schema for historical figure documents.
+
+Schema 1 (legacy) stores the question list twice per figure: in `questions` and as the
+keys of `answers`, next to the raw Gemini text in `full_response`.
+
+Schema 2 (compact) stores each question list once, in QUESTION_CATALOG_COLLECTION keyed
+by a content hash (`catalog_version`). A figure keeps only `answer_list`, its answers in
+catalog order (None for a question without an answer), and `full_response_z`, the
+zlib-compressed Gemini text (or plain `full_response` when compression is off).
+
+expand_figure() turns either schema into the legacy shape, so API responses are unchanged.
+"""
+import hashlib
+import json
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from bson import Binary
+from pymongo import UpdateOne
+
+SCHEMA_VERSION = 2
+QUESTION_CATALOG_COLLECTION = 'question_catalogs'
+FULL_RESPONSE_COMPRESSION_LEVEL = 6
+
+# Stored fields that back each legacy field in compact documents
+COMPACT_FIELDS = {
+    'questions': ['catalog_version'],
+    'answers': ['catalog_version', 'answer_list'],
+    'full_response': ['full_response_z'],
+}
+
+def utc_now() -> datetime:
+    """Current UTC time as a naive datetime (the form pymongo returns by default)."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# Catalogs are immutable, so they are cached per process for good
+_catalog_cache = {}
+_catalog_lock = threading.Lock()
+
+def catalog_version(questions: list) -> str:
+    """Content hash identifying a question list."""
+    return hashlib.sha1(json.dumps(questions, ensure_ascii=False).encode('utf-8')).hexdigest()[:12]
+
+def ensure_catalog(db, questions: list) -> str:
+    """Store a question list in the catalog collection (once) and return its version."""
+    version = catalog_version(questions)
+    if version in _catalog_cache:
+        return version
+    db[QUESTION_CATALOG_COLLECTION].update_one(
+        {'_id': version},
+        {'$setOnInsert': {'questions': list(questions), 'created_at': utc_now()}},
+        upsert=True
+    )
+    with _catalog_lock:
+        _catalog_cache[version] = list(questions)
+    return version
+
+def load_catalog(db, version: str) -> list:
+    """Question list for a catalog version."""
+    questions = _catalog_cache.get(version)
+    if questions is not None:
+        return questions
+    catalog = db[QUESTION_CATALOG_COLLECTION].find_one({'_id': version})
+    if not catalog:
+        raise ValueError(f"Question catalog {version} not found")
+    with _catalog_lock:
+        _catalog_cache[version] = catalog['questions']
+    return catalog['questions']
+
+def storage_projection(fields: list) -> Dict:
+    """MongoDB projection for a list of legacy field names that works for both schemas."""
+    projection = {'schema_version': 1}
+    for field in fields:
+        projection[field] = 1
+        for stored in COMPACT_FIELDS.get(field, []):
+            projection[stored] = 1
+    return projection
+
+def compact_figure(db, doc: Dict, compress: bool = True) -> Optional[Dict]:
+    """
+    Compact representation of a legacy figure document's question, answer and response fields.
+    Returns {'set': {...}, 'unset': [...]}, or None if the answers don't fit the
+    document's question list (such documents are left in the legacy schema).
+    """
+    questions = doc.get('questions') or []
+    answers = doc.get('answers') or {}
+    if not questions:
+        return None
+    positions = {question: index for index, question in enumerate(questions)}
+    if len(positions) != len(questions) or any(question not in positions for question in answers):
+        return None
+    
+    to_set = {
+        'schema_version': SCHEMA_VERSION,
+        'catalog_version': ensure_catalog(db, questions),
+        'answer_list': [answers.get(question) for question in questions],
+    }
+    to_unset = ['questions', 'answers']
+    
+    full_response = doc.get('full_response')
+    if compress and full_response:
+        to_set['full_response_z'] = Binary(zlib.compress(full_response.encode('utf-8'), FULL_RESPONSE_COMPRESSION_LEVEL))
+        to_unset.append('full_response')
+    
+    return {'set': to_set, 'unset': to_unset}
+
+def to_compact_document(db, doc: Dict, compress: bool = True) -> Dict:
+    """Compact copy of a legacy figure document, for inserts."""
+    compact = compact_figure(db, doc, compress)
+    if compact is None:
+        return dict(doc)
+    stored = {key: value for key, value in doc.items() if key not in compact['unset']}
+    stored.update(compact['set'])
+    return stored
+
+def expand_figure(db, doc: Optional[Dict]) -> Optional[Dict]:
+    """
+    Legacy-shaped copy of a figure document (schema 1 documents are returned as is).
+    Only fields present in the (possibly projected) document are expanded.
+    """
+    if not doc or doc.get('schema_version') != SCHEMA_VERSION:
+        if doc:
+            doc.pop('schema_version', None)
+        return doc
+    
+    expanded = {key: value for key, value in doc.items()
+                if key not in ('schema_version', 'catalog_version', 'answer_list', 'full_response_z')}
+    
+    version = doc.get('catalog_version')
+    if version:
+        questions = load_catalog(db, version)
+        expanded['questions'] = list(questions)
+        if 'answer_list' in doc:
+            expanded['answers'] = {
+                question: answer
+                for question, answer in zip(questions, doc['answer_list'])
+                if answer is not None
+            }
+    
+    if 'full_response_z' in doc:
+        expanded['full_response'] = zlib.decompress(doc['full_response_z']).decode('utf-8')
+    
+    return expanded
+
+def migrate_figures(db, collection_name: str, checkpoint_collection: str, batch_size: int = 100,
+                    compress: bool = True, pause: float = 0.0) -> Dict:
+    """
+    Convert legacy figure documents to the compact schema in batches of batch_size,
+    one bulk_write per batch. Progress is checkpointed (by _id) in checkpoint_collection,
+    so an interrupted migration resumes where it stopped. Documents that can't be
+    compacted are left as they are and counted as skipped.
+    """
+    collection = db[collection_name]
+    meta = db[checkpoint_collection]
+    checkpoint_id = 'figure_schema_migration'
+    
+    checkpoint = meta.find_one({'_id': checkpoint_id}) or {}
+    last_id = checkpoint.get('last_id')
+    stats = {'migrated': 0, 'skipped': 0, 'batches': 0}
+    
+    while True:
+        query = {'schema_version': {'$ne': SCHEMA_VERSION}}
+        if last_id:
+            query['_id'] = {'$gt': last_id}
+        batch = list(collection.find(
+            query,
+            {'questions': 1, 'answers': 1, 'full_response': 1}
+        ).sort('_id', 1).limit(batch_size))
+        if not batch:
+            break
+        
+        operations = []
+        for doc in batch:
+            compact = compact_figure(db, doc, compress)
+            if compact is None:
+                stats['skipped'] += 1
+                continue
+            operations.append(UpdateOne(
+                {'_id': doc['_id'], 'schema_version': {'$ne': SCHEMA_VERSION}},
+                {'$set': compact['set'], '$unset': {field: '' for field in compact['unset']}}
+            ))
+        
+        if operations:
+            result = collection.bulk_write(operations, ordered=False)
+            stats['migrated'] += result.modified_count
+        
+        last_id = batch[-1]['_id']
+        meta.update_one(
+            {'_id': checkpoint_id},
+            {'$set': {'last_id': last_id, 'updated_at': utc_now()}},
+            upsert=True
+        )
+        stats['batches'] += 1
+        print(f"Migrated batch {stats['batches']}: {stats['migrated']} migrated, {stats['skipped']} skipped")
+        
+        if pause:
+            time.sleep(pause)
+    
+    # Finished: a later run starts from the beginning (and finds nothing left to do)
+    meta.update_one(
+        {'_id': checkpoint_id},
+        {'$set': {'last_id': None, 'completed_at': utc_now()}},
+        upsert=True
+    )
+    return stats
@@ -9,11 +9,20 @@ from pymongo import MongoClient
 from dotenv import load_dotenv
 import json
 
+from figure_schema import expand_figure, storage_projection
+
 load_dotenv()
 
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
 DATABASE_NAME = os.getenv('DATABASE_NAME', 'talkwith')
 
+# Fields read for each format (None reads the whole document)
+FORMAT_FIELDS = {
+    'summary': ['person_name', 'questions', 'answers', 'elevenlabs'],
+    'answers': ['answers'],
+    'elevenlabs': ['person_name', 'elevenlabs'],
+}
+
 def get_profile(person_name, format='full'):
     """Get historical figure profile from MongoDB"""
     client = MongoClient(MONGO_URI)
@@ -22,7 +31,9 @@ def get_profile(person_name, format='full'):
     
     # Find by name (case-insensitive)
     person_lower = person_name.lower().strip()
-    figure = collection.find_one({'person_name_lower': person_lower})
+    fields = FORMAT_FIELDS.get(format)
+    projection = storage_projection(fields) if fields else None
+    figure = expand_figure(db, collection.find_one({'person_name_lower': person_lower}, projection))
     
     if not figure:
         print(f"❌ {person_name} not found in database")
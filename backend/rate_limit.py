@@ -0,0 +1,130 @@
+"""
+Cluster-wide token buckets stored in MongoDB, shared by every instance.
+
+Each bucket is one document {_id: name, tokens, updated_at}. A token is taken with a
+single find_one_and_update whose pipeline update refills the bucket for the time since
+updated_at (by the server's clock, $$NOW, so instance clocks don't matter) and takes the
+token if there is one; concurrent instances can never spend the same token twice.
+Callers that find the bucket empty wait for the refill instead of failing. Within an
+instance they queue per bucket in arrival order, so only the head of the queue polls
+MongoDB.
+"""
+import random
+import threading
+import time
+from typing import Dict
+
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+
+from resilience import DependencyUnavailable
+
+class _TurnQueue:
+    """FIFO of threads waiting to take from one bucket; one holds the turn at a time."""
+    
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        self._abandoned = set()
+    
+    def wait_turn(self, timeout: float) -> bool:
+        """Wait until it is this thread's turn; False (leaving the queue) on timeout."""
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while self._serving != ticket:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._abandoned.add(ticket)
+                    return False
+                self._condition.wait(remaining)
+            return True
+    
+    def done(self):
+        """Pass the turn to the next waiting thread."""
+        with self._condition:
+            self._serving += 1
+            while self._serving in self._abandoned:
+                self._abandoned.discard(self._serving)
+                self._serving += 1
+            self._condition.notify_all()
+
+def _take_pipeline(rate: float, capacity: float, cost: float) -> list:
+    """Update pipeline: refill for the elapsed time, then take cost tokens if available."""
+    elapsed = {'$divide': [{'$subtract': ['$$NOW', {'$ifNull': ['$updated_at', '$$NOW']}]}, 1000]}
+    refilled = {'$min': [capacity, {'$add': [{'$ifNull': ['$tokens', capacity]}, {'$multiply': [elapsed, rate]}]}]}
+    return [
+        {'$set': {'refilled': refilled}},
+        {'$set': {
+            'granted': {'$gte': ['$refilled', cost]},
+            'tokens': {'$cond': [{'$gte': ['$refilled', cost]}, {'$subtract': ['$refilled', cost]}, '$refilled']},
+            'updated_at': '$$NOW'
+        }},
+        {'$unset': 'refilled'}
+    ]
+
+class TokenBucketLimiter:
+    """Token buckets (one MongoDB document each) with per-instance FIFO waiting."""
+    
+    def __init__(self, collection, max_poll_interval: float = 2.0):
+        self.collection = collection
+        self.max_poll_interval = max_poll_interval
+        self._queues = {}
+        self._lock = threading.Lock()
+    
+    def _queue(self, bucket: str) -> _TurnQueue:
+        with self._lock:
+            queue = self._queues.get(bucket)
+            if queue is None:
+                queue = self._queues[bucket] = _TurnQueue()
+            return queue
+    
+    def try_take(self, bucket: str, rate: float, capacity: float, cost: float = 1.0) -> float:
+        """Take cost tokens if the bucket has them. Returns 0, or the seconds until it will."""
+        doc = self.collection.find_one_and_update(
+            {'_id': bucket},
+            _take_pipeline(rate, capacity, cost),
+            projection={'tokens': 1, 'granted': 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if doc.get('granted'):
+            return 0.0
+        return max(0.0, (cost - doc.get('tokens', 0.0)) / rate)
+    
+    def acquire(self, bucket: str, rate: float, capacity: float, max_wait: float, cost: float = 1.0) -> float:
+        """
+        Wait (at most max_wait seconds) for cost tokens from bucket, which refills at rate
+        tokens per second up to capacity. Returns the seconds waited. Raises
+        DependencyUnavailable when the wait would exceed max_wait. If MongoDB is
+        unreachable the call is let through (the provider's own limits still apply).
+        """
+        start = time.monotonic()
+        deadline = start + max_wait
+        queue = self._queue(bucket)
+        if not queue.wait_turn(max_wait):
+            raise DependencyUnavailable(f"{bucket} rate limit: too many callers waiting", 1.0, 'rate_limit')
+        try:
+            while True:
+                try:
+                    wait = self.try_take(bucket, rate, capacity, cost)
+                except PyMongoError as e:
+                    print(f"⚠️  Rate limiter unavailable for {bucket} ({e}); not limiting")
+                    return time.monotonic() - start
+                if wait <= 0:
+                    return time.monotonic() - start
+                if time.monotonic() + wait > deadline:
+                    raise DependencyUnavailable(f"{bucket} rate limit reached; try again in {wait:.0f}s", wait, 'rate_limit')
+                # Other instances may take the refilled token first; then wait again
+                time.sleep(min(wait * random.uniform(1.0, 1.1), self.max_poll_interval))
+        finally:
+            queue.done()
+    
+    def snapshot(self) -> Dict:
+        """Stored state of every bucket (tokens as of its last update)."""
+        return {
+            doc['_id']: {'tokens': round(doc.get('tokens', 0.0), 2), 'updated_at': doc.get('updated_at')}
+            for doc in self.collection.find({}, {'tokens': 1, 'updated_at': 1})
+        }
@@ -0,0 +1,265 @@
+"""
+Resilience for calls to external dependencies: error classification, jittered backoff
+that honours Retry-After, a circuit breaker per dependency (e.g. per Gemini model),
+a total deadline and an optional retry budget shared by the calls of one request.
+
+call_with_retries() only sleeps while a retry can still finish before the deadline and
+the budget allows it; otherwise it fails fast with DependencyUnavailable, which carries
+the number of seconds after which the caller may try again.
+"""
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+import requests
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+
+# Error kinds
+RATE_LIMITED = 'rate_limited'
+TIMEOUT = 'timeout'
+UNAVAILABLE = 'unavailable'
+FATAL = 'fatal'
+RETRYABLE = {RATE_LIMITED, TIMEOUT, UNAVAILABLE}
+
+# Circuit states
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class DependencyUnavailable(Exception):
+    """A dependency can't be called now: its circuit is open, or no retry fits the deadline or budget."""
+    
+    def __init__(self, message: str, retry_after: float, reason: str):
+        super().__init__(message)
+        self.retry_after = max(0.0, retry_after)
+        self.reason = reason  # 'circuit_open', 'deadline', 'budget' or 'rate_limit'
+
+class RetriesExhausted(Exception):
+    """Every attempt failed with a retryable error."""
+    
+    def __init__(self, error: Exception, kind: str, attempts: int):
+        super().__init__(str(error))
+        self.error = error
+        self.kind = kind
+        self.attempts = attempts
+
+def _status_code(error: Exception) -> Optional[int]:
+    if google_exceptions is not None and isinstance(error, google_exceptions.GoogleAPICallError):
+        return error.code
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+def classify_error(error: Exception) -> str:
+    """Kind of a failed call: RATE_LIMITED, TIMEOUT and UNAVAILABLE are worth retrying, FATAL is not."""
+    status = _status_code(error)
+    if status is not None:
+        if status == 429:
+            return RATE_LIMITED
+        if status in (408, 504):
+            return TIMEOUT
+        if status >= 500:
+            return UNAVAILABLE
+        return FATAL
+    if isinstance(error, (TimeoutError, requests.exceptions.Timeout)):
+        return TIMEOUT
+    if isinstance(error, (ConnectionError, requests.exceptions.ConnectionError)):
+        return UNAVAILABLE
+    return FATAL
+
+def _parse_retry_after(value: str) -> Optional[float]:
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+def retry_after_from_error(error: Exception) -> Optional[float]:
+    """Server-requested delay in seconds: a Retry-After header or a google.rpc.RetryInfo detail."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if headers and headers.get('Retry-After'):
+        delay = _parse_retry_after(headers['Retry-After'])
+        if delay is not None:
+            return delay
+    for detail in getattr(error, 'details', None) or []:
+        delay = getattr(detail, 'retry_delay', None)
+        if delay is None:
+            continue
+        if hasattr(delay, 'total_seconds'):
+            return max(0.0, delay.total_seconds())
+        return max(0.0, getattr(delay, 'seconds', 0) + getattr(delay, 'nanos', 0) / 1e9)
+    return None
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """Retry-After when the server sent one, otherwise full-jitter exponential backoff."""
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class CircuitBreaker:
+    """
+    Fails calls fast after failure_threshold consecutive retryable failures. Once open, it
+    stays open for reset_timeout (or longer when the server asked for it), then lets a
+    single probe call through: success closes the circuit, failure opens it again.
+    """
+    
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 on_state_change: Optional[Callable[[str, str], None]] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_state_change = on_state_change
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_until = 0.0
+        self._probe_started = None
+    
+    def _set_state(self, state: str):
+        # Called with the lock held
+        if state != self._state:
+            self._state = state
+            if self.on_state_change:
+                self.on_state_change(self.name, state)
+    
+    def before_call(self):
+        """Raise DependencyUnavailable unless a call may go through now."""
+        with self._lock:
+            now = time.monotonic()
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN and now >= self._opened_until:
+                self._set_state(HALF_OPEN)
+                self._probe_started = None
+            if self._state == HALF_OPEN:
+                # One probe at a time; a probe that never reported back is replaced
+                if self._probe_started is None or now - self._probe_started > self.reset_timeout:
+                    self._probe_started = now
+                    return
+                retry_after = self.reset_timeout - (now - self._probe_started)
+            else:
+                retry_after = self._opened_until - now
+        raise DependencyUnavailable(f"{self.name} is unavailable (circuit open)", retry_after, 'circuit_open')
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe_started = None
+            self._set_state(CLOSED)
+    
+    def record_failure(self, retry_after: Optional[float] = None):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_until = time.monotonic() + max(self.reset_timeout, retry_after or 0.0)
+                self._probe_started = None
+                self._set_state(OPEN)
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._failures,
+                'retry_after': round(max(0.0, self._opened_until - time.monotonic()), 1) if self._state == OPEN else 0.0
+            }
+
+class CircuitBreakerRegistry:
+    """One CircuitBreaker per name, created on first use with shared settings."""
+    
+    def __init__(self, **settings):
+        self.settings = settings
+        self._breakers = {}
+        self._lock = threading.Lock()
+    
+    def get(self, name: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(name)
+            if breaker is None:
+                breaker = self._breakers[name] = CircuitBreaker(name, **self.settings)
+            return breaker
+    
+    def snapshot(self) -> Dict:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {name: breaker.snapshot() for name, breaker in breakers.items()}
+
+class RetryBudget:
+    """Seconds of backoff sleep that a caller (e.g. one HTTP request) may spend across all its calls."""
+    
+    def __init__(self, seconds: float):
+        self._remaining = seconds
+        self._lock = threading.Lock()
+    
+    @property
+    def remaining(self) -> float:
+        with self._lock:
+            return self._remaining
+    
+    def spend(self, delay: float) -> bool:
+        """Take delay from the budget; False (and nothing taken) if it doesn't fit."""
+        with self._lock:
+            if delay > self._remaining:
+                return False
+            self._remaining -= delay
+            return True
+
+def call_with_retries(function: Callable[[int], object], breaker: CircuitBreaker, max_attempts: int,
+                      deadline: float, budget: Optional[RetryBudget] = None, base_delay: float = 1.0,
+                      max_delay: float = 30.0,
+                      on_retry: Optional[Callable[[int, float, Exception], None]] = None,
+                      before_attempt: Optional[Callable[[], None]] = None):
+    """
+    Call function(attempt) until it succeeds, fails with a non-retryable error (re-raised
+    as is) or max_attempts retryable failures (RetriesExhausted). deadline is a
+    time.monotonic() value after which no retry is started. on_retry(attempt, delay, error)
+    is called before each backoff sleep. before_attempt() runs before the breaker is asked,
+    so waiting in it (e.g. for a rate limit token) can't hold the half-open probe slot;
+    it may raise DependencyUnavailable to fail fast.
+    """
+    attempt = 0
+    while True:
+        if before_attempt:
+            before_attempt()
+        breaker.before_call()
+        try:
+            result = function(attempt)
+        except Exception as error:
+            kind = classify_error(error)
+            if kind not in RETRYABLE:
+                # The dependency answered; the request itself is at fault
+                breaker.record_success()
+                raise
+            retry_after = retry_after_from_error(error)
+            breaker.record_failure(retry_after)
+            attempt += 1
+            if attempt >= max_attempts:
+                raise RetriesExhausted(error, kind, attempt) from error
+            
+            delay = backoff_delay(attempt - 1, base_delay, max_delay, retry_after)
+            if time.monotonic() + delay > deadline:
+                raise DependencyUnavailable(
+                    f"{breaker.name} {kind.replace('_', ' ')}; no retry fits the deadline", delay, 'deadline'
+                ) from error
+            if budget is not None and not budget.spend(delay):
+                raise DependencyUnavailable(
+                    f"{breaker.name} {kind.replace('_', ' ')}; try again in {delay:.0f}s", delay, 'budget'
+                ) from error
+            if on_retry:
+                on_retry(attempt, delay, error)
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        return result
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope='session')
+def app_module():
+    """The Flask app module, backed by an in-memory mongomock client."""
+    pytest.importorskip('flask')
+    pytest.importorskip('google.generativeai')
+    mongomock = pytest.importorskip('mongomock')
+    os.environ.setdefault('GEMINI_CACHE_BACKEND', 'none')
+    os.environ.setdefault('RATE_LIMITING', 'false')
+    
+    import pymongo
+    original = pymongo.MongoClient
+    pymongo.MongoClient = mongomock.MongoClient
+    try:
+        import app
+    finally:
+        pymongo.MongoClient = original
+    return app
@@ -0,0 +1,35 @@
+def drain_usage_writes(app):
+    app._AGENT_USAGE_EXECUTOR.submit(lambda: None).result(timeout=10)
+
+def test_only_agents_of_stored_figures_are_remembered(app_module, monkeypatch):
+    app = app_module
+    monkeypatch.setattr(app, '_agent_usage_recorded', app.OrderedDict())
+    figures = app.db[app.HISTORICAL_FIGURES_COLLECTION]
+    figures.delete_many({'person_name_lower': 'ada lovelace'})
+    figures.insert_one({'person_name': 'Ada Lovelace', 'person_name_lower': 'ada lovelace', 'elevenlabs_agent_id': 'agent-ada'})
+    
+    app.record_agent_usage('agent-ada')
+    for i in range(50):
+        app.record_agent_usage(f"made-up-{i}")
+    drain_usage_writes(app)
+    
+    assert list(app._agent_usage_recorded) == ['agent-ada']
+    assert figures.find_one({'elevenlabs_agent_id': 'agent-ada'})['last_used_at'] is not None
+    assert app._agent_usage_pending == 0
+
+def test_throttle_map_is_capped(app_module, monkeypatch):
+    app = app_module
+    monkeypatch.setattr(app, '_agent_usage_recorded', app.OrderedDict())
+    monkeypatch.setattr(app, 'AGENT_USAGE_TRACKED_MAX', 3)
+    figures = app.db[app.HISTORICAL_FIGURES_COLLECTION]
+    figures.delete_many({'elevenlabs_agent_id': {'$regex': '^capped-'}})
+    figures.insert_many([
+        {'person_name': f"Figure {i}", 'person_name_lower': f"capped figure {i}", 'elevenlabs_agent_id': f"capped-{i}"}
+        for i in range(5)
+    ])
+    
+    for i in range(5):
+        app.record_agent_usage(f"capped-{i}")
+    drain_usage_writes(app)
+    
+    assert list(app._agent_usage_recorded) == ['capped-2', 'capped-3', 'capped-4']
@@ -0,0 +1,48 @@
+def test_failed_attempt_retracts_streamed_answers(app_module, monkeypatch):
+    app = app_module
+    question_count = len(app.HISTORICAL_FIGURE_QUESTIONS)
+    monkeypatch.setattr(app, 'GEMINI_CACHE', app.GeminiResponseCache(None))
+    monkeypatch.setattr(app, 'get_available_gemini_model', lambda: 'model')
+    monkeypatch.setattr(app, 'observe_gemini_call', lambda *args, **kwargs: None)
+    
+    def call_gemini(model_name, operation, attempt, **kwargs):
+        try:
+            return attempt(0, {'timeout': 10})
+        except ConnectionError:
+            return attempt(1, {'timeout': 10})
+    
+    monkeypatch.setattr(app, 'call_gemini', call_gemini)
+    
+    class Chunk:
+        def __init__(self, text):
+            self.text = text
+    
+    class Model:
+        calls = 0
+        
+        def __init__(self, model_name):
+            pass
+        
+        def generate_content(self, prompt, **kwargs):
+            Model.calls += 1
+            if Model.calls == 1:
+                def failing():
+                    yield Chunk("Q1: First try.\nQ2: Cut off\n")
+                    raise ConnectionError('stream dropped')
+                return failing()
+            return iter([Chunk('\n'.join(f"Q{n}: Answer {n}." for n in range(1, question_count + 1)))])
+    
+    monkeypatch.setattr(app.genai, 'GenerativeModel', Model)
+    channel = app.AnswerChannel()
+    subscriber = channel.subscribe()
+    
+    app.generate_historical_figure_response('Ada Lovelace', 'prompt', channel.publish, on_retract=channel.retract)
+    
+    events = []
+    while not subscriber.empty():
+        events.append(subscriber.get())
+    assert events[:2] == [(1, 'First try.'), (1, None)]
+    assert (1, 'Answer 1.') in events[2:]
+    # Late subscribers only see the answers of the attempt that succeeded
+    replay = channel.subscribe()
+    assert replay.get() == (1, 'Answer 1.')
@@ -0,0 +1,113 @@
+import time
+
+from answer_parser import StreamingAnswerParser, parse_answers
+
+QUESTIONS = [f"What is question number {n}?" for n in range(1, 11)]
+
+def numbered(n: int, answer: str) -> str:
+    return f"Q{n}: {answer}"
+
+def test_parses_each_answer_in_question_order():
+    text = "\n".join(numbered(n, f"Answer {n}.") for n in (3, 1, 2))
+    assert parse_answers(QUESTIONS, text) == {
+        QUESTIONS[0]: "Answer 1.",
+        QUESTIONS[1]: "Answer 2.",
+        QUESTIONS[2]: "Answer 3.",
+    }
+
+def test_multiline_answers_and_echoed_questions():
+    text = (
+        f"**Q1:** {QUESTIONS[0]}\n"
+        "First line of the answer.\n"
+        "Second line.\n"
+        f"Q2: {QUESTIONS[1]} - Inline answer."
+    )
+    answers = parse_answers(QUESTIONS, text)
+    assert answers[QUESTIONS[0]] == "First line of the answer.\nSecond line."
+    assert answers[QUESTIONS[1]] == "Inline answer."
+
+def test_missing_question_numbers_are_skipped():
+    text = "\n".join(numbered(n, f"Answer {n}.") for n in (1, 4, 9))
+    answers = parse_answers(QUESTIONS, text)
+    assert list(answers) == [QUESTIONS[0], QUESTIONS[3], QUESTIONS[8]]
+
+def test_duplicated_question_numbers_keep_the_longest_answer():
+    text = "\n".join([
+        numbered(2, "Short."),
+        numbered(2, "A much longer second answer."),
+        numbered(2, "Mid length."),
+    ])
+    assert parse_answers(QUESTIONS, text) == {QUESTIONS[1]: "A much longer second answer."}
+
+def test_out_of_range_and_repeated_questions_are_dropped():
+    text = "\n".join([
+        numbered(0, "Zero."),
+        numbered(11, "Eleven."),
+        numbered(5, QUESTIONS[4]),
+        numbered(6, "Kept."),
+    ])
+    assert parse_answers(QUESTIONS, text) == {QUESTIONS[5]: "Kept."}
+
+def test_first_marker_may_follow_preamble_on_the_same_line():
+    # Matches the original regex, which found Q<n>: anywhere before the first answer
+    text = "Sure, here are the answers. Q1: Preamble answer.\nQ2: Second."
+    answers = parse_answers(QUESTIONS, text)
+    assert answers[QUESTIONS[0]] == "Preamble answer."
+    assert answers[QUESTIONS[1]] == "Second."
+
+def test_mid_line_markers_inside_an_answer_are_text():
+    text = "Q1: He wrote Q2: a memo.\nQ3: Third."
+    answers = parse_answers(QUESTIONS, text)
+    assert answers[QUESTIONS[0]] == "He wrote Q2: a memo."
+    assert QUESTIONS[1] not in answers
+    assert answers[QUESTIONS[2]] == "Third."
+
+def test_streamed_chunks_match_complete_parse():
+    text = "\n".join(numbered(n, f"Answer {n} " * 20) for n in range(1, 11))
+    streamed = {}
+    parser = StreamingAnswerParser(QUESTIONS, lambda q_num, answer: streamed.__setitem__(QUESTIONS[q_num - 1], answer))
+    for start in range(0, len(text), 7):
+        parser.feed(text[start:start + 7])
+    parser.finish()
+    assert streamed == parse_answers(QUESTIONS, text)
+
+def test_answers_are_emitted_as_soon_as_the_next_marker_arrives():
+    emitted = []
+    parser = StreamingAnswerParser(QUESTIONS, lambda q_num, answer: emitted.append(q_num))
+    parser.feed("Q1: First.\nQ2: Sec")
+    assert emitted == []
+    parser.feed("ond.\n")
+    parser.feed("Q3: Thi")
+    assert emitted == [1]  # the Q3 line is not complete yet
+    parser.feed("rd.\n")
+    assert emitted == [1, 2]
+    parser.finish()
+    assert emitted == [1, 2, 3]
+
+def test_large_responses_parse_in_linear_time():
+    # 100k+ characters per answer and in total, plus a single 200k-character line
+    big_answer = "word " * 25_000
+    text = "\n".join(numbered(n, big_answer) for n in range(1, 11))
+    assert len(text) > 1_000_000
+    start = time.perf_counter()
+    answers = parse_answers(QUESTIONS, text)
+    assert time.perf_counter() - start < 2
+    assert len(answers) == 10
+    
+    one_line = "Q1: " + "x" * 200_000
+    assert len(parse_answers(QUESTIONS, one_line)[QUESTIONS[0]]) == 200_000
+
+def test_pathological_lines_without_markers_stay_linear():
+    text = ("Q" * 100_000) + "\n" + ("*" * 100_000) + "\n" + ("Q1" * 50_000)
+    start = time.perf_counter()
+    assert parse_answers(QUESTIONS, text) == {}
+    assert time.perf_counter() - start < 2
+
+def test_many_small_chunks_without_newlines():
+    parser_answers = {}
+    parser = StreamingAnswerParser(QUESTIONS, lambda q_num, answer: parser_answers.__setitem__(q_num, answer))
+    parser.feed("Q1: ")
+    for _ in range(100_000):
+        parser.feed("a")
+    parser.finish()
+    assert parser_answers == {1: "a" * 100_000}
@@ -0,0 +1,35 @@
+def test_bulk_run_reports_progress_from_worker_threads(app_module, monkeypatch):
+    app = app_module
+    figures = app.db[app.HISTORICAL_FIGURES_COLLECTION]
+    jobs = app.db[app.JOBS_COLLECTION]
+    figures.delete_many({})
+    app.db[app.META_COLLECTION].delete_many({'_id': app.BULK_CHECKPOINT_ID})
+    figures.insert_many([
+        {'person_name': f"Figure {i}", 'person_name_lower': f"figure {i}"}
+        for i in range(5)
+    ])
+    monkeypatch.setattr(app, 'create_elevenlabs_agent_for_figure',
+                        lambda person_name, evict=True: {'person_name': person_name, 'agent_id': 'agent'})
+    evictions = []
+    monkeypatch.setattr(app, 'ensure_max_agents', lambda max_count=None: evictions.append(max_count))
+    monkeypatch.setattr(app, 'BULK_EVICT_INTERVAL', 2)
+    
+    job_id = 'bulk-progress-test'
+    jobs.delete_many({'_id': job_id})
+    jobs.insert_one({'_id': job_id, 'status': 'running', 'updated_at': None})
+    app._JOB_CONTEXT.job_id = job_id
+    try:
+        result = app.run_bulk_agent_creation('all')
+    finally:
+        app._JOB_CONTEXT.job_id = None
+    
+    job = jobs.find_one({'_id': job_id})
+    assert job['progress']['processed'] == 5
+    assert job['progress']['created'] == 5
+    assert job['progress']['total'] == 5
+    assert job['progress']['counted'] is True
+    assert job['updated_at'] is not None
+    assert result['total_figures'] == 5
+    # The agent limit is enforced while the run goes (after 2 and 4 creations) and at the end
+    assert len(evictions) >= 2
+    assert set(evictions) == {app.MAX_AGENTS}
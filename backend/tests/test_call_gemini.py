@@ -0,0 +1,44 @@
+import pytest
+
+def test_request_timeout_is_bounded_by_the_deadline(app_module, monkeypatch):
+    app = app_module
+    monkeypatch.setattr(app, 'GEMINI_RETRY_DEADLINE', 60)
+    timeouts = []
+    
+    result = app.call_gemini('deadline-test-model', 'profile', lambda number, options: timeouts.append(options['timeout']) or 'ok')
+    
+    assert result == 'ok'
+    assert 55 < timeouts[0] <= 60
+
+def test_no_attempt_starts_without_time_left(app_module, monkeypatch):
+    app = app_module
+    monkeypatch.setattr(app, 'GEMINI_RETRY_DEADLINE', app.GEMINI_MIN_ATTEMPT_TIME - 1)
+    
+    with pytest.raises(app.DependencyUnavailable) as error:
+        app.call_gemini('deadline-test-model', 'profile', lambda number, options: 'ok')
+    assert error.value.reason == 'deadline'
+    # The rejection happened before the breaker was asked, so no probe is held
+    assert app.GEMINI_BREAKERS.get('deadline-test-model').snapshot()['state'] == 'closed'
+
+def test_query_passes_retry_failures_through_and_wraps_other_errors(app_module, monkeypatch):
+    app = app_module
+    monkeypatch.setattr(app, 'GEMINI_API_KEY', 'test-key')
+    monkeypatch.setattr(app, 'GEMINI_PROFILE_SHARDING', False)
+    monkeypatch.setattr(app, 'GEMINI_STREAMING', False)
+    exhausted = app.GeminiRequestFailed("Gemini API rate limit exceeded after 3 attempts. Please wait before trying again.")
+    
+    def fail(*args, **kwargs):
+        raise exhausted
+    monkeypatch.setattr(app, 'generate_historical_figure_response', fail)
+    with pytest.raises(app.GeminiRequestFailed) as error:
+        app.query_gemini_for_historical_figure('Ada Lovelace')
+    assert error.value is exhausted
+    
+    # Other errors are wrapped, even when their message happens to mention attempts
+    def fail_other(*args, **kwargs):
+        raise ValueError("gave up after parsing 3 attempts")
+    monkeypatch.setattr(app, 'generate_historical_figure_response', fail_other)
+    with pytest.raises(Exception) as error:
+        app.query_gemini_for_historical_figure('Ada Lovelace')
+    assert type(error.value) is Exception
+    assert str(error.value) == "Error querying Gemini API: gave up after parsing 3 attempts"
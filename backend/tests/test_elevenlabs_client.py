@@ -0,0 +1,97 @@
+from unittest import mock
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+def refused():
+    reason = NewConnectionError(None, 'Connection refused')
+    return requests.exceptions.ConnectionError(MaxRetryError(None, '/v1/convai/agents', reason))
+
+@pytest.fixture
+def client(app_module, monkeypatch):
+    """Client with a mocked session; returns (client, recorded backoff delays)."""
+    app = app_module
+    client = app.ElevenLabsClient('test-key', 'https://api.example.test', max_retries=2)
+    client.session = mock.Mock()
+    delays = []
+    monkeypatch.setattr(app.time, 'sleep', delays.append)
+    return client, delays
+
+@pytest.mark.parametrize('method', ['GET', 'POST', 'DELETE'])
+def test_429_is_retried_for_every_method(client, method):
+    client, delays = client
+    client.session.request.side_effect = [FakeResponse(429), FakeResponse(200)]
+    
+    response = client.request('create_agent', method, '/v1/convai/agents')
+    
+    assert response.status_code == 200
+    assert client.session.request.call_count == 2
+    assert len(delays) == 1
+
+@pytest.mark.parametrize('method', ['GET', 'POST'])
+@pytest.mark.parametrize('error', [refused, lambda: requests.exceptions.ConnectTimeout('connect timed out')])
+def test_connect_errors_are_retried_for_every_method(client, method, error):
+    client, delays = client
+    client.session.request.side_effect = [error(), FakeResponse(200)]
+    
+    response = client.request('create_agent', method, '/v1/convai/agents')
+    
+    assert response.status_code == 200
+    assert client.session.request.call_count == 2
+
+def test_5xx_is_retried_for_idempotent_methods_only(client):
+    client, delays = client
+    client.session.request.side_effect = [FakeResponse(503), FakeResponse(502), FakeResponse(200)]
+    assert client.request('get_agent', 'GET', '/v1/convai/agents/a').status_code == 200
+    assert client.session.request.call_count == 3
+    
+    client.session.request.reset_mock()
+    client.session.request.side_effect = [FakeResponse(503), FakeResponse(200)]
+    assert client.request('create_agent', 'POST', '/v1/convai/agents').status_code == 503
+    assert client.session.request.call_count == 1
+
+def test_read_timeouts_are_retried_for_idempotent_methods_only(client):
+    client, delays = client
+    client.session.request.side_effect = [requests.exceptions.ReadTimeout('read timed out'), FakeResponse(200)]
+    assert client.request('delete_agent', 'DELETE', '/v1/convai/agents/a').status_code == 200
+    assert client.session.request.call_count == 2
+    
+    client.session.request.reset_mock()
+    client.session.request.side_effect = [requests.exceptions.ReadTimeout('read timed out'), FakeResponse(200)]
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        client.request('create_agent', 'POST', '/v1/convai/agents')
+    assert client.session.request.call_count == 1
+
+def test_connection_reset_after_sending_is_not_replayed(client):
+    client, delays = client
+    client.session.request.side_effect = [requests.exceptions.ConnectionError('Connection reset by peer'), FakeResponse(200)]
+    
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.request('create_agent', 'POST', '/v1/convai/agents')
+    assert client.session.request.call_count == 1
+
+def test_retry_after_is_honoured(client):
+    client, delays = client
+    client.session.request.side_effect = [FakeResponse(429, {'Retry-After': '3'}), FakeResponse(200)]
+    client.request('create_agent', 'POST', '/v1/convai/agents')
+    assert delays == [3.0]
+    
+    # Capped at backoff_max
+    delays.clear()
+    client.session.request.side_effect = [FakeResponse(503, {'Retry-After': '120'}), FakeResponse(200)]
+    client.request('get_agent', 'GET', '/v1/convai/agents/a')
+    assert delays == [client.backoff_max]
+
+def test_gives_up_after_max_retries(client):
+    client, delays = client
+    client.session.request.side_effect = [FakeResponse(429)] * 5
+    
+    assert client.request('create_agent', 'POST', '/v1/convai/agents').status_code == 429
+    assert client.session.request.call_count == 3
+    assert len(delays) == 2
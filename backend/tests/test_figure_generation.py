@@ -0,0 +1,93 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import pytest
+
+PERSON = 'Ada Lovelace'
+PERSON_LOWER = 'ada lovelace'
+
+@pytest.fixture
+def figures(app_module, monkeypatch):
+    """Empty figure and lease collections, with a stubbed voice summary."""
+    app = app_module
+    collection = app.db[app.HISTORICAL_FIGURES_COLLECTION]
+    collection.delete_many({})
+    collection.create_index('person_name_lower', unique=True)
+    app.db[app.FIGURE_LEASES_COLLECTION].delete_many({})
+    monkeypatch.setattr(app, 'generate_elevenlabs_voice_summary', lambda name, answers, full_response: 'summary')
+    return collection
+
+def stub_gemini(app, monkeypatch, delay=0.0, before_return=None):
+    """Replace the Gemini profile query with a stub; returns the list of names it was called with."""
+    calls = []
+    
+    def query(person_name):
+        calls.append(person_name)
+        time.sleep(delay)
+        if before_return:
+            before_return()
+        return {'answers': {app.HISTORICAL_FIGURE_QUESTIONS[0]: 'Augusta Ada King'}, 'full_response': 'Q1: Augusta Ada King'}
+    
+    monkeypatch.setattr(app, 'query_gemini_for_historical_figure', query)
+    return calls
+
+def test_concurrent_callers_share_one_generation(app_module, figures, monkeypatch):
+    app = app_module
+    calls = stub_gemini(app, monkeypatch, delay=0.3)
+    callers = 8
+    
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        results = list(pool.map(lambda _: app.get_or_create_historical_figure(PERSON), range(callers)))
+    
+    assert calls == [PERSON]
+    assert figures.count_documents({'person_name_lower': PERSON_LOWER}) == 1
+    assert all(result['_id'] == results[0]['_id'] for result in results)
+    assert all(result['answers'] == {app.HISTORICAL_FIGURE_QUESTIONS[0]: 'Augusta Ada King'} for result in results)
+    assert app.db[app.FIGURE_LEASES_COLLECTION].count_documents({}) == 0
+
+def test_waits_for_the_instance_holding_the_lease(app_module, figures, monkeypatch):
+    app = app_module
+    calls = stub_gemini(app, monkeypatch)
+    monkeypatch.setattr(app, 'FIGURE_LEASE_POLL_INTERVAL', 0.05)
+    now = app.utc_now()
+    app.db[app.FIGURE_LEASES_COLLECTION].insert_one({
+        '_id': PERSON_LOWER,
+        'owner': 'other-instance',
+        'acquired_at': now,
+        'expires_at': now + timedelta(seconds=app.FIGURE_LEASE_TTL)
+    })
+    
+    # The other instance stores its document while this one polls
+    timer = threading.Timer(0.2, lambda: figures.insert_one({
+        'person_name': PERSON, 'person_name_lower': PERSON_LOWER, 'answers': {}, 'full_response': ''
+    }))
+    timer.start()
+    try:
+        figure = app.get_or_create_historical_figure(PERSON)
+    finally:
+        timer.join()
+    
+    assert calls == []
+    assert figure['person_name_lower'] == PERSON_LOWER
+    assert app.db[app.FIGURE_LEASES_COLLECTION].find_one({'_id': PERSON_LOWER})['owner'] == 'other-instance'
+
+def test_lost_insert_race_returns_existing_document(app_module, figures, monkeypatch):
+    app = app_module
+    
+    # A writer without the lease (e.g. after an expired lease) inserts first
+    def competing_insert():
+        figures.insert_one({
+            'person_name': PERSON,
+            'person_name_lower': PERSON_LOWER,
+            'answers': {'Who won?': 'The other writer'},
+            'full_response': ''
+        })
+    calls = stub_gemini(app, monkeypatch, before_return=competing_insert)
+    
+    figure = app.generate_and_store_historical_figure(PERSON, PERSON_LOWER)
+    
+    assert calls == [PERSON]
+    assert figure['answers'] == {'Who won?': 'The other writer'}
+    assert figures.count_documents({'person_name_lower': PERSON_LOWER}) == 1
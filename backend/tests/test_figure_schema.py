@@ -0,0 +1,107 @@
+import pytest
+
+import figure_schema
+
+mongomock = pytest.importorskip('mongomock')
+
+QUESTIONS = ['What is your name?', 'Where were you born?', 'What did you build?']
+
+def legacy_figure(name, answers=None):
+    return {
+        'person_name': name,
+        'questions': list(QUESTIONS),
+        'answers': answers if answers is not None else {
+            'What is your name?': name,
+            'What did you build?': 'The Analytical Engine notes',
+        },
+        'full_response': f"Q1: {name}\nQ3: The Analytical Engine notes",
+    }
+
+@pytest.fixture
+def db():
+    figure_schema._catalog_cache.clear()
+    return mongomock.MongoClient().db
+
+def test_expand_round_trips_both_schemas(db):
+    legacy = legacy_figure('Ada Lovelace')
+    
+    # Schema 1 documents come back unchanged
+    assert figure_schema.expand_figure(db, dict(legacy)) == legacy
+    assert figure_schema.expand_figure(db, dict(legacy, schema_version=1)) == legacy
+    
+    stored = figure_schema.to_compact_document(db, legacy)
+    assert stored['schema_version'] == figure_schema.SCHEMA_VERSION
+    assert 'questions' not in stored and 'answers' not in stored and 'full_response' not in stored
+    assert stored['answer_list'] == ['Ada Lovelace', None, 'The Analytical Engine notes']
+    
+    # Read back through the catalog collection, not the per-process cache
+    figure_schema._catalog_cache.clear()
+    assert figure_schema.expand_figure(db, stored) == legacy
+
+def test_storage_projection_maps_legacy_fields(db):
+    projection = figure_schema.storage_projection(['person_name', 'answers', 'full_response'])
+    
+    assert projection == {
+        'schema_version': 1,
+        'person_name': 1,
+        'answers': 1,
+        'catalog_version': 1,
+        'answer_list': 1,
+        'full_response': 1,
+        'full_response_z': 1,
+    }
+    
+    figures = db.figures
+    figures.insert_one(figure_schema.to_compact_document(db, legacy_figure('Ada Lovelace')))
+    figures.insert_one(legacy_figure('Charles Babbage'))
+    docs = [
+        figure_schema.expand_figure(db, doc)
+        for doc in figures.find({}, figure_schema.storage_projection(['person_name', 'answers'])).sort('person_name', 1)
+    ]
+    assert [doc['person_name'] for doc in docs] == ['Ada Lovelace', 'Charles Babbage']
+    assert docs[0]['answers'] == legacy_figure('Ada Lovelace')['answers']
+    assert docs[1]['answers'] == legacy_figure('Charles Babbage')['answers']
+    assert all('full_response' not in doc for doc in docs)
+
+def test_interrupted_migration_resumes_from_checkpoint(db, monkeypatch):
+    names = [f"Figure {index}" for index in range(5)]
+    db.figures.insert_many([legacy_figure(name) for name in names])
+    # Answers outside the question list can't be compacted
+    db.figures.insert_one(legacy_figure('Broken', answers={'Unknown question?': 'x'}))
+    
+    def interrupt(seconds):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(figure_schema.time, 'sleep', interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        figure_schema.migrate_figures(db, 'figures', '_meta', batch_size=2, pause=0.1)
+    
+    checkpoint = db['_meta'].find_one({'_id': 'figure_schema_migration'})
+    first_batch = list(db.figures.find().sort('_id', 1).limit(2))
+    assert checkpoint['last_id'] == first_batch[-1]['_id']
+    assert db.figures.count_documents({'schema_version': figure_schema.SCHEMA_VERSION}) == 2
+    
+    stats = figure_schema.migrate_figures(db, 'figures', '_meta', batch_size=2)
+    
+    # The resumed run only reads the documents after the checkpoint
+    assert stats == {'migrated': 3, 'skipped': 1, 'batches': 2}
+    assert db.figures.count_documents({'schema_version': figure_schema.SCHEMA_VERSION}) == 5
+    assert db.figures.find_one({'person_name': 'Broken'})['answers'] == {'Unknown question?': 'x'}
+    checkpoint = db['_meta'].find_one({'_id': 'figure_schema_migration'})
+    assert checkpoint['last_id'] is None and checkpoint['completed_at']
+    
+    for doc in db.figures.find({'person_name': {'$in': names}}):
+        assert figure_schema.expand_figure(db, doc) == dict(legacy_figure(doc['person_name']), _id=doc['_id'])
+
+def test_migrate_figures_command_bumps_the_listing_version(app_module):
+    app = app_module
+    figures = app.db[app.HISTORICAL_FIGURES_COLLECTION]
+    figures.delete_many({})
+    app.db[app.META_COLLECTION].delete_one({'_id': 'figure_schema_migration'})
+    figures.insert_one(dict(legacy_figure('Ada Lovelace'), person_name_lower='ada lovelace'))
+    version = app.get_figures_version()
+    
+    result = app.app.test_cli_runner().invoke(args=['migrate-figures'])
+    
+    assert result.exit_code == 0, result.output
+    assert figures.find_one({'person_name_lower': 'ada lovelace'})['schema_version'] == figure_schema.SCHEMA_VERSION
+    assert app.get_figures_version() == version + 1
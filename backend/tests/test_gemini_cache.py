@@ -0,0 +1,55 @@
+class DictBackend:
+    def __init__(self):
+        self.entries = {}
+    
+    def get(self, key):
+        return self.entries.get(key)
+    
+    def put(self, key, model_name, response):
+        self.entries[key] = response
+
+def profile_text(numbers):
+    return '\n'.join(f"Q{n}: Answer {n}." for n in numbers)
+
+def test_cache_only_stores_responses_that_validate(app_module):
+    app = app_module
+    cache = app.GeminiResponseCache(DictBackend())
+    is_number = lambda text: text.split()[0].isdigit()
+    
+    cache.put('model', 'tie-break', None, 'Voice 2 fits best', validate=is_number)
+    cache.put('model', 'other tie-break', None, '2', validate=is_number)
+    
+    assert cache.get('model', 'tie-break', validate=is_number) is None
+    assert cache.get('model', 'other tie-break', validate=is_number) == '2'
+    assert cache.stats()['rejected'] == 1
+
+def test_truncated_profile_is_not_cached(app_module, monkeypatch):
+    app = app_module
+    cache = app.GeminiResponseCache(DictBackend())
+    monkeypatch.setattr(app, 'GEMINI_CACHE', cache)
+    monkeypatch.setattr(app, 'get_available_gemini_model', lambda: 'model')
+    monkeypatch.setattr(app, 'call_gemini', lambda model_name, operation, attempt, **kwargs: attempt(0, {'timeout': 10}))
+    question_count = len(app.HISTORICAL_FIGURE_QUESTIONS)
+    responses = iter([
+        profile_text(range(1, question_count)),  # the last answer was cut off
+        profile_text(range(1, question_count + 1))
+    ])
+    
+    class Response:
+        def __init__(self):
+            self.text = next(responses)
+    
+    class Model:
+        def __init__(self, model_name):
+            pass
+        
+        def generate_content(self, prompt, **kwargs):
+            return Response()
+    
+    monkeypatch.setattr(app.genai, 'GenerativeModel', Model)
+    monkeypatch.setattr(app, 'observe_gemini_call', lambda *args, **kwargs: None)
+    
+    app.generate_historical_figure_response('Ada Lovelace', 'prompt')
+    assert cache.stats()['stores'] == 0
+    app.generate_historical_figure_response('Ada Lovelace', 'prompt')
+    assert cache.stats()['stores'] == 1
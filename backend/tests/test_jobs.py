@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+import pytest
+
+def insert_job(app, job_id, status, age_seconds):
+    updated_at = app.utc_now() - timedelta(seconds=age_seconds)
+    job = {
+        '_id': job_id,
+        'type': 'create_with_agent',
+        'person_name': 'Ada Lovelace',
+        'person_name_lower': 'ada lovelace',
+        'status': status,
+        'stage': 'started',
+        'events': [],
+        'created_at': updated_at,
+        'updated_at': updated_at
+    }
+    if status in app.JOB_ACTIVE_STATUSES:
+        job['active'] = True
+    app.db[app.JOBS_COLLECTION].delete_many({'_id': job_id})
+    app.db[app.JOBS_COLLECTION].insert_one(job)
+
+def test_job_status_reports_stale_active_job_as_failed(app_module):
+    app = app_module
+    insert_job(app, 'stale-job', 'running', app.JOB_STALE_AFTER + 60)
+    
+    response = app.app.test_client().get('/api/jobs/stale-job')
+    
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'failed'
+    assert response.get_json()['error'] == app.JOB_STALE_ERROR
+    assert app.db[app.JOBS_COLLECTION].find_one({'_id': 'stale-job'})['status'] == 'failed'
+    assert 'active' not in app.db[app.JOBS_COLLECTION].find_one({'_id': 'stale-job'})
+
+def test_job_status_keeps_recent_active_job(app_module):
+    app = app_module
+    insert_job(app, 'live-job', 'running', 5)
+    
+    response = app.app.test_client().get('/api/jobs/live-job')
+    
+    assert response.get_json()['status'] == 'running'
+
+def test_enqueue_replaces_stale_job_and_reuses_live_one(app_module, monkeypatch):
+    app = app_module
+    app.db[app.JOBS_COLLECTION].delete_many({'person_name_lower': 'ada lovelace'})
+    insert_job(app, 'stale-job', 'running', app.JOB_STALE_AFTER + 60)
+    submitted = []
+    monkeypatch.setattr(app._CREATION_EXECUTOR, 'submit', lambda *args: submitted.append(args))
+    
+    first = app.enqueue_job('create_with_agent', 'Ada Lovelace', lambda person_name: {})
+    second = app.enqueue_job('create_with_agent', 'Ada Lovelace', lambda person_name: {})
+    
+    assert first['_id'] != 'stale-job'
+    assert second['_id'] == first['_id']
+    assert len(submitted) == 1
+    assert app.db[app.JOBS_COLLECTION].find_one({'_id': 'stale-job'})['status'] == 'failed'
+    assert 'active' not in app.db[app.JOBS_COLLECTION].find_one({'_id': 'stale-job'})
+
+def test_active_flag_is_cleared_when_a_job_finishes(app_module):
+    app = app_module
+    jobs = app.db[app.JOBS_COLLECTION]
+    jobs.delete_many({'person_name_lower': 'ada lovelace'})
+    assert app.ensure_indexes() == []
+    insert_job(app, 'done-job', 'running', 5)
+    
+    app.run_job('done-job', 'Ada Lovelace', lambda person_name: {'ok': True})
+    
+    assert jobs.find_one({'_id': 'done-job'})['status'] == 'succeeded'
+    assert 'active' not in jobs.find_one({'_id': 'done-job'})
+    # A finished job no longer holds the figure's slot in the unique index
+    insert_job(app, 'next-job', 'queued', 0)
+    with pytest.raises(app.DuplicateKeyError):
+        insert_job(app, 'other-job', 'queued', 0)
+    jobs.delete_many({'person_name_lower': 'ada lovelace'})
+
+def test_ensure_indexes_drops_obsolete_and_rebuilds_changed_indexes(app_module):
+    app = app_module
+    figures = app.db[app.HISTORICAL_FIGURES_COLLECTION]
+    jobs = app.db[app.JOBS_COLLECTION]
+    jobs.delete_many({})
+    figures.create_index([('created_at', 1)])
+    jobs.create_index([('type', 1), ('person_name_lower', 1), ('status', 1)])
+    if 'type_1_person_name_lower_1' in jobs.index_information():
+        jobs.drop_index('type_1_person_name_lower_1')
+    # The index as created by the previous spec (needs MongoDB 6.0+)
+    jobs.create_index([('type', 1), ('person_name_lower', 1)], unique=True,
+                      partialFilterExpression={'status': {'$in': app.JOB_ACTIVE_STATUSES}})
+    
+    assert app.ensure_indexes() == []
+    
+    assert 'created_at_1' not in figures.index_information()
+    assert 'type_1_person_name_lower_1_status_1' not in jobs.index_information()
+    assert jobs.index_information()['type_1_person_name_lower_1']['partialFilterExpression'] == {'active': True}
+    assert app.find_missing_indexes() == []
@@ -0,0 +1,37 @@
+def reset_variant_state(app, monkeypatch):
+    monkeypatch.setattr(app, '_knowledge_variant', None)
+    monkeypatch.setattr(app, '_knowledge_unsupported_until', 0.0)
+    app.db[app.META_COLLECTION].delete_many({'_id': app.KNOWLEDGE_VARIANT_META_ID})
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+def test_rejection_by_every_variant_is_remembered(app_module, monkeypatch):
+    app = app_module
+    reset_variant_state(app, monkeypatch)
+    posted = []
+    monkeypatch.setattr(app, 'post_knowledge_variant',
+                        lambda variant, *args: posted.append(variant) or Response(404))
+    
+    assert app.add_knowledge_to_agent('agent', 'Ada Lovelace', 'text') is False
+    assert len(posted) == len(app.KNOWLEDGE_VARIANTS)
+    
+    # Later creations (on this or, after a restart, any instance) skip the probe
+    assert app.add_knowledge_to_agent('agent', 'Ada Lovelace', 'text') is False
+    monkeypatch.setattr(app, '_knowledge_unsupported_until', 0.0)
+    assert app.add_knowledge_to_agent('agent', 'Ada Lovelace', 'text') is False
+    assert len(posted) == len(app.KNOWLEDGE_VARIANTS)
+
+def test_transient_failures_are_not_remembered(app_module, monkeypatch):
+    app = app_module
+    reset_variant_state(app, monkeypatch)
+    posted = []
+    monkeypatch.setattr(app, 'post_knowledge_variant',
+                        lambda variant, *args: posted.append(variant) or Response(503))
+    
+    app.add_knowledge_to_agent('agent', 'Ada Lovelace', 'text')
+    app.add_knowledge_to_agent('agent', 'Ada Lovelace', 'text')
+    
+    assert len(posted) == 2 * len(app.KNOWLEDGE_VARIANTS)
+    assert app.db[app.META_COLLECTION].find_one({'_id': app.KNOWLEDGE_VARIANT_META_ID}) is None
@@ -0,0 +1,63 @@
+import re
+import threading
+import time
+
+from rate_limit import TokenBucketLimiter
+
+class MemoryLimiter(TokenBucketLimiter):
+    """TokenBucketLimiter with its buckets in memory instead of MongoDB."""
+    
+    def __init__(self):
+        super().__init__(collection=None, max_poll_interval=0.05)
+        self.buckets = {}
+        self.bucket_lock = threading.Lock()
+    
+    def try_take(self, bucket, rate, capacity, cost=1.0):
+        with self.bucket_lock:
+            now = time.monotonic()
+            tokens, updated_at = self.buckets.get(bucket, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            if tokens >= cost:
+                self.buckets[bucket] = (tokens - cost, now)
+                return 0.0
+            self.buckets[bucket] = (tokens, now)
+            return (cost - tokens) / rate
+
+class Chunk:
+    def __init__(self, text):
+        self.text = text
+
+class FakeModel:
+    """Answers every question listed in a profile prompt; anything else gets a voice summary."""
+    
+    def __init__(self, model_name):
+        pass
+    
+    def generate_content(self, prompt, stream=False, **kwargs):
+        if 'Questions:\n' in prompt:
+            questions = prompt.split('Questions:\n', 1)[1]
+            text = '\n'.join(f"Q{n}: An answer about it." for n in re.findall(r'^Q(\d+):', questions, re.M))
+        else:
+            text = 'A calm, measured voice.'
+        return [Chunk(text)] if stream else Chunk(text)
+
+def test_sharded_profile_fits_the_rate_limit_on_a_request_thread(app_module, monkeypatch):
+    app = app_module
+    app.db[app.HISTORICAL_FIGURES_COLLECTION].delete_many({'person_name_lower': 'ada lovelace'})
+    monkeypatch.setattr(app, 'GEMINI_API_KEY', 'test-key')
+    monkeypatch.setattr(app, 'GEMINI_PROFILE_SHARDING', True)
+    monkeypatch.setattr(app, 'get_available_gemini_model', lambda: 'rate-limit-test-model')
+    monkeypatch.setattr(app, 'observe_gemini_call', lambda *args, **kwargs: None)
+    monkeypatch.setattr(app.genai, 'GenerativeModel', FakeModel)
+    monkeypatch.setattr(app, 'GEMINI_CACHE', app.GeminiResponseCache(None))
+    # Far fewer tokens in the bucket than shards, and a refill slower than the request's budget
+    monkeypatch.setattr(app, 'RATE_LIMITER', MemoryLimiter())
+    monkeypatch.setattr(app, 'GEMINI_RATE_LIMIT', (1200, 2))
+    monkeypatch.setattr(app, 'GEMINI_REQUEST_RETRY_BUDGET', 0.3)
+    assert len(app.HISTORICAL_FIGURE_QUESTION_CATEGORIES) > 2
+    
+    response = app.app.test_client().get('/api/historical-figure/Ada Lovelace')
+    
+    assert response.status_code == 200, response.get_json()
+    answers = response.get_json()['answers']
+    assert all(answers[question] for question in app.HISTORICAL_FIGURE_QUESTIONS)
@@ -0,0 +1,44 @@
+import time
+
+import pytest
+
+pytest.importorskip('requests')
+
+from resilience import (HALF_OPEN, CircuitBreaker, DependencyUnavailable,
+                        call_with_retries)
+
+def open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    return breaker
+
+def test_rate_limit_rejection_does_not_take_the_half_open_probe():
+    breaker = open_breaker()
+    
+    def rejected():
+        raise DependencyUnavailable('rate limited', 1.0, 'rate_limit')
+    
+    with pytest.raises(DependencyUnavailable):
+        call_with_retries(lambda attempt: 'ok', breaker, max_attempts=3,
+                          deadline=time.monotonic() + 5, before_attempt=rejected)
+    
+    # The probe slot is still free, so the next caller can close the circuit
+    assert call_with_retries(lambda attempt: 'ok', breaker, max_attempts=3,
+                             deadline=time.monotonic() + 5) == 'ok'
+    assert breaker.snapshot()['state'] != HALF_OPEN
+
+def test_before_attempt_runs_before_every_attempt():
+    breaker = CircuitBreaker('test')
+    calls = []
+    
+    def flaky(attempt):
+        if attempt == 0:
+            raise TimeoutError('slow')
+        return 'ok'
+    
+    result = call_with_retries(flaky, breaker, max_attempts=3, deadline=time.monotonic() + 5,
+                               base_delay=0.0, before_attempt=lambda: calls.append(1))
+    
+    assert result == 'ok'
+    assert len(calls) == 2
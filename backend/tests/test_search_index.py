@@ -0,0 +1,42 @@
+def wait_for_index(index):
+    # The worker runs one task at a time; an empty task queues behind the scheduled ones
+    index._executor.submit(lambda: None).result(timeout=10)
+
+def test_rebuild_runs_in_background_and_ranks_matches(app_module):
+    app = app_module
+    figures = app.db[app.HISTORICAL_FIGURES_COLLECTION]
+    figures.delete_many({})
+    ids = figures.insert_many([
+        {'person_name': name, 'person_name_lower': name.lower()}
+        for name in ['Ada Lovelace', 'Charles Babbage', 'Alan Turing', 'Grace Hopper']
+    ]).inserted_ids
+    index = app.FigureSearchIndex()
+    
+    index.rebuild_in_background()
+    index.rebuild_in_background()  # already scheduled: no second rebuild
+    wait_for_index(index)
+    
+    assert index.ready
+    assert index.search('a', 10)[:2] == [str(ids[2]), str(ids[0])]
+    assert index.search('babb', 10) == [str(ids[1])]
+    assert index.search('oppe', 10) == [str(ids[3])]
+
+def test_rebuild_keeps_figures_added_while_it_reads(app_module, monkeypatch):
+    app = app_module
+    figures = app.db[app.HISTORICAL_FIGURES_COLLECTION]
+    figures.delete_many({})
+    figures.insert_one({'person_name': 'Ada Lovelace', 'person_name_lower': 'ada lovelace'})
+    index = app.FigureSearchIndex()
+    real_find = figures.find
+    
+    class Collection:
+        def find(self, *args, **kwargs):
+            # A figure created by a request while the rebuild iterates the cursor
+            index.add('new-figure', 'marie curie')
+            return real_find(*args, **kwargs)
+    
+    monkeypatch.setattr(app, 'db', {app.HISTORICAL_FIGURES_COLLECTION: Collection()})
+    index.rebuild()
+    
+    assert index.search('marie', 10) == ['new-figure']
+    assert len(index.search('lovelace', 10)) == 1
@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+@pytest.fixture
+def trace(app_module):
+    app = app_module
+    trace = app._PIPELINE_TRACE.trace = app.PipelineTrace()
+    app._PIPELINE_TRACE.stack = []
+    yield trace
+    app._PIPELINE_TRACE.trace, app._PIPELINE_TRACE.stack = None, None
+
+def outcomes(trace):
+    return {span['stage']: span['outcome'] for span in trace.spans}
+
+def test_failure_cancels_dependents_and_independent_stages_finish(app_module, trace):
+    app = app_module
+    ran = []
+    
+    def fail(inputs):
+        raise ValueError('profile failed')
+    
+    def record(name):
+        def stage(inputs):
+            ran.append(name)
+            return name
+        return stage
+    
+    graph = app.StageGraph()
+    graph.add('profile', fail)
+    graph.add('voice', record('voice'))
+    graph.add('agent', record('agent'), after=('profile', 'voice'))
+    graph.add('knowledge', record('knowledge'), after=('agent',))
+    graph.add('portrait', record('portrait'), after=('voice',))
+    
+    with pytest.raises(ValueError, match='profile failed'):
+        graph.run()
+    
+    assert sorted(ran) == ['portrait', 'voice']
+    assert outcomes(trace) == {
+        'profile': 'error',
+        'voice': 'ok',
+        'portrait': 'ok',
+        'agent': 'cancelled',
+        'knowledge': 'cancelled',
+    }
+    cancelled = [span for span in trace.spans if span['outcome'] == 'cancelled']
+    assert all(span['attempts'] == 0 and span['duration_ms'] == 0.0 for span in cancelled)
+
+def test_run_raises_the_first_failure(app_module, trace):
+    app = app_module
+    first_failed = threading.Event()
+    
+    def fail_first(inputs):
+        first_failed.set()
+        raise ValueError('first')
+    
+    def fail_later(inputs):
+        first_failed.wait(5)
+        time.sleep(0.05)
+        raise RuntimeError('second')
+    
+    graph = app.StageGraph()
+    graph.add('later', fail_later)
+    graph.add('first', fail_first)
+    
+    with pytest.raises(ValueError, match='first'):
+        graph.run()
+    assert outcomes(trace) == {'first': 'error', 'later': 'error'}
+
+def test_results_flow_to_dependents(app_module):
+    app = app_module
+    graph = app.StageGraph()
+    graph.add('a', lambda inputs: 1)
+    graph.add('b', lambda inputs: 2)
+    graph.add('sum', lambda inputs: inputs['a'] + inputs['b'], after=('a', 'b'))
+    
+    assert graph.run() == {'a': 1, 'b': 2, 'sum': 3}
+    with pytest.raises(ValueError):
+        app.StageGraph().add('late', lambda inputs: None, after=('missing',))
+
+def test_concurrent_graphs_share_the_pool_without_deadlock(app_module):
+    app = app_module
+    assert app._PIPELINE_STAGE_EXECUTOR._max_workers == app.PIPELINE_STAGE_WORKERS
+    callers = app.PIPELINE_STAGE_WORKERS * 3
+    
+    def slow(value):
+        def stage(inputs):
+            time.sleep(0.01)
+            return value + sum(inputs.values())
+        return stage
+    
+    def run_graph(index):
+        graph = app.StageGraph()
+        graph.add('a', slow(index))
+        graph.add('b', slow(1))
+        graph.add('c', slow(0), after=('a', 'b'))
+        graph.add('d', slow(0), after=('c',))
+        return graph.run()['d']
+    
+    # More coordinating threads than pool workers, all waiting on the shared pool at once
+    with ThreadPoolExecutor(max_workers=callers) as callers_pool:
+        futures = [callers_pool.submit(run_graph, index) for index in range(callers)]
+        assert [future.result(timeout=10) for future in futures] == [index + 1 for index in range(callers)]
@@ -0,0 +1,74 @@
+import threading
+
+class Response:
+    def __init__(self, status_code, voices=()):
+        self.status_code = status_code
+        self._voices = list(voices)
+    
+    def json(self):
+        return {'voices': self._voices}
+
+class InvalidJSONResponse(Response):
+    def json(self):
+        raise ValueError('Expecting value: line 1 column 1 (char 0)')
+
+class FakeElevenLabs:
+    def __init__(self, response, release=None):
+        self.response = response
+        self.release = release
+        self.started = threading.Event()
+        self.calls = 0
+    
+    def get(self, operation, path, **kwargs):
+        self.calls += 1
+        self.started.set()
+        if self.release:
+            self.release.wait(5)
+        return self.response
+
+def test_fetch_runs_without_the_lock_and_serves_the_stale_listing(app_module, monkeypatch):
+    app = app_module
+    release = threading.Event()
+    client = FakeElevenLabs(Response(200, [{'name': 'New'}]), release)
+    monkeypatch.setattr(app, 'elevenlabs', client)
+    cache = app.VoiceLibraryCache(ttl=300, retry_after=30)
+    cache._voices = [{'name': 'Old'}]
+    
+    fetcher = threading.Thread(target=cache.get_voices)
+    fetcher.start()
+    assert client.started.wait(5)
+    
+    assert cache._lock.acquire(timeout=1)
+    cache._lock.release()
+    assert cache.get_voices() == [{'name': 'Old'}]
+    
+    release.set()
+    fetcher.join(5)
+    assert cache.get_voices() == [{'name': 'New'}]
+    assert client.calls == 1
+
+def test_failed_fetch_backs_off(app_module, monkeypatch):
+    app = app_module
+    client = FakeElevenLabs(Response(503))
+    monkeypatch.setattr(app, 'elevenlabs', client)
+    cache = app.VoiceLibraryCache(ttl=300, retry_after=30)
+    
+    assert cache.get_voices() == []
+    assert cache.get_voices() == []
+    assert client.calls == 1
+    
+    # Creating a voice shows the API works again
+    cache.invalidate()
+    client.response = Response(200, [{'name': 'Ada Voice'}])
+    assert cache.find_voice_for_person('Ada') == {'name': 'Ada Voice'}
+
+def test_unparseable_listing_backs_off_and_serves_the_stale_listing(app_module, monkeypatch):
+    app = app_module
+    client = FakeElevenLabs(InvalidJSONResponse(200))
+    monkeypatch.setattr(app, 'elevenlabs', client)
+    cache = app.VoiceLibraryCache(ttl=300, retry_after=30)
+    cache._voices = [{'name': 'Old'}]
+    
+    assert cache.get_voices() == [{'name': 'Old'}]
+    assert cache.get_voices() == [{'name': 'Old'}]
+    assert client.calls == 1
@@ -6,6 +6,8 @@ from bson import ObjectId
 import os
 from dotenv import load_dotenv
 
+from figure_schema import expand_figure
+
 load_dotenv()
 
 # Connect to MongoDB
@@ -16,19 +18,21 @@ client = MongoClient(MONGO_URI)
 db = client[DATABASE_NAME]
 collection = db['historical_figures']
 
-# Get all historical figures
-figures = list(collection.find())
+# Count historical figures; documents are streamed from a cursor below
+total = collection.count_documents({})
 
 print(f"\n{'='*70}")
 print(f"MongoDB Database: {DATABASE_NAME}")
 print(f"Collection: historical_figures")
-print(f"Total documents: {len(figures)}")
+print(f"Total documents: {total}")
 print(f"{'='*70}\n")
 
-if not figures:
+if not total:
     print("No historical figures found in database.")
 else:
-    for idx, figure in enumerate(figures, 1):
+    for idx, stored in enumerate(collection.find(), 1):
+        # Compact-schema documents are expanded to questions/answers/full_response
+        figure = expand_figure(db, stored)
         print(f"\n{'#'*70}")
         print(f"Document #{idx}")
         print(f"{'#'*70}")
@@ -11,6 +11,7 @@ interface AgentSearchProps {
 const AgentSearch: React.FC<AgentSearchProps> = ({ onAgentSelect, selectedAgent }) => {
   const [searchQuery, setSearchQuery] = useState('');
   const [agents, setAgents] = useState<Agent[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
   const [creating, setCreating] = useState(false);
   const [error, setError] = useState<string | null>(null);
@@ -19,11 +20,13 @@ const AgentSearch: React.FC<AgentSearchProps> = ({ onAgentSelect, selectedAgent
     loadAgents();
   }, []);
 
-  const loadAgents = async () => {
+  // Loads the first page, or appends the next one when more is true
+  const loadAgents = async (more: boolean = false) => {
     try {
       setLoading(true);
-      const response = await api.listAgents();
-      setAgents(response.figures.filter(a => a.has_agent));
+      const response = await api.listAgents({ hasAgent: true, cursor: more ? nextCursor : null });
+      setAgents(more ? [...agents, ...response.figures] : response.figures);
+      setNextCursor(response.next_cursor ?? null);
     } catch (err: any) {
       setError(err.message || 'Failed to load agents');
     } finally {
@@ -110,8 +113,8 @@ const AgentSearch: React.FC<AgentSearchProps> = ({ onAgentSelect, selectedAgent
       )}
 
       <div className="agents-list">
-        <h3>Available Agents ({agents.length})</h3>
-        {loading ? (
+        <h3>Available Agents ({agents.length}{nextCursor ? '+' : ''})</h3>
+        {loading && agents.length === 0 ? (
           <div className="loading">Loading agents...</div>
         ) : agents.length === 0 ? (
           <div className="empty-state">No agents created yet. Search for a historical figure to get started!</div>
@@ -131,6 +134,11 @@ const AgentSearch: React.FC<AgentSearchProps> = ({ onAgentSelect, selectedAgent
             ))}
           </div>
         )}
+        {nextCursor && (
+          <button onClick={() => loadAgents(true)} disabled={loading} className="search-button">
+            {loading ? 'Loading...' : 'Load more'}
+          </button>
+        )}
       </div>
     </div>
   );
@@ -6,6 +6,16 @@ const API_BASE = process.env.REACT_APP_API_URL || 'http://localhost:5000';
 export interface AgentListResponse {
   figures: Agent[];
   count: number;
+  next_cursor?: string | null;
+  last_id?: string | null;
+  has_more?: boolean;
+}
+
+export interface ListAgentsOptions {
+  hasAgent?: boolean;
+  since?: string;
+  cursor?: string | null;
+  pageSize?: number;
 }
 
 export interface AgentStatusResponse {
@@ -18,6 +28,23 @@ export interface AgentStatusResponse {
   ready: boolean;
 }
 
+export interface JobStatusResponse {
+  job_id: string;
+  type: string;
+  person_name: string;
+  status: 'queued' | 'running' | 'succeeded' | 'failed';
+  stage: string;
+  events: { stage: string; at: string | null }[];
+  result: CreateAgentResponse | null;
+  error: string | null;
+  status_url: string;
+  events_url: string;
+}
+
+const JOB_POLL_INTERVAL_MS = 2000;
+// Give up on a job after this long (the server reports jobs without progress for 15 minutes as failed)
+const JOB_POLL_TIMEOUT_MS = 20 * 60 * 1000;
+
 export interface CreateAgentResponse {
   figure: any;
   agent: {
@@ -29,16 +56,23 @@ export interface CreateAgentResponse {
 }
 
 const api = {
-  // List all historical figures
-  listAgents: async (): Promise<AgentListResponse> => {
-    const response = await axios.get(`${API_BASE}/api/historical-figures`);
+  // List one page of historical figures; pass the returned next_cursor as cursor for the next page
+  listAgents: async (options: ListAgentsOptions = {}): Promise<AgentListResponse> => {
+    const response = await axios.get(`${API_BASE}/api/historical-figures`, {
+      params: {
+        limit: options.pageSize,
+        has_agent: options.hasAgent ? 'true' : undefined,
+        since: options.since,
+        cursor: options.cursor || undefined
+      }
+    });
     return response.data;
   },
 
   // Search for historical figures
-  searchAgents: async (query: string): Promise<AgentListResponse> => {
+  searchAgents: async (query: string, limit?: number): Promise<AgentListResponse> => {
     const response = await axios.get(`${API_BASE}/api/historical-figures/search`, {
-      params: { q: query }
+      params: { q: query, limit }
     });
     return response.data;
   },
@@ -49,12 +83,39 @@ const api = {
     return response.data;
   },
 
-  // Create figure and agent
-  createFigureWithAgent: async (personName: string): Promise<CreateAgentResponse> => {
-    const response = await axios.post(`${API_BASE}/api/historical-figure/${encodeURIComponent(personName)}/create-with-agent`);
+  // Get background job status
+  getJobStatus: async (jobId: string): Promise<JobStatusResponse> => {
+    const response = await axios.get(`${API_BASE}/api/jobs/${jobId}`);
     return response.data;
   },
 
+  // Create figure and agent (waits for the background job when the server returns 202)
+  createFigureWithAgent: async (
+    personName: string,
+    onProgress?: (stage: string) => void
+  ): Promise<CreateAgentResponse> => {
+    const response = await axios.post(`${API_BASE}/api/historical-figure/${encodeURIComponent(personName)}/create-with-agent`);
+    if (response.status !== 202) {
+      return response.data;
+    }
+
+    let job: JobStatusResponse = response.data;
+    const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+    while (job.status === 'queued' || job.status === 'running') {
+      if (Date.now() >= deadline) {
+        throw new Error('Agent creation is taking too long; please try again later');
+      }
+      onProgress?.(job.stage);
+      await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+      job = await api.getJobStatus(job.job_id);
+    }
+
+    if (job.status === 'failed' || !job.result) {
+      throw new Error(job.error || 'Agent creation failed');
+    }
+    return job.result;
+  },
+
   // Get WebSocket URL for an agent (with API key embedded)
   getWebSocketUrl: async (agentId: string): Promise<string> => {
     const response = await axios.get(`${API_BASE}/api/agent/${agentId}/websocket-url`);